@@ -2,6 +2,8 @@
 ASGI config for API project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Streaming endpoints such as /student/seat-events/ are async views and should
+be served through this entry point (e.g. ``uvicorn API.asgi:application``).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
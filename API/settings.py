@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'betterAPI.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -53,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'betterAPI.db_routing.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'API.urls'
@@ -77,14 +80,157 @@ WSGI_APPLICATION = 'API.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# SQLite (db.sqlite3) unless DB_ENGINE=postgresql (requires psycopg 3; add
+# psycopg[pool] for DB_POOL_MAX_SIZE). Django's own pool and persistent
+# connections (DB_CONN_MAX_AGE) are mutually exclusive: with a pool size set,
+# connections are returned to the pool after every request. Behind PgBouncer
+# in transaction mode set DB_PGBOUNCER=1.
+#
+# Setting DB_REPLICA_HOST (PostgreSQL) or DB_REPLICA_NAME (SQLite) adds a
+# 'replica' database that the read-only student/educator views read from,
+# see betterAPI/db_routing.py. Other DB_REPLICA_* variables default to the
+# primary's values.
+#
+# SQLITE_CONCURRENCY_MODE=1 is for deployments that stay on SQLite with
+# concurrent writers: WAL journaling and the pragmas below on every new
+# connection, write transactions that take the lock up front (BEGIN
+# IMMEDIATE) and wait up to SQLITE_BUSY_TIMEOUT seconds for it, and
+# registrations/grade imports serialized and retried (betterAPI/sqlite_writes.py).
+
+SQLITE_CONCURRENCY_MODE = os.environ.get('SQLITE_CONCURRENCY_MODE', '').lower() in ('1', 'true', 'yes')
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    # Durable at checkpoints rather than every commit; safe with WAL
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',   # 64 MiB page cache per connection
+    'PRAGMA mmap_size=268435456',  # read through a 256 MiB memory map
+    'PRAGMA temp_store=MEMORY',
+]
+
+def database(prefix, defaults=None):
+    defaults = defaults or {}
+
+    def env(name, default=None):
+        return os.environ.get(prefix + name, defaults.get(name, default))
+
+    engine = env('ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        config = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('NAME', str(BASE_DIR / 'db.sqlite3')),
+        }
+        if SQLITE_CONCURRENCY_MODE:
+            config['OPTIONS'] = {
+                'init_command': ';'.join(SQLITE_PRAGMAS),
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            }
+        return config
+
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env('NAME', 'sisapi'),
+        'USER': env('USER', ''),
+        'PASSWORD': env('PASSWORD', ''),
+        'HOST': env('HOST', ''),
+        'PORT': env('PORT', ''),
+        'CONN_MAX_AGE': int(env('CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': env('PGBOUNCER', '').lower() in ('1', 'true', 'yes'),
+        'OPTIONS': {},
+    }
+    pool_size = int(env('POOL_MAX_SIZE', 0))
+    if pool_size:
+        config['CONN_MAX_AGE'] = 0
+        config['OPTIONS']['pool'] = {
+            'min_size': int(env('POOL_MIN_SIZE', 2)),
+            'max_size': pool_size,
+            'timeout': int(env('POOL_TIMEOUT', 10)),
+        }
+    return config
+
+
+primary_env = {
+    name[len('DB_'):]: value for name, value in os.environ.items()
+    if name.startswith('DB_') and not name.startswith('DB_REPLICA_')
+}
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+    'default': database('DB_'),
+}
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = dict(database('DB_REPLICA_', defaults=primary_env), TEST={'MIRROR': 'default'})
+    DATABASE_ROUTERS = ['betterAPI.db_routing.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after a request of theirs wrote,
+# so they see their own writes while the replica catches up
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DATABASE_REPLICA_PIN_SECONDS', 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Catalog snapshots and other cross-worker state live here. Set REDIS_URL
+# (requires the redis package) so every worker shares the same cache.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
+
+# Seat change fanout for /student/seat-events/ (see betterAPI/events.py).
+# The local broker only reaches clients connected to the same worker.
+SEAT_EVENTS_BROKER = 'betterAPI.events.RedisBroker' if REDIS_URL else 'betterAPI.events.LocalBroker'
+
+# Token-bucket throttling (see betterAPI/throttling.py). Rates are per user
+# (per client IP for anonymous requests) and scope; views without a
+# throttle_scope use 'user'/'anon'. None disables a scope. The local backend
+# only limits within one worker process.
+THROTTLE_ENABLED = os.environ.get('THROTTLE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+THROTTLE_BACKEND = 'betterAPI.throttling.RedisBuckets' if REDIS_URL else 'betterAPI.throttling.LocalBuckets'
+THROTTLE_RATES = {
+    'anon': '60/min',
+    'user': '300/min',
+    'login': '10/min',
+    'register': '20/min',
+    'registration-status': '120/min',
+    'grade-entry': '60/min',
+    'bulk-create': '10/hour',
+    'current-semester': '1200/min',
+}
+
+# Queued registration mode (see betterAPI/registration_queue.py). ORDER is
+# 'fifo' or 'level' (higher level students are served first).
+REGISTRATION_QUEUE = {
+    'ENABLED': os.environ.get('REGISTRATION_QUEUE_ENABLED', '').lower() in ('1', 'true', 'yes'),
+    'MAX_SIZE': int(os.environ.get('REGISTRATION_QUEUE_MAX_SIZE', 1000)),
+    'WORKERS': int(os.environ.get('REGISTRATION_QUEUE_WORKERS', 4)),
+    'ORDER': os.environ.get('REGISTRATION_QUEUE_ORDER', 'fifo'),
+    'TICKET_TTL': 15 * 60,
 }
 
+# Seconds a worker trusts its in-memory GlobalSettings before checking the
+# shared version stamp; an admin change is seen everywhere within this delay.
+GLOBAL_SETTINGS_CACHE_TTL = int(os.environ.get('GLOBAL_SETTINGS_CACHE_TTL', 5))
+
+# Views declare a query_budget (betterAPI/instrumentation.py). Going over it is
+# logged; with this enabled (test/CI runs) the request fails instead.
+ENFORCE_QUERY_BUDGETS = os.environ.get('ENFORCE_QUERY_BUDGETS', '').lower() in ('1', 'true', 'yes')
+
+# Processes hashing passwords during bulk account creation (betterAPI/provisioning.py);
+# defaults to the number of CPUs.
+ACCOUNT_PROVISIONING_WORKERS = int(os.environ.get('ACCOUNT_PROVISIONING_WORKERS', 0)) or None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -128,8 +274,9 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    # Stateless: request.user is built from the token claims, no User query
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -141,6 +288,7 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
+    'TOKEN_USER_CLASS': 'betterAPI.authentication.ClaimsUser',
 }
 
 CORS_ALLOWED_ORIGINS = [
@@ -0,0 +1,485 @@
+"""
+Async (ASGI) endpoints. These are plain Django async views rather than DRF
+views so that a slow client never holds a worker thread; run the project
+through API/asgi.py (e.g. ``uvicorn API.asgi:application``) to use them.
+
+Besides the seat event stream, the read-only student/educator endpoints have
+async versions under /async/ (e.g. /async/student/info/). They return the same
+JSON, share the response cache and ETags with the DRF views, and run their
+independent queries concurrently. Under WSGI they still work, but each request
+then gets its own event loop and nothing is gained.
+"""
+import asyncio
+import functools
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Sum, aprefetch_related_objects
+from django.http import HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from . import (
+    catalog, dashboard, db_routing, events, payloads, response_cache, roster, seats, throttling, timetable, transcript
+)
+from .authentication import EDUCATOR, STUDENT, authenticate_token
+from .models import Educator, Enrollment, GlobalSettings, Registration, Student, Term, TimeSlot
+
+MAX_WATCHED_REGISTRATIONS = 50
+HEARTBEAT_SECONDS = 15
+MAX_POLL_SECONDS = 30
+POLL_BATCH_WINDOW = 0.05
+POLL_BATCH_SIZE = 100
+
+
+async def authenticate(request):
+    """
+    JWT authentication for async views, from the token's claims alone (see
+    authentication.py). EventSource cannot send headers, so the access token
+    may also be passed as ?token=.
+    """
+    raw_token = request.GET.get('token')
+    if raw_token is None:
+        auth = JWTStatelessUserAuthentication()
+        header = auth.get_header(request)
+        raw_token = auth.get_raw_token(header) if header else None
+    if raw_token is None:
+        return None
+    return authenticate_token(raw_token)
+
+
+def parse_registration_ids(value):
+    try:
+        ids = sorted({int(part) for part in value.split(',') if part.strip()})
+    except ValueError:
+        return None
+    if not ids or len(ids) > MAX_WATCHED_REGISTRATIONS:
+        return None
+    return ids
+
+
+def parse_cursor(value):
+    """The last event id a client saw, None without one; raises ValueError if malformed"""
+    if value is None or value == '':
+        return None
+    cursor = int(value)
+    if cursor < 0:
+        raise ValueError(value)
+    return cursor
+
+
+def replay_cursor(replay, messages):
+    """Where a client is once it has the replayed messages: nothing up to it is left to send"""
+    return max([replay.last_id] + [message['id'] for message in messages])
+
+
+async def next_message(subscription, after, timeout):
+    """The next message with an id above after; replayed messages may arrive live again"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        message = await subscription.get(timeout=max(0.0, deadline - loop.time()))
+        if message['id'] > after:
+            return message
+
+
+def seat_event(message):
+    return f"id: {message['id']}\nevent: seats\ndata: {json.dumps(message)}\n\n"
+
+
+async def seat_event_stream(subscription, replay):
+    cursor = replay_cursor(replay, replay.messages)
+    try:
+        yield "retry: 3000\n\n"
+        if not replay.complete:
+            yield "event: resync\ndata: {}\n\n"
+        for message in replay.messages:
+            yield seat_event(message)
+        # Sets the browser's Last-Event-ID even if nothing was replayed
+        yield f"id: {cursor}\n\n"
+        while True:
+            try:
+                message = await next_message(subscription, cursor, HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            cursor = message['id']
+            yield seat_event(message)
+    finally:
+        await subscription.close()
+
+
+async def long_poll(subscription, replay, timeout):
+    """
+    The buffered changes after the client's cursor, or else the first change
+    within timeout, plus whatever follows within a short window. Returns
+    (messages, cursor to send back as ?since=).
+    """
+    messages = replay.messages[:POLL_BATCH_SIZE]
+    try:
+        if len(messages) < len(replay.messages):
+            # The rest comes with the next poll
+            return messages, messages[-1]['id']
+        cursor = replay_cursor(replay, messages)
+        try:
+            if not messages:
+                messages.append(await next_message(subscription, cursor, timeout))
+                cursor = messages[-1]['id']
+            while len(messages) < POLL_BATCH_SIZE:
+                messages.append(await next_message(subscription, cursor, POLL_BATCH_WINDOW))
+                cursor = messages[-1]['id']
+        except asyncio.TimeoutError:
+            pass
+        return messages, cursor
+    finally:
+        await subscription.close()
+
+
+async def seat_events(request):
+    """
+    GET /student/seat-events/?registrations=1,2,3
+
+    Streams seat-count deltas ({id, registrationId, patternId, delta}) for the
+    watched registrations as Server-Sent Events. With ?poll=1 it long-polls
+    instead: waits up to ?timeout= seconds and returns {"events": [...],
+    "cursor": n, "resync": bool}. ?since= (or the Last-Event-ID header that
+    EventSource sends when it reconnects) replays the buffered events after
+    that id first.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    user = await authenticate(request)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    registration_ids = parse_registration_ids(request.GET.get('registrations', ''))
+    if registration_ids is None:
+        return JsonResponse(
+            {'error': f'Expected registrations=<id>,<id>,... (1 to {MAX_WATCHED_REGISTRATIONS} ids)'},
+            status=400
+        )
+    try:
+        since = parse_cursor(request.GET.get('since', request.headers.get('Last-Event-ID')))
+    except ValueError:
+        return JsonResponse({'error': 'since must be an event id (a non-negative integer)'}, status=400)
+
+    broker = events.get_broker()
+    channels = [events.registration_channel(registration_id) for registration_id in registration_ids]
+    # Subscribe before reading the buffer, so nothing published in between is missed
+    subscription = await broker.subscribe(channels)
+    try:
+        replay = await broker.replay(channels, since)
+    except BaseException:
+        await subscription.close()
+        raise
+
+    if request.GET.get('poll'):
+        try:
+            timeout = min(float(request.GET.get('timeout', 25)), MAX_POLL_SECONDS)
+        except ValueError:
+            timeout = 25
+        messages, cursor = await long_poll(subscription, replay, timeout)
+        return JsonResponse({'events': messages, 'cursor': cursor, 'resync': not replay.complete})
+
+    response = StreamingHttpResponse(seat_event_stream(subscription, replay), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def json_response(data, status=200):
+    """JsonResponse rendered like DRF's JSONRenderer, keeping the data for the response cache"""
+    response = JsonResponse(
+        data, status=status, encoder=JSONEncoder, safe=False,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+    )
+    response.data = data
+    return response
+
+
+def authenticated_get(role, throttle_scope=None):
+    """
+    GET only, with a valid access token carrying this role; the user is set on
+    request.user. Throttled like the DRF view sharing the scope (same buckets).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+            user = await authenticate(request)
+            if user is None or not user.is_authenticated:
+                return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+            if user.role != role:
+                return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+            request.user = user
+
+            wait = await throttling.acheck(throttle_scope, request)
+            if wait:
+                response = JsonResponse({'detail': throttling.throttled_detail(wait)}, status=429)
+                response['Retry-After'] = str(math.ceil(wait))
+                return response
+
+            await db_routing.ause_replica(request, user)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cached_student_response(scope, depends_on_catalog=False):
+    """response_cache.cached_student_response() for the async views"""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            student_id = request.user.username
+            versions = await response_cache.acurrent_versions(student_id, depends_on_catalog)
+            key, etag = response_cache.response_key(scope, student_id, versions)
+
+            if response_cache.etag_matches(request, etag):
+                response = HttpResponseNotModified()
+            else:
+                data = await cache.aget(key)
+                if data is None:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                    await cache.aset(key, response.data, timeout=response_cache.CACHE_TIMEOUT)
+                else:
+                    response = json_response(data)
+
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def _on_own_connection(query):
+    def run():
+        close_old_connections()
+        try:
+            return query()
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+async def run_concurrently(*queries):
+    """
+    Run independent ORM calls at the same time and return their results in order.
+
+    Gathering async ORM calls (aget, aaggregate, ...) does not overlap them:
+    Django sends them all through the one thread-sensitive executor. Each
+    query here gets a worker thread and database connection of its own.
+    """
+    return await asyncio.gather(*(_on_own_connection(query) for query in queries))
+
+
+def current_term():
+    global_settings = GlobalSettings.get_current()
+    return global_settings, Term.current_id(global_settings)
+
+
+@authenticated_get(STUDENT)
+@cached_student_response('info')
+async def student_info(request):
+    """GET /async/student/info/"""
+    student_id = request.user.username
+    student, total_credits, current_enrollment = await run_concurrently(
+        lambda: Student.objects.select_related('department').filter(studentId=student_id).first(),
+        lambda: Enrollment.objects.filter(
+            student_id=student_id,
+            letterGrade__in=['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D']
+        ).aggregate(Sum('registration__course__credits'))['registration__course__credits__sum'],
+        lambda: Enrollment.objects.filter(student_id=student_id).select_related(
+            'semester__academicYear'
+        ).order_by('-semester__academicYear__yearName', '-semester__semesterName').first(),
+    )
+    if student is None:
+        return json_response({'error': 'Student not found'}, status=404)
+
+    return json_response(payloads.student_info(student, total_credits, current_enrollment))
+
+
+@authenticated_get(STUDENT)
+@cached_student_response('grades', depends_on_catalog=True)
+async def student_grades(request):
+    """GET /async/student/grades/"""
+    student_id = request.user.username
+    student, rows = await run_concurrently(
+        lambda: Student.objects.filter(studentId=student_id).first(),
+        lambda: list(transcript.transcript_rows(student_id)),
+    )
+    if student is None:
+        return json_response({'error': 'Student not found'}, status=404)
+
+    history, overall_stats = transcript.group_transcript(rows)
+    return json_response(payloads.student_grades(student, history, overall_stats))
+
+
+@authenticated_get(STUDENT, throttle_scope='current-semester')
+@cached_student_response('current-semester', depends_on_catalog=True)
+async def student_current_semester(request):
+    """GET /async/student/current-semester/"""
+    student_id = request.user.username
+    student, current_enrollment = await run_concurrently(
+        lambda: Student.objects.filter(studentId=student_id).first(),
+        lambda: Enrollment.objects.filter(student_id=student_id).select_related(
+            'semester__academicYear'
+        ).order_by('-semester__academicYear__yearName', '-semester__semesterName').first(),
+    )
+    if student is None:
+        return json_response({'error': 'Student not found'}, status=404)
+    if not current_enrollment:
+        return json_response(payloads.NO_CURRENT_SEMESTER)
+
+    current_semester = current_enrollment.semester
+    enrollments = [
+        enrollment async for enrollment in Enrollment.objects.filter(
+            student_id=student_id, semester=current_semester
+        ).select_related('registration__course')
+    ]
+    return json_response(payloads.student_current_semester(student, current_semester, enrollments))
+
+
+@authenticated_get(STUDENT)
+@cached_student_response('timetable', depends_on_catalog=True)
+async def student_timetable(request):
+    """GET /async/student/timetable/"""
+    student_id = request.user.username
+    student, (global_settings, term_id) = await run_concurrently(
+        lambda: Student.objects.filter(studentId=student_id).first(),
+        current_term,
+    )
+    if student is None:
+        return json_response({"detail": "Student not found."}, status=404)
+
+    enrollments = [
+        enrollment async for enrollment in Enrollment.objects.filter(
+            student_id=student_id, term_id=term_id
+        ).select_related('registration__course')
+    ]
+    await aprefetch_related_objects(enrollments, 'selected_patterns__time_slots__educator')
+    return json_response(payloads.student_timetable(student, global_settings, enrollments))
+
+
+@authenticated_get(STUDENT)
+async def available_registrations(request):
+    """GET /async/student/available-registrations/"""
+    student_id = request.user.username
+    student, course_grades, (global_settings, term_id) = await run_concurrently(
+        lambda: Student.objects.select_related('department').filter(studentId=student_id).first(),
+        lambda: list(Enrollment.objects.filter(student_id=student_id).values_list('registration__course', 'letterGrade')),
+        current_term,
+    )
+    if student is None:
+        return json_response({'error': 'Student not found'}, status=404)
+
+    completed_courses = set()
+    current_registrations_set = set()
+    for course_code, letter_grade in course_grades:
+        if letter_grade is None:
+            current_registrations_set.add(course_code)
+        elif letter_grade in ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-']:
+            completed_courses.add(course_code)
+
+    departments = [student.department.code]
+    if student.level > 0:
+        departments.append('GP')
+
+    eligible_registrations, term_masks = await run_concurrently(
+        lambda: catalog.eligible_entries(departments, global_settings, completed_courses),
+        lambda: timetable.student_term_masks(student, global_settings),
+    )
+    registration_counts, pattern_counts = await _on_own_connection(lambda: seats.seat_counts(
+        [entry['registrationId'] for entry in eligible_registrations],
+        [pattern['patternId'] for entry in eligible_registrations for pattern in entry['data']['schedulePatterns']]
+    ))
+    return json_response(payloads.available_registrations(
+        student, departments, eligible_registrations, current_registrations_set,
+        term_masks, registration_counts, pattern_counts
+    ))
+
+
+@authenticated_get(EDUCATOR)
+async def educator_info(request):
+    """GET /async/educator/info/"""
+    try:
+        educator = await Educator.objects.select_related('department').aget(educatorId=request.user.username)
+    except Educator.DoesNotExist:
+        return json_response({'error': 'Educator not found'}, status=404)
+
+    return json_response(payloads.educator_info(educator))
+
+
+@authenticated_get(EDUCATOR)
+async def educator_timetable(request):
+    """GET /async/educator/timetable/"""
+    educator_id = request.user.username
+    educator, (global_settings, term_id) = await run_concurrently(
+        lambda: Educator.objects.filter(educatorId=educator_id).first(),
+        current_term,
+    )
+    if educator is None:
+        return json_response({'error': 'Educator not found'}, status=404)
+
+    time_slots = [
+        time_slot async for time_slot in TimeSlot.objects.filter(
+            educator_id=educator_id,
+            pattern__registration__enrollments__term_id=term_id
+        ).select_related(
+            'pattern__registration__course'
+        ).distinct()
+    ]
+    return json_response(payloads.educator_timetable(educator, global_settings, time_slots))
+
+
+@authenticated_get(EDUCATOR)
+async def educator_current_courses(request):
+    """GET /async/educator/current-courses/"""
+    educator_id = request.user.username
+    response_data = await _on_own_connection(
+        lambda: dashboard.educator_courses(educator_id, GlobalSettings.get_current())
+    )
+    if response_data is None:
+        return json_response({'error': 'Educator not found'}, status=404)
+
+    return json_response(response_data)
+
+
+@authenticated_get(EDUCATOR)
+async def educator_course_info(request, registration_id):
+    """GET /async/educator/course/<registration_id>/"""
+    educator, registration, (global_settings, term_id) = await run_concurrently(
+        lambda: Educator.objects.filter(educatorId=request.user.username).first(),
+        lambda: Registration.objects.select_related('course').filter(id=registration_id).first(),
+        current_term,
+    )
+    if educator is None:
+        return json_response({'error': 'Educator not found'}, status=404)
+    if registration is None:
+        return json_response({'error': 'Registration not found'}, status=404)
+
+    pattern_ids = await _on_own_connection(lambda: roster.educator_pattern_ids(educator, registration))
+    if not pattern_ids:
+        return json_response({'error': 'You are not authorized to view this course'}, status=403)
+    try:
+        order_by, page, page_size = roster.page_params(request.GET)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+
+    enrollments = roster.roster(registration, term_id, pattern_ids)
+    offset = (page - 1) * page_size if page_size else 0
+    (total_enrolled, with_grades), page_enrollments = await run_concurrently(
+        lambda: roster.roster_counts(enrollments),
+        lambda: roster.roster_page(enrollments, pattern_ids, order_by, offset, page_size),
+    )
+    students_data = [roster.student_row(enrollment) for enrollment in page_enrollments]
+    return json_response(payloads.educator_course_info(
+        educator, global_settings, registration, total_enrolled, with_grades, students_data, page, page_size
+    ))
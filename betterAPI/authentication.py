@@ -0,0 +1,82 @@
+"""
+Stateless JWT authentication.
+
+At login (and only then) the user's role and linked Student/Educator id are
+resolved and embedded in the token as claims, next to username and staff
+flags. Requests are authenticated from the verified token alone: DRF gets a
+ClaimsUser built from the claims instead of a User row, so an authenticated
+request costs no auth queries.
+
+Claims are fixed for the life of the refresh token (SIMPLE_JWT
+REFRESH_TOKEN_LIFETIME): role changes or deactivations take effect at the
+next login.
+"""
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from .models import Educator, Student
+from .throttling import TokenBucketThrottle
+
+STUDENT = 'Student'
+EDUCATOR = 'Educator'
+ADMIN = 'Admin'
+
+
+def resolve_role(user):
+    """(role, linked Student/Educator id) from the user's groups, else from a record with their username"""
+    groups = set(user.groups.values_list('name', flat=True))
+    if STUDENT in groups:
+        return STUDENT, user.username
+    if EDUCATOR in groups:
+        return EDUCATOR, user.username
+    if user.is_staff:
+        return ADMIN, None
+    if Student.objects.filter(pk=user.username).exists():
+        return STUDENT, user.username
+    if Educator.objects.filter(pk=user.username).exists():
+        return EDUCATOR, user.username
+    return None, None
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        role, profile_id = resolve_role(user)
+        token['username'] = user.username
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        token['role'] = role
+        token['profileId'] = profile_id
+        return token
+
+
+class RoleTokenObtainPairView(TokenObtainPairView):
+    serializer_class = RoleTokenObtainPairSerializer
+    # Per client IP: slows down password guessing
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
+
+
+class ClaimsUser(TokenUser):
+    """request.user for token-authenticated requests (SIMPLE_JWT TOKEN_USER_CLASS)"""
+
+    @property
+    def role(self):
+        return self.token.get('role')
+
+    @property
+    def profile_id(self):
+        return self.token.get('profileId')
+
+
+def authenticate_token(raw_token):
+    """ClaimsUser for a raw access token, None if it is invalid (for views outside DRF)"""
+    auth = JWTStatelessUserAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
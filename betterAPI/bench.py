@@ -0,0 +1,53 @@
+"""
+Small helpers shared by the benchmark management commands.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers (pct in 0-100)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies, elapsed):
+    """Turn a list of latencies (seconds) into a report dict (milliseconds)"""
+    return {
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50Ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95Ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99Ms': round(percentile(latencies, 99) * 1000, 2),
+        'maxMs': round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def run_concurrently(func, jobs, workers):
+    """
+    Call func(job) for every job on a thread pool.
+    Returns (results, latencies, elapsed). Each thread closes its own DB connection.
+    """
+    def timed(job):
+        start = time.perf_counter()
+        try:
+            result = func(job)
+        except Exception as e:
+            result = e
+        finally:
+            connection.close()
+        return result, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(timed, jobs))
+    elapsed = time.perf_counter() - start
+
+    results = [result for result, _ in outcomes]
+    latencies = [latency for _, latency in outcomes]
+    return results, latencies, elapsed
@@ -0,0 +1,140 @@
+"""
+Precomputed course catalog used by AvailableRegistration.
+
+The offering tree (Registration -> SchedulePattern -> TimeSlot -> Educator) is
+the same for every student of a department, so it is built once per
+department and term, kept in the shared cache and in a process-local dict,
+and reused for every request. Any write to the catalog models bumps a version
+number in the shared cache once its transaction commits (see signals.py),
+which makes every process drop its snapshots on the next read.
+
+Per-student eligibility is then just a set filter over the snapshot, using
+the prerequisite graph (see prerequisites.py), and timetable conflicts are an
+AND against the weekly pattern masks stored with each entry (see timetable.py).
+"""
+from django.core.cache import cache
+
+from .models import Registration
+from . import db_routing, prerequisites, timetable
+
+VERSION_KEY = 'catalog:version'
+CACHE_TIMEOUT = 60 * 60
+# Bump when the snapshot entry layout changes so old cached snapshots are ignored
+SNAPSHOT_FORMAT = 2
+
+_local = {'version': None, 'snapshots': {}}
+
+
+def current_version():
+    return cache.get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+def invalidate():
+    """Drop every catalog snapshot in every process"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+    _local['snapshots'].clear()
+
+
+def serialize_registration(reg):
+    patterns_data = []
+    for pattern in reg.patterns.all():
+        time_slots_data = []
+        for time_slot in pattern.time_slots.all():
+            time_slots_data.append({
+                'day': time_slot.day,
+                'dayName': time_slot.get_day_display(),
+                'startPeriod': time_slot.start_period,
+                'endPeriod': time_slot.end_period,
+                'location': time_slot.location,
+                'educator': {
+                    'id': time_slot.educator.educatorId,
+                    'name': time_slot.educator.nameEn
+                } if time_slot.educator else None
+            })
+
+        patterns_data.append({
+            'patternId': pattern.id,
+            'patternName': pattern.pattern_name,
+            'patternType': pattern.pattern_type,
+            'capacity': pattern.capacity,
+            'timeSlots': time_slots_data
+        })
+
+    return {
+        'registrationId': reg.id,
+        'courseCode': reg.course.courseCode,
+        'courseName': reg.course.courseName,
+        'credits': reg.course.credits,
+        'level': reg.level,
+        'groupNumber': reg.group_number,
+        'capacity': reg.capacity,
+        'isEnrolled': False,
+        'schedulePatterns': patterns_data,
+    }
+
+
+def build_snapshot(department_code):
+    """Every active offering visible to a department, fully serialized"""
+    registrations = Registration.objects.filter(
+        is_active=True,
+        course__departments__code=department_code,
+    ).select_related(
+        'course'
+    ).prefetch_related(
+        'patterns__time_slots__educator'
+    ).order_by('course__level', 'course__courseCode', 'group_number')
+
+    return [
+        {
+            'registrationId': reg.id,
+            'courseCode': reg.course.courseCode,
+            'level': reg.level,
+            'data': serialize_registration(reg),
+            'patternMasks': {
+                pattern.id: timetable.slots_mask(pattern.time_slots.all()) for pattern in reg.patterns.all()
+            },
+        }
+        for reg in registrations
+    ]
+
+
+def get_snapshot(department_code, global_settings):
+    """Snapshot for a department in the current term: process memory, then shared cache, then the database"""
+    version = current_version()
+    if _local['version'] != version:
+        _local['version'] = version
+        _local['snapshots'] = {}
+
+    key = f"catalog:{SNAPSHOT_FORMAT}:{version}:{global_settings.current_academic_year}:{global_settings.current_semester}:{department_code}"
+    snapshot = _local['snapshots'].get(key)
+    if snapshot is None:
+        snapshot = cache.get(key)
+        if snapshot is None:
+            with db_routing.primary():
+                snapshot = build_snapshot(department_code)
+            cache.set(key, snapshot, timeout=CACHE_TIMEOUT)
+        _local['snapshots'][key] = snapshot
+    return snapshot
+
+
+def eligible_entries(department_codes, global_settings, completed_courses):
+    """
+    Offerings of the given departments the student may take: not already passed and
+    with every prerequisite passed. completed_courses must be a set of course codes.
+    """
+    graph = prerequisites.get_graph()
+    eligible_courses = graph.eligible_courses(graph.mask(completed_courses)) - completed_courses
+
+    seen = set()
+    eligible = []
+    for department_code in department_codes:
+        for entry in get_snapshot(department_code, global_settings):
+            if entry['registrationId'] in seen:
+                continue
+            seen.add(entry['registrationId'])
+            if entry['courseCode'] in eligible_courses:
+                eligible.append(entry)
+    return eligible
@@ -0,0 +1,126 @@
+"""
+Educator dashboard (GET /educator/current-courses/).
+
+The course list comes from one query over the term's enrollments of the
+registrations the educator teaches, grouped by registration and letter grade.
+Enrolled/graded counts and totals only count students who selected one of the
+educator's patterns (an EXISTS in the aggregate filter), so sections where
+nobody did still show up with zeros; the per-grade rows fold into the grade
+distribution in Python.
+
+The result is cached per educator and term. The key carries the catalog
+version (teaching assignments, courses, educators) and the term's roster
+version, which signals and the grade import bump on every enrollment write.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+
+from .models import Educator, Enrollment, Term, TimeSlot
+from . import catalog, db_routing
+
+CACHE_TIMEOUT = 60 * 60
+
+GRADE_ORDER = ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-', 'F']
+
+
+def roster_version_key(term_id):
+    return f"term:{term_id}:roster-version"
+
+
+def bump_rosters(term_ids):
+    """Expire the dashboards of these terms once the current transaction commits"""
+    term_ids = {term_id for term_id in term_ids if term_id is not None}
+
+    def bump():
+        for term_id in term_ids:
+            key = roster_version_key(term_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+
+    if term_ids:
+        transaction.on_commit(bump)
+
+
+def _versions(term_id):
+    keys = [catalog.VERSION_KEY, roster_version_key(term_id)]
+    found = cache.get_many(keys)
+    return [
+        found[key] if key in found else cache.get_or_set(key, time.time_ns, timeout=None)
+        for key in keys
+    ]
+
+
+def course_summaries(educator_id, term_id):
+    """The educator's courses this term with enrollment counts, average total of graded students and grade distribution"""
+    teaches = Exists(TimeSlot.objects.filter(educator_id=educator_id, pattern__registration=OuterRef('registration')))
+    taught_student = Exists(Enrollment.selected_patterns.through.objects.filter(
+        enrollment=OuterRef('pk'), schedulepattern__time_slots__educator_id=educator_id
+    ))
+    rows = Enrollment.objects.filter(teaches, term_id=term_id).order_by().values(
+        'registration_id', 'registration__course__courseCode', 'registration__course__courseName',
+        'registration__course__credits', 'registration__group_number', 'registration__capacity', 'letterGrade'
+    ).annotate(
+        students=Count('id', filter=taught_student),
+        totalSum=Sum('total', filter=taught_student)
+    )
+
+    courses = {}
+    for row in rows:
+        course = courses.get(row['registration_id'])
+        if course is None:
+            course = courses[row['registration_id']] = {
+                'registrationId': row['registration_id'],
+                'courseCode': row['registration__course__courseCode'],
+                'courseName': row['registration__course__courseName'],
+                'credits': row['registration__course__credits'],
+                'groupNumber': row['registration__group_number'],
+                'enrolledStudents': 0,
+                'capacity': row['registration__capacity'],
+                'gradedStudents': 0,
+                'averageTotal': None,
+                'gradeDistribution': {},
+                '_gradedTotal': 0,
+            }
+        course['enrolledStudents'] += row['students']
+        if row['letterGrade'] and row['students']:
+            course['gradedStudents'] += row['students']
+            course['gradeDistribution'][row['letterGrade']] = row['students']
+            course['_gradedTotal'] += row['totalSum'] or 0
+
+    results = sorted(courses.values(), key=lambda course: (course['courseCode'], course['groupNumber']))
+    for course in results:
+        graded_total = course.pop('_gradedTotal')
+        if course['gradedStudents']:
+            course['averageTotal'] = round(graded_total / course['gradedStudents'], 2)
+        distribution = course['gradeDistribution']
+        course['gradeDistribution'] = {grade: distribution[grade] for grade in GRADE_ORDER if grade in distribution}
+    return results
+
+
+def educator_courses(educator_id, global_settings):
+    """Dashboard payload, from the cache when nothing changed; None if there is no such educator"""
+    term_id = Term.current_id(global_settings)
+    key = f"educator-courses:{educator_id}:{term_id}:" + ':'.join(map(str, _versions(term_id)))
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    with db_routing.primary():
+        educator = Educator.objects.filter(educatorId=educator_id).values('educatorId', 'nameEn').first()
+        if educator is None:
+            return None
+
+        data = {
+            'educatorId': educator['educatorId'],
+            'educatorName': educator['nameEn'],
+            'academicYear': global_settings.current_academic_year,
+            'semester': global_settings.get_current_semester_display(),
+            'courses': course_summaries(educator_id, term_id)
+        }
+    cache.set(key, data, timeout=CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,158 @@
+"""
+Read replica routing.
+
+With a 'replica' database configured (DB_REPLICA_* settings) the read-only
+student/educator GET views (``ReplicaReadMixin`` and the async views) send
+their reads to the replica; everything else, and every write, uses the
+primary. The decision is per request: ReplicaRoutingMiddleware keeps a small
+state in a context variable that ReplicaRouter reads, so it also reaches
+queries the async views run in other threads.
+
+Read-your-writes: after a write request (any method but GET/HEAD/OPTIONS)
+its user is pinned to the primary for DATABASE_REPLICA_PIN_SECONDS (a key in
+the shared cache), so they see their own changes while the replica catches
+up. Students whose data someone else changed (e.g. grades) are pinned too,
+when their response cache generation is bumped, so their next responses are
+not cached from a replica that lacks the change. Shared data cached under a
+version any write may bump (catalog snapshots, dashboards, seat counters, the
+prerequisite graph) is always built inside ``primary()``.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA = 'replica'
+
+_request_state = contextvars.ContextVar('db_routing_request', default=None)
+_force_primary = contextvars.ContextVar('db_routing_force_primary', default=False)
+
+
+class RoutingState:
+    __slots__ = ('use_replica',)
+
+    def __init__(self):
+        self.use_replica = False
+
+
+def pin_key(username):
+    return f"db-pin:{username}"
+
+
+def pin(usernames):
+    """Send these users' reads to the primary for the next DATABASE_REPLICA_PIN_SECONDS"""
+    if REPLICA in settings.DATABASES and usernames:
+        cache.set_many(
+            {pin_key(username): 1 for username in usernames}, timeout=settings.DATABASE_REPLICA_PIN_SECONDS
+        )
+
+
+def _eligible(request, user):
+    state = _request_state.get()
+    if state is None or request.method not in SAFE_METHODS:
+        return None
+    if user is None or not user.is_authenticated:
+        return None
+    return state
+
+
+def use_replica(request, user):
+    """Read from the replica for the rest of this request, unless the user wrote recently"""
+    state = _eligible(request, user)
+    if state is not None:
+        state.use_replica = cache.get(pin_key(user.username)) is None
+
+
+async def ause_replica(request, user):
+    state = _eligible(request, user)
+    if state is not None:
+        state.use_replica = await cache.aget(pin_key(user.username)) is None
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside this block, whatever the request uses"""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and state.use_replica and not _force_primary.get():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Per-request routing state; pins the user to the primary after a write request"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if REPLICA not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        token = _request_state.set(RoutingState())
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        user = self._writer(request)
+        if user is not None:
+            pin([user.username])
+        return response
+
+    async def __acall__(self, request):
+        token = _request_state.set(RoutingState())
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        user = self._writer(request)
+        if user is not None:
+            await cache.aset(pin_key(user.username), 1, timeout=settings.DATABASE_REPLICA_PIN_SECONDS)
+        return response
+
+    def _writer(self, request):
+        """The authenticated user of a write request (DRF sets request.user on the Django request too)"""
+        if request.method in SAFE_METHODS:
+            return None
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user
+        return None
+
+
+class ReplicaReadMixin:
+    """For read-only DRF views: GET reads go to the replica once the user is authenticated"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        use_replica(request, request.user)
@@ -0,0 +1,245 @@
+"""
+Publish/subscribe fanout for seat changes.
+
+The enrollment write path publishes a small delta message on the channel
+``registration:<id>`` after every committed seat change; the seat stream
+endpoint subscribes to the registrations a student watches.
+
+Every message gets an increasing ``id`` and the last REPLAY_BUFFER_SIZE
+messages of each channel are kept, so a client that reconnects (or long-polls
+again) with the last id it saw gets what it missed in between. When older
+messages it has not seen were already dropped from the buffer, the replay is
+marked incomplete and the client must resync its seat counts.
+
+``LocalBroker`` keeps everything in process memory and is what tests and a
+single worker use. ``RedisBroker`` fans out across workers through Redis
+pub/sub. Pick one with the SEAT_EVENTS_BROKER setting (dotted path).
+"""
+import abc
+import asyncio
+import json
+import threading
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+SUBSCRIPTION_QUEUE_SIZE = 256
+REPLAY_BUFFER_SIZE = 500
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def registration_channel(registration_id):
+    return f"registration:{registration_id}"
+
+
+# messages: buffered messages after the cursor, oldest first; complete: False if some
+# were already dropped; last_id: id of the newest message published on any channel
+Replay = namedtuple('Replay', ['messages', 'complete', 'last_id'])
+
+
+class Broker(abc.ABC):
+    """Interface every broker implements"""
+
+    @abc.abstractmethod
+    def publish(self, channel, message):
+        """
+        Send a JSON-serializable dict, with an ``id`` added, and keep it in the
+        channel's replay buffer. Called from synchronous code.
+        """
+
+    @abc.abstractmethod
+    async def subscribe(self, channels):
+        """Return a subscription with ``async get(timeout)`` and ``async close()``"""
+
+    @abc.abstractmethod
+    async def replay(self, channels, since):
+        """Replay of the buffered messages of these channels with an id above since (None: none)"""
+
+
+class LocalSubscription:
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = list(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIPTION_QUEUE_SIZE)
+
+    def deliver(self, message):
+        """Thread-safe hand-off into the subscriber's event loop"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Event loop already closed, the subscriber is gone
+            pass
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow consumer: drop the message, the client resyncs from the catalog
+            pass
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker(Broker):
+    """In-process broker: only subscribers of the same worker receive messages"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._last_id = 0
+        self._buffers = {}
+        # channel -> id of the newest message dropped from its buffer
+        self._dropped = {}
+
+    def publish(self, channel, message):
+        # Numbered and handed over under the lock, so subscribers get ids in order
+        with self._lock:
+            self._last_id += 1
+            message = dict(message, id=self._last_id)
+            buffer = self._buffers.setdefault(channel, deque())
+            buffer.append(message)
+            if len(buffer) > REPLAY_BUFFER_SIZE:
+                self._dropped[channel] = buffer.popleft()['id']
+            for subscription in self._subscribers.get(channel, ()):
+                subscription.deliver(message)
+
+    async def subscribe(self, channels):
+        subscription = LocalSubscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    async def replay(self, channels, since):
+        with self._lock:
+            if since is None:
+                return Replay([], True, self._last_id)
+            complete = all(self._dropped.get(channel, 0) <= since for channel in channels)
+            messages = [
+                message for channel in channels for message in self._buffers.get(channel, ()) if message['id'] > since
+            ]
+            last_id = self._last_id
+        return Replay(sorted(messages, key=lambda message: message['id']), complete, last_id)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+
+class RedisSubscription:
+    def __init__(self, client, pubsub):
+        self.client = client
+        self.pubsub = pubsub
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            raise asyncio.TimeoutError
+        return json.loads(message['data'])
+
+    async def close(self):
+        await self.pubsub.unsubscribe()
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+# Number, buffer and publish a message in one step, so ids reach every
+# subscriber and buffer in order. KEYS: sequence, buffer, dropped id, channel.
+PUBLISH_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+local message = cjson.decode(ARGV[1])
+message['id'] = id
+local encoded = cjson.encode(message)
+redis.call('RPUSH', KEYS[2], encoded)
+if redis.call('LLEN', KEYS[2]) > tonumber(ARGV[2]) then
+    local dropped = cjson.decode(redis.call('LPOP', KEYS[2]))
+    redis.call('SET', KEYS[3], dropped['id'])
+end
+redis.call('PUBLISH', KEYS[4], encoded)
+return id
+"""
+
+
+class RedisBroker(Broker):
+    """Cross-worker broker over Redis pub/sub (requires the redis package)"""
+    prefix = 'sisapi:'
+
+    def __init__(self, url=None):
+        import redis
+
+        self.url = url or settings.REDIS_URL
+        self._client = redis.Redis.from_url(self.url)
+        self._publish = self._client.register_script(PUBLISH_SCRIPT)
+
+    def _keys(self, channel):
+        """(replay buffer, dropped id) keys of a channel"""
+        return f"{self.prefix}buffer:{channel}", f"{self.prefix}dropped:{channel}"
+
+    def publish(self, channel, message):
+        buffer_key, dropped_key = self._keys(channel)
+        self._publish(
+            keys=[self.prefix + 'sequence', buffer_key, dropped_key, self.prefix + channel],
+            args=[json.dumps(message), REPLAY_BUFFER_SIZE]
+        )
+
+    async def replay(self, channels, since):
+        import redis.asyncio
+
+        async with redis.asyncio.Redis.from_url(self.url) as client:
+            pipe = client.pipeline(transaction=False)
+            pipe.get(self.prefix + 'sequence')
+            if since is not None:
+                for channel in channels:
+                    buffer_key, dropped_key = self._keys(channel)
+                    pipe.lrange(buffer_key, 0, -1)
+                    pipe.get(dropped_key)
+            results = await pipe.execute()
+
+        last_id = int(results[0] or 0)
+        if since is None:
+            return Replay([], True, last_id)
+        messages = []
+        complete = True
+        for buffered, dropped in zip(results[1::2], results[2::2]):
+            messages.extend(message for message in map(json.loads, buffered) if message['id'] > since)
+            complete = complete and int(dropped or 0) <= since
+        return Replay(sorted(messages, key=lambda message: message['id']), complete, last_id)
+
+    async def subscribe(self, channels):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*[self.prefix + channel for channel in channels])
+        return RedisSubscription(client, pubsub)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.SEAT_EVENTS_BROKER)()
+    return _broker
+
+
+def publish_seat_change(registration_id, pattern_id, delta):
+    """Tell watchers a seat was taken (delta=1) or freed (delta=-1)"""
+    get_broker().publish(registration_channel(registration_id), {
+        'registrationId': registration_id,
+        'patternId': pattern_id,
+        'delta': delta,
+    })
@@ -0,0 +1,119 @@
+"""
+Incremental GPA bookkeeping.
+
+Every Semester row (one per student per term) stores running totals:
+qualityPoints, gradedHours, gradedCourses and ungradedCourses. They are
+updated by delta whenever an Enrollment is created, regraded or deleted,
+so the semester GPA and CGPA are read from a handful of stored numbers
+instead of walking every enrollment of the student.
+"""
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+from .models import Semester, Enrollment
+
+AGGREGATE_FIELDS = ['qualityPoints', 'gradedHours', 'gradedCourses', 'ungradedCourses']
+EMPTY_TOTALS = (Decimal('0'), 0, 0, 0)
+BATCH_SIZE = 500
+
+
+def grade_contribution(letter_grade, credits):
+    """What a single enrollment adds to its semester totals, in AGGREGATE_FIELDS order"""
+    if not letter_grade or not letter_grade.strip():
+        return (Decimal('0'), 0, 0, 1)
+
+    points = Semester.get_grade_points(letter_grade)
+    if points is None:  # Invalid grade: counts as graded but carries no points
+        return (Decimal('0'), 0, 1, 0)
+    return (Decimal(str(points)) * credits, credits, 1, 0)
+
+
+def apply_delta(semester_id, before, after):
+    """Move a semester's totals from one contribution to another with a single UPDATE"""
+    delta = [new - old for old, new in zip(before, after)]
+    if not any(delta):
+        return
+    Semester.objects.filter(pk=semester_id).update(**{
+        field: F(field) + change for field, change in zip(AGGREGATE_FIELDS, delta)
+    })
+
+
+def apply_grade_change(semester_id, old_grade, new_grade, credits):
+    apply_delta(
+        semester_id,
+        grade_contribution(old_grade, credits),
+        grade_contribution(new_grade, credits)
+    )
+
+
+def compute_aggregates(enrollments):
+    """
+    Recompute the totals from scratch for the given Enrollment queryset in one pass.
+    Returns {semester_id: {field: value}}; used for rebuilds and verification.
+    """
+    totals = {}
+    rows = enrollments.values_list('semester_id', 'letterGrade', 'registration__course__credits')
+    for semester_id, letter_grade, credits in rows.iterator():
+        contribution = grade_contribution(letter_grade, credits)
+        totals[semester_id] = tuple(total + part for total, part in zip(totals.get(semester_id, EMPTY_TOTALS), contribution))
+    return {semester_id: dict(zip(AGGREGATE_FIELDS, values)) for semester_id, values in totals.items()}
+
+
+def refresh_semester_gpa(semester, student):
+    """
+    Re-read the running totals and update the stored GPA/CGPA.
+    Incomplete semesters show a GPA of 0 and keep their previous CGPA.
+    """
+    semester.refresh_from_db(fields=AGGREGATE_FIELDS)
+
+    if semester.is_complete_semester():
+        semester.gpa = semester.calculate_gpa()
+        semester.cgpa = semester.calculate_cgpa(student)
+    else:
+        semester.gpa = 0.0
+
+    semester.save(update_fields=['gpa', 'cgpa'])
+    return semester
+
+
+def recompute_semesters(semester_ids):
+    """
+    Set-based refresh of many semesters at once (bulk grading, where signals do not fire):
+    rebuild their totals from enrollments, then update GPA/CGPA, in a fixed number of
+    queries however many semesters are involved. Returns {semester_id: Semester}.
+    """
+    semesters = {
+        semester.pk: semester
+        for semester in Semester.objects.filter(pk__in=semester_ids).select_related('academicYear')
+    }
+    if not semesters:
+        return semesters
+
+    totals = compute_aggregates(Enrollment.objects.filter(semester_id__in=list(semesters)))
+    empty = dict(zip(AGGREGATE_FIELDS, EMPTY_TOTALS))
+    for semester_id, semester in semesters.items():
+        for field, value in totals.get(semester_id, empty).items():
+            setattr(semester, field, value)
+    Semester.objects.bulk_update(semesters.values(), AGGREGATE_FIELDS, batch_size=BATCH_SIZE)
+
+    student_ids = {semester.academicYear.student_id for semester in semesters.values()}
+    cumulative = {
+        row['academicYear__student']: row
+        for row in Semester.objects.filter(
+            academicYear__student__in=student_ids,
+            ungradedCourses=0,
+            gradedHours__gt=0
+        ).values('academicYear__student').annotate(points=Sum('qualityPoints'), hours=Sum('gradedHours'))
+    }
+
+    for semester in semesters.values():
+        if semester.is_complete_semester():
+            semester.gpa = semester.calculate_gpa()
+            row = cumulative.get(semester.academicYear.student_id)
+            semester.cgpa = round(float(row['points']) / row['hours'], 2) if row else 0.0
+        else:
+            semester.gpa = 0.0
+    Semester.objects.bulk_update(semesters.values(), ['gpa', 'cgpa'], batch_size=BATCH_SIZE)
+
+    return semesters
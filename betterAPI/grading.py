@@ -0,0 +1,128 @@
+"""
+Set-based grade import used by EducatorUpdateGrades.
+
+All target enrollments are loaded in one query (with a flag telling whether the
+educator teaches the student), every row is validated in memory, the batch is
+written with bulk_update and each affected semester's GPA/CGPA is recomputed
+once at the end.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Enrollment, SchedulePattern
+from . import gpa, response_cache, dashboard
+
+GRADE_FIELDS = ['coursework', 'exam', 'total', 'letterGrade', 'numericGrade']
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_score(value, label, maximum):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise Exception(f"{label} must be a number")
+    try:
+        score = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise Exception(f"{label} must be a number")
+    # Scores are stored as integers; 12.7 is rejected rather than cut to 12
+    if not score.is_finite() or score != score.to_integral_value():
+        raise Exception(f"{label} must be a whole number")
+    score = int(score)
+    if score < 0 or score > maximum:
+        raise Exception(f"{label} must be between 0 and {maximum}")
+    return score
+
+
+def load_enrollments(educator, registration, enrollment_ids):
+    """One query for every enrollment in the batch, annotated with teachesStudent"""
+    taught = SchedulePattern.objects.filter(
+        enrollments=OuterRef('pk'),
+        time_slots__educator=educator
+    )
+    enrollments = Enrollment.objects.filter(
+        registration=registration,
+        id__in=enrollment_ids
+    ).select_related('student').annotate(teachesStudent=Exists(taught))
+    return {enrollment.id: enrollment for enrollment in enrollments}
+
+
+def apply_row(enrollment, update_data):
+    """Validate one row against its already loaded enrollment and apply it in memory"""
+    if not enrollment.teachesStudent:
+        raise Exception("You don't teach this student")
+
+    if 'coursework' in update_data:
+        enrollment.coursework = _parse_score(update_data['coursework'], 'Coursework', enrollment.courseworkMax or 50)
+    if 'exam' in update_data:
+        enrollment.exam = _parse_score(update_data['exam'], 'Exam', enrollment.examMax or 50)
+
+    enrollment.calculate_total_and_grade()
+
+
+def import_grades(educator, registration, grade_updates):
+    """
+    Apply a batch of grade rows. The batch is all-or-nothing: if any row fails
+    nothing is written and every failure is reported.
+    Returns (successful, failed).
+    """
+    enrollment_ids = {
+        _parse_id(row.get('enrollmentId')) for row in grade_updates if isinstance(row, dict)
+    } - {None}
+    enrollments = load_enrollments(educator, registration, enrollment_ids)
+
+    changed = {}
+    failed = []
+    for row_number, update_data in enumerate(grade_updates, start=1):
+        if not isinstance(update_data, dict):
+            failed.append({
+                'row': row_number, 'enrollmentId': None,
+                'error': "Expected an object with enrollmentId, coursework and exam"
+            })
+            continue
+        enrollment_id = update_data.get('enrollmentId')
+        try:
+            enrollment = enrollments.get(_parse_id(enrollment_id))
+            if enrollment is None:
+                raise Exception("Enrollment not found")
+            apply_row(enrollment, update_data)
+            changed[enrollment.id] = enrollment
+        except Exception as e:
+            failed.append({'row': row_number, 'enrollmentId': enrollment_id, 'error': str(e)})
+
+    if failed or not changed:
+        return [], failed
+
+    with transaction.atomic():
+        Enrollment.objects.bulk_update(changed.values(), GRADE_FIELDS, batch_size=gpa.BATCH_SIZE)
+        semesters = gpa.recompute_semesters({enrollment.semester_id for enrollment in changed.values()})
+        # bulk_update skips signals, so the students' cached responses are expired here
+        response_cache.bump_generation({enrollment.student_id for enrollment in changed.values()})
+        dashboard.bump_rosters({enrollment.term_id for enrollment in changed.values()})
+
+    successful = []
+    for enrollment in changed.values():
+        # bulk_update skips signals; the totals were rebuilt above
+        enrollment._loaded_letterGrade = enrollment.letterGrade
+        semester = semesters[enrollment.semester_id]
+        successful.append({
+            'enrollmentId': enrollment.id,
+            'studentId': enrollment.student.studentId,
+            'studentName': enrollment.student.nameEn,
+            'coursework': enrollment.coursework,
+            'exam': enrollment.exam,
+            'total': enrollment.total,
+            'letterGrade': enrollment.letterGrade,
+            'numericGrade': float(enrollment.numericGrade) if enrollment.numericGrade else 0.0,
+            'semesterGPA': float(semester.gpa) if semester.gpa else 0.0,
+            'cumulativeGPA': float(semester.cgpa) if semester.cgpa else 0.0
+        })
+    return successful, failed
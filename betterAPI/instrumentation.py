@@ -0,0 +1,237 @@
+"""
+Per-request instrumentation.
+
+``RequestMetricsMiddleware`` counts the SQL queries and SQL time of every
+request (through a connection execute wrapper, so DEBUG is not needed), times
+the whole request and records the response size. DRF views that use
+``InstrumentedViewMixin`` also report how long rendering the response took and
+may declare a ``query_budget``.
+
+Each response carries a Server-Timing header, and the totals per route are
+kept in process memory and served in Prometheus text format by the admin-only
+``/metrics/`` endpoint. Every worker process reports its own numbers.
+
+Query budgets are logged when exceeded; with ENFORCE_QUERY_BUDGETS (set it in
+the test settings or CI environment) the request fails instead, so an N+1
+regression breaks the build.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Numbers collected while a single request is handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.query_budget = None
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - start
+
+    def server_timing(self, total_seconds):
+        parts = [f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"']
+        if self.render_seconds:
+            parts.append(f'render;dur={self.render_seconds * 1000:.1f}')
+        parts.append(f'total;dur={total_seconds * 1000:.1f}')
+        return ', '.join(parts)
+
+
+class MetricsRegistry:
+    """Process-local totals per (route, method)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, method, status_code, metrics, total_seconds, response_bytes):
+        with self._lock:
+            entry = self._routes.setdefault((route, method), {
+                'statuses': {},
+                'count': 0,
+                'seconds': 0.0,
+                'buckets': [0] * len(DURATION_BUCKETS),
+                'queries': 0,
+                'dbSeconds': 0.0,
+                'renderSeconds': 0.0,
+                'bytes': 0,
+                'budgetExceeded': 0,
+            })
+            entry['statuses'][status_code] = entry['statuses'].get(status_code, 0) + 1
+            entry['count'] += 1
+            entry['seconds'] += total_seconds
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if total_seconds <= bound:
+                    entry['buckets'][i] += 1
+            entry['queries'] += metrics.queries
+            entry['dbSeconds'] += metrics.db_seconds
+            entry['renderSeconds'] += metrics.render_seconds
+            entry['bytes'] += response_bytes
+            if metrics.query_budget is not None and metrics.queries > metrics.query_budget:
+                entry['budgetExceeded'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: dict(entry, statuses=dict(entry['statuses']), buckets=list(entry['buckets']))
+                for key, entry in self._routes.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = MetricsRegistry()
+
+
+def _labels(route, method, **extra):
+    labels = {'route': route, 'method': method, **extra}
+    return '{' + ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in labels.items()
+    ) + '}'
+
+
+def prometheus_text():
+    """All recorded totals in the Prometheus text exposition format"""
+    snapshot = sorted(registry.snapshot().items())
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+
+    metric('sisapi_requests_total', 'counter', 'Requests handled', [
+        f"sisapi_requests_total{_labels(route, method, status=status_code)} {count}"
+        for (route, method), entry in snapshot
+        for status_code, count in sorted(entry['statuses'].items())
+    ])
+
+    histogram = []
+    for (route, method), entry in snapshot:
+        for bound, count in zip(DURATION_BUCKETS, entry['buckets']):
+            histogram.append(f"sisapi_request_duration_seconds_bucket{_labels(route, method, le=bound)} {count}")
+        histogram.append(f"sisapi_request_duration_seconds_bucket{_labels(route, method, le='+Inf')} {entry['count']}")
+        histogram.append(f"sisapi_request_duration_seconds_sum{_labels(route, method)} {entry['seconds']:.6f}")
+        histogram.append(f"sisapi_request_duration_seconds_count{_labels(route, method)} {entry['count']}")
+    metric('sisapi_request_duration_seconds', 'histogram', 'Request latency', histogram)
+
+    for name, field, help_text, fmt in (
+        ('sisapi_db_queries_total', 'queries', 'SQL queries executed', '{}'),
+        ('sisapi_db_duration_seconds_total', 'dbSeconds', 'Time spent in SQL', '{:.6f}'),
+        ('sisapi_render_duration_seconds_total', 'renderSeconds', 'Time spent rendering DRF responses', '{:.6f}'),
+        ('sisapi_response_bytes_total', 'bytes', 'Response body bytes', '{}'),
+        ('sisapi_query_budget_exceeded_total', 'budgetExceeded', 'Requests over their view query budget', '{}'),
+    ):
+        metric(name, 'counter', help_text, [
+            f"{name}{_labels(route, method)} {fmt.format(entry[field])}" for (route, method), entry in snapshot
+        ])
+
+    return '\n'.join(lines) + '\n'
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+def _response_bytes(response):
+    if getattr(response, 'streaming', False):
+        return 0
+    return len(response.content)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        metrics = request.metrics = RequestMetrics()
+        # Every database: reads may go to the replica (see db_routing.py)
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(metrics.record_query))
+            response = self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        # Async views run their queries in other threads; only timing is recorded
+        metrics = request.metrics = RequestMetrics()
+        response = await self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total_seconds = time.perf_counter() - metrics.started
+        response['Server-Timing'] = metrics.server_timing(total_seconds)
+        registry.record(
+            _route(request), request.method, response.status_code, metrics, total_seconds, _response_bytes(response)
+        )
+        return response
+
+
+class InstrumentedViewMixin:
+    """
+    For DRF views: times response rendering and checks ``query_budget``, the
+    most queries one request of this view may run.
+    """
+    query_budget = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        metrics = getattr(request._request, 'metrics', None)
+        if metrics is None:
+            return response
+
+        metrics.query_budget = self.query_budget
+        if self.query_budget is not None and metrics.queries > self.query_budget:
+            message = (
+                f"{type(self).__name__} ran {metrics.queries} queries, "
+                f"over its budget of {self.query_budget}"
+            )
+            if getattr(settings, 'ENFORCE_QUERY_BUDGETS', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+        render = response.render
+
+        def timed_render():
+            start = time.perf_counter()
+            try:
+                return render()
+            finally:
+                metrics.render_seconds += time.perf_counter() - start
+
+        response.render = timed_render
+        return response
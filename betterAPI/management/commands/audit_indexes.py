@@ -0,0 +1,101 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from betterAPI.models import Enrollment, TimeSlot, Registration, Semester, SchedulePattern
+from betterAPI.transcript import transcript_rows
+
+PASSING_GRADES = ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-']
+
+SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?:TABLE )?"?(\w+)"?'),
+    'postgresql': re.compile(r'\bSeq Scan on "?(\w+)"?'),
+}
+
+
+def hot_queries(sample):
+    """(name, queryset, tables that must not be scanned) for the main query of each hot view"""
+    enrollment = Enrollment._meta.db_table
+    selected_patterns = Enrollment.selected_patterns.through._meta.db_table
+    return [
+        ('student passed courses (info, registration, catalog)',
+         Enrollment.objects.filter(student_id=sample['student'], letterGrade__in=PASSING_GRADES),
+         [enrollment]),
+        ('student transcript (grades)',
+         transcript_rows(sample['student']),
+         [enrollment]),
+        ('student current term (timetable)',
+         Enrollment.objects.filter(student_id=sample['student'], term_id=sample['term']),
+         [enrollment]),
+        ('course roster (educator course info)',
+         Enrollment.objects.filter(registration_id=sample['registration'], term_id=sample['term']),
+         [enrollment]),
+        ('ungraded roster',
+         Enrollment.objects.filter(registration_id=sample['registration'], letterGrade__isnull=True),
+         [enrollment]),
+        ('registration semester enrollments',
+         Enrollment.objects.filter(registration_id=sample['registration'], semester_id=sample['semester']),
+         [enrollment]),
+        ('semester occupancy',
+         SchedulePattern.objects.filter(enrollments__semester_id=sample['semester']).values_list('occupancy'),
+         [selected_patterns]),
+        ('educator day slots (timetable, booking checks)',
+         TimeSlot.objects.filter(educator_id=sample['educator'], day=sample['day']),
+         [TimeSlot._meta.db_table]),
+        ('active course offerings',
+         Registration.objects.filter(is_active=True, course_id=sample['course']),
+         [Registration._meta.db_table]),
+        ('student semester lookup (registration)',
+         Semester.objects.filter(academicYear_id=sample['academic_year'], semesterName=sample['semester_name']),
+         [Semester._meta.db_table]),
+    ]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the main query of each hot view and fail if one scans a large table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-analyze', action='store_true', help="Do not refresh planner statistics first")
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan")
+
+    def handle(self, *args, **options):
+        pattern = SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"EXPLAIN audit does not support the {connection.vendor} backend")
+
+        sample_enrollment = Enrollment.objects.select_related('semester', 'registration').first()
+        sample_slot = TimeSlot.objects.filter(educator__isnull=False).first()
+        if sample_enrollment is None or sample_slot is None:
+            raise CommandError("No enrollments/time slots to audit against; seed the database first")
+
+        sample = {
+            'student': sample_enrollment.student_id,
+            'registration': sample_enrollment.registration_id,
+            'course': sample_enrollment.registration.course_id,
+            'semester': sample_enrollment.semester_id,
+            'semester_name': sample_enrollment.semester.semesterName,
+            'academic_year': sample_enrollment.semester.academicYear_id,
+            'term': sample_enrollment.term_id,
+            'educator': sample_slot.educator_id,
+            'day': sample_slot.day,
+        }
+
+        if not options['no_analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        failures = []
+        for name, queryset, tables in hot_queries(sample):
+            plan = queryset.explain()
+            scanned = {table for table in pattern.findall(plan) if table in tables}
+            if options['verbose_plans']:
+                self.stdout.write(f"-- {name}\n{plan}\n")
+            if scanned:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"SCAN  {name}: {', '.join(sorted(scanned))}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"OK    {name}"))
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot query plan(s) use a sequential scan")
@@ -0,0 +1,270 @@
+import json
+import random
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import resolve
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from betterAPI.authentication import ADMIN, EDUCATOR, STUDENT
+from betterAPI.bench import run_concurrently, summarize
+from betterAPI.models import (
+    AcademicYear, Course, Department, Educator, Enrollment, GlobalSettings, Registration,
+    SchedulePattern, Semester, Student, Term, TimeSlot
+)
+
+# Routes in betterAPI/urls.py that the replay does not exercise, and why
+SKIPPED = {
+    'auth/login/': "needs real account passwords",
+    'auth/refresh/': "needs a refresh token",
+    'user/create/': "creates login accounts",
+    'student/seat-events/': "streaming endpoint, ASGI only",
+    'student/register/ticket/<ticket>/': "only used in queued registration mode",
+}
+
+
+class Sample:
+    """IDs the request mix draws from, read once before the run"""
+
+    def __init__(self, size):
+        term_id = Term.current_id()
+        self.students = list(Student.objects.order_by('pk').values_list('pk', flat=True)[:size])
+        teaching = list(
+            TimeSlot.objects.filter(educator__isnull=False, pattern__registration__is_active=True)
+            .values_list('educator_id', 'pattern__registration_id', 'educator__type')
+            .distinct()[:size]
+        )
+        self.teaching = [(educator_id, registration_id) for educator_id, registration_id, _ in teaching]
+        lecturers = {
+            registration_id: educator_id
+            for educator_id, registration_id, educator_type in teaching
+            if educator_type != 'Teaching Assistant'
+        }
+        self.gradable = [
+            (lecturers[registration_id], registration_id, enrollment_id)
+            for enrollment_id, registration_id in Enrollment.objects.filter(
+                term_id=term_id, registration_id__in=list(lecturers)
+            ).values_list('id', 'registration_id')[:size]
+        ]
+        self.lectures = list(
+            SchedulePattern.objects.filter(registration__is_active=True, pattern_type='LEC')
+            .values_list('registration_id', 'id')[:size]
+        )
+        self.detail_ids = {
+            'course': Course.objects.values_list('pk', flat=True).first(),
+            'department': Department.objects.values_list('pk', flat=True).first(),
+            'educator': Educator.objects.values_list('pk', flat=True).first(),
+            'student': self.students[0] if self.students else None,
+            'registration': Registration.objects.values_list('pk', flat=True).first(),
+            'enrollment': Enrollment.objects.values_list('pk', flat=True).first(),
+            'academic-year': AcademicYear.objects.values_list('pk', flat=True).first(),
+            'semester': Semester.objects.values_list('pk', flat=True).first(),
+            'schedule-pattern': SchedulePattern.objects.values_list('pk', flat=True).first(),
+            'time-slot': TimeSlot.objects.values_list('pk', flat=True).first(),
+        }
+
+    def check(self):
+        if not (self.students and self.teaching and self.lectures):
+            raise CommandError("Not enough data to replay; run generate_university first")
+
+
+def bench_user(username, role=None, is_staff=False):
+    """Stands in for the ClaimsUser built from a token (see authentication.py)"""
+    return SimpleNamespace(
+        username=username, pk=username, is_authenticated=True, is_anonymous=False, is_staff=is_staff,
+        is_active=True, role=role, profile_id=username if role in (STUDENT, EDUCATOR) else None
+    )
+
+
+def scenarios(sample, include_writes, include_heavy):
+    """(route, weight, build(rng) -> (method, path, user, data))"""
+    def student_get(path):
+        return lambda rng: ('get', path, bench_user(rng.choice(sample.students), STUDENT), None)
+
+    def educator_get(path_template):
+        def build(rng):
+            educator_id, registration_id = rng.choice(sample.teaching)
+            return 'get', path_template.format(registration_id=registration_id), bench_user(educator_id, EDUCATOR), None
+        return build
+
+    def admin_get(path):
+        return lambda rng: ('get', path, bench_user('bench-admin', ADMIN, is_staff=True), None)
+
+    def register(rng):
+        registration_id, pattern_id = rng.choice(sample.lectures)
+        payload = [{'registrationId': registration_id, 'schedulePatterns': [{'patternId': pattern_id}]}]
+        return 'post', '/student/register/', bench_user(rng.choice(sample.students), STUDENT), payload
+
+    def grade(rng):
+        educator_id, registration_id, enrollment_id = rng.choice(sample.gradable)
+        payload = [{'enrollmentId': enrollment_id, 'coursework': rng.randint(20, 50), 'exam': rng.randint(20, 50)}]
+        return 'put', f"/educator/course/{registration_id}/grades/", bench_user(educator_id, EDUCATOR), payload
+
+    mix = [
+        ('student/info/', 10, student_get('/student/info/')),
+        ('student/grades/', 8, student_get('/student/grades/')),
+        ('student/current-semester/', 8, student_get('/student/current-semester/')),
+        ('student/timetable/', 12, student_get('/student/timetable/')),
+        ('student/available-registrations/', 12, student_get('/student/available-registrations/')),
+        ('current-semester/', 4, student_get('/current-semester/')),
+        ('auth/me/', 2, student_get('/auth/me/')),
+        ('educator/info/', 3, educator_get('/educator/info/')),
+        ('educator/current-courses/', 4, educator_get('/educator/current-courses/')),
+        ('educator/course/<id>/', 4, educator_get('/educator/course/{registration_id}/')),
+        ('educator/timetable/', 3, educator_get('/educator/timetable/')),
+        ('settings/', 1, admin_get('/settings/')),
+        ('registration-queue/metrics/', 1, admin_get('/registration-queue/metrics/')),
+        ('time-slots/conflicts/', 1, admin_get('/time-slots/conflicts/')),
+        ('departments/', 1, admin_get('/departments/')),
+        ('courses/', 1, admin_get('/courses/')),
+        ('educators/', 1, admin_get('/educators/')),
+    ]
+    for route, pk in sample.detail_ids.items():
+        if pk is not None:
+            mix.append((f"{route}/<id>/", 1, admin_get(f"/{route}/{pk}/")))
+    if include_writes:
+        mix.append(('student/register/', 4, register))
+        if sample.gradable:
+            mix.append(('educator/course/<id>/grades/', 1, grade))
+    if include_heavy:
+        # Unpaginated admin lists over the big tables
+        for route in ('students/', 'academic-years/', 'semesters/', 'registrations/',
+                      'enrollments/', 'schedule-patterns/', 'time-slots/'):
+            mix.append((route, 1, admin_get(f"/{route}")))
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a weighted mix of student, educator and admin requests through the URLconf and "
+        "report throughput, p50/p95/p99 latency and queries per request, optionally against a baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--sample', type=int, default=2000, help="Students/educators/enrollments to draw from")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--read-only', action='store_true', help="Skip the registration and grading writes")
+        parser.add_argument('--include-heavy', action='store_true', help="Also replay unpaginated admin lists")
+        parser.add_argument('--output', help="Write the JSON report to this file (e.g. to use as a baseline)")
+        parser.add_argument('--baseline', help="Compare against a previous JSON report and fail on regressions")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative p95 slowdown")
+
+    def handle(self, *args, **options):
+        if (connection.vendor == 'sqlite' and not settings.SQLITE_CONCURRENCY_MODE
+                and not options['read_only'] and options['workers'] > 1):
+            # Concurrent writers fail with "database is locked" instead of waiting (see sqlite_writes.py)
+            raise CommandError(
+                "Concurrent writes on SQLite need SQLITE_CONCURRENCY_MODE=1; "
+                "run with it, or pass --read-only or --workers 1"
+            )
+
+        sample = Sample(options['sample'])
+        sample.check()
+
+        rng = random.Random(options['seed'])
+        mix = scenarios(sample, not options['read_only'], options['include_heavy'])
+        routes = [route for route, _, _ in mix]
+        picked = rng.choices(range(len(mix)), weights=[weight for _, weight, _ in mix], k=options['requests'])
+        jobs = [(routes[index], *mix[index][2](rng)) for index in picked]
+
+        factory = APIRequestFactory()
+
+        def replay(job):
+            route, method, path, user, data = job
+            if data is None:
+                request = getattr(factory, method)(path)
+            else:
+                request = getattr(factory, method)(path, data, format='json')
+            force_authenticate(request, user=user)
+            match = resolve(path)
+            with CaptureQueriesContext(connection) as queries:
+                response = match.func(request, *match.args, **match.kwargs)
+            return response.status_code, len(queries)
+
+        global_settings = GlobalSettings.load()
+        was_open = global_settings.registration_open
+        if not options['read_only'] and not was_open:
+            global_settings.registration_open = True
+            global_settings.save()
+        try:
+            # Few users send most of the mix; throttle cost is measured by bench_throttle
+            with override_settings(THROTTLE_ENABLED=False):
+                results, latencies, elapsed = run_concurrently(replay, jobs, options['workers'])
+        finally:
+            if global_settings.registration_open != was_open:
+                global_settings.registration_open = was_open
+                global_settings.save()
+
+        report = {
+            'config': {key: options[key] for key in ('requests', 'workers', 'sample', 'seed', 'read_only', 'include_heavy')},
+            'overall': self.summarize(jobs, results, latencies, elapsed),
+            'endpoints': {},
+            'skipped': SKIPPED,
+        }
+        for route in dict.fromkeys(route for route, *_ in jobs):
+            indexes = [i for i, job in enumerate(jobs) if job[0] == route]
+            report['endpoints'][route] = self.summarize(
+                [jobs[i] for i in indexes], [results[i] for i in indexes], [latencies[i] for i in indexes], elapsed
+            )
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+
+        failing = {route: summary['errors'] for route, summary in report['endpoints'].items() if summary['errors']}
+        if failing:
+            for route, errors in failing.items():
+                self.stdout.write(self.style.ERROR(f"{route}: {errors} request(s) raised or returned 5xx"))
+            raise CommandError(f"{report['overall']['errors']} request(s) failed; the numbers are not a valid baseline")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'])
+
+    def summarize(self, jobs, results, latencies, elapsed):
+        summary = summarize(latencies, elapsed)
+        statuses = {}
+        queries = []
+        for result in results:
+            if isinstance(result, Exception):
+                status_code = type(result).__name__
+            else:
+                status_code, query_count = result
+                queries.append(query_count)
+            statuses[str(status_code)] = statuses.get(str(status_code), 0) + 1
+        summary.update({
+            'avgQueries': round(sum(queries) / len(queries), 2) if queries else 0.0,
+            'maxQueries': max(queries) if queries else 0,
+            'statusCodes': statuses,
+            'errors': sum(count for code, count in statuses.items() if not code.isdigit() or int(code) >= 500),
+        })
+        return summary
+
+    def compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+        regressions = []
+        for route, current in report['endpoints'].items():
+            previous = baseline.get('endpoints', {}).get(route)
+            if previous is None:
+                continue
+            if current['p95Ms'] > previous['p95Ms'] * (1 + tolerance) and current['p95Ms'] - previous['p95Ms'] > 1:
+                regressions.append(f"{route}: p95 {previous['p95Ms']}ms -> {current['p95Ms']}ms")
+            if current['avgQueries'] > previous['avgQueries'] + 0.5:
+                regressions.append(f"{route}: queries {previous['avgQueries']} -> {current['avgQueries']}")
+            if current['errors'] > previous['errors']:
+                regressions.append(f"{route}: errors {previous['errors']} -> {current['errors']}")
+
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(regression))
+            raise CommandError(f"{len(regressions)} regression(s) against {baseline_path}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}"))
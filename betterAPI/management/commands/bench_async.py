@@ -0,0 +1,168 @@
+import asyncio
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+from betterAPI import response_cache
+from betterAPI.authentication import RoleTokenObtainPairSerializer
+from betterAPI.bench import run_concurrently, summarize
+from betterAPI.models import Enrollment, Term, TimeSlot
+
+# (name, DRF path, async path, who calls it, weight)
+ROUTES = [
+    ('student/info/', '/student/info/', '/async/student/info/', 'student', 4),
+    ('student/grades/', '/student/grades/', '/async/student/grades/', 'student', 3),
+    ('student/current-semester/', '/student/current-semester/', '/async/student/current-semester/', 'student', 3),
+    ('student/timetable/', '/student/timetable/', '/async/student/timetable/', 'student', 4),
+    ('student/available-registrations/', '/student/available-registrations/',
+     '/async/student/available-registrations/', 'student', 2),
+    ('educator/info/', '/educator/info/', '/async/educator/info/', 'educator', 1),
+    ('educator/current-courses/', '/educator/current-courses/', '/async/educator/current-courses/', 'educator', 1),
+    ('educator/timetable/', '/educator/timetable/', '/async/educator/timetable/', 'educator', 1),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Send the same read request mix to the DRF views through the WSGI handler (a thread per "
+        "request) and to their async versions through the ASGI handler (one event loop), and "
+        "compare throughput and latency"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight at once")
+        parser.add_argument('--sample', type=int, default=500, help="Students/educators to draw from")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep-users', action='store_true', help="Keep the login accounts created for the run")
+
+    def handle(self, *args, **options):
+        term_id = Term.current_id()
+        users = {
+            'student': list(
+                Enrollment.objects.filter(term_id=term_id).order_by('student_id')
+                .values_list('student_id', flat=True).distinct()[:options['sample']]
+            ),
+            'educator': list(
+                TimeSlot.objects.filter(educator__isnull=False, pattern__registration__is_active=True)
+                .order_by('educator_id').values_list('educator_id', flat=True).distinct()[:options['sample']]
+            ),
+        }
+        if not users['student'] or not users['educator']:
+            raise CommandError("No current-term students or educators; run generate_university first")
+
+        created = self.ensure_accounts(users['student'] + users['educator'])
+        try:
+            tokens = {
+                user.username: f"Bearer {RoleTokenObtainPairSerializer.get_token(user).access_token}"
+                for user in User.objects.filter(username__in=users['student'] + users['educator'])
+            }
+            rng = random.Random(options['seed'])
+            picked = rng.choices(ROUTES, weights=[route[4] for route in ROUTES], k=options['requests'])
+            jobs = [(route, tokens[rng.choice(users[route[3]])]) for route in picked]
+
+            with override_settings(THROTTLE_ENABLED=False):
+                mismatches = self.compare_responses(users, tokens)
+
+                # Same starting point for both runs: nothing in the response cache
+                response_cache.bump_generation(users['student'])
+                wsgi = self.run_wsgi(jobs, options['concurrency'])
+                response_cache.bump_generation(users['student'])
+                asgi = asyncio.run(self.run_asgi(jobs, options['concurrency']))
+        finally:
+            if not options['keep_users']:
+                User.objects.filter(pk__in=created).delete()
+
+        report = {
+            'config': {key: options[key] for key in ('requests', 'concurrency', 'sample', 'seed')},
+            'wsgi': wsgi,
+            'asgi': asgi,
+            'throughputRatio': round(asgi['overall']['throughput'] / wsgi['overall']['throughput'], 2)
+            if wsgi['overall']['throughput'] else None,
+            'mismatches': mismatches,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if mismatches:
+            raise CommandError(f"Async responses differ from the DRF ones for {', '.join(mismatches)}")
+
+    def ensure_accounts(self, usernames):
+        """Login accounts for the sampled students/educators; returns the pks of the ones created"""
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        missing = []
+        for username in usernames:
+            if username not in existing:
+                user = User(username=username)
+                user.set_unusable_password()
+                missing.append(user)
+        User.objects.bulk_create(missing)
+        return list(User.objects.filter(username__in=[user.username for user in missing]).values_list('pk', flat=True))
+
+    def compare_responses(self, users, tokens):
+        """Names of the routes whose async version answers differently for the first sampled user"""
+        client = Client()
+        async_client = AsyncClient()
+        mismatches = []
+        for name, sync_path, async_path, role, _ in ROUTES:
+            username = users[role][0]
+            headers = {'Authorization': tokens[username], 'Host': 'localhost'}
+            # The two share the response cache, so build each answer from the database
+            response_cache.bump_generation([username])
+            expected = client.get(sync_path, headers=headers)
+            response_cache.bump_generation([username])
+            actual = asyncio.run(async_client.get(async_path, headers=headers))
+            if expected.status_code != actual.status_code or expected.json() != actual.json():
+                mismatches.append(name)
+        return mismatches
+
+    def run_wsgi(self, jobs, concurrency):
+        def call(job):
+            route, token = job
+            response = Client().get(route[1], headers={'Authorization': token, 'Host': 'localhost'})
+            return response.status_code
+
+        results, latencies, elapsed = run_concurrently(call, jobs, concurrency)
+        return self.summarize(jobs, results, latencies, elapsed)
+
+    async def run_asgi(self, jobs, concurrency):
+        client = AsyncClient()
+        limit = asyncio.Semaphore(concurrency)
+        results = [None] * len(jobs)
+        latencies = [0.0] * len(jobs)
+
+        async def call(index, job):
+            route, token = job
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(route[2], headers={'Authorization': token, 'Host': 'localhost'})
+                    results[index] = response.status_code
+                except Exception as e:
+                    results[index] = e
+                latencies[index] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(call(index, job) for index, job in enumerate(jobs)))
+        elapsed = time.perf_counter() - start
+        return self.summarize(jobs, results, latencies, elapsed)
+
+    def summarize(self, jobs, results, latencies, elapsed):
+        statuses = {}
+        for result in results:
+            key = type(result).__name__ if isinstance(result, Exception) else str(result)
+            statuses[key] = statuses.get(key, 0) + 1
+
+        endpoints = {}
+        for name, *_ in ROUTES:
+            route_latencies = [latency for (route, _), latency in zip(jobs, latencies) if route[0] == name]
+            if route_latencies:
+                endpoints[name] = summarize(route_latencies, elapsed)
+
+        return {
+            'overall': dict(summarize(latencies, elapsed), statusCodes=statuses),
+            'endpoints': endpoints,
+        }
@@ -0,0 +1,75 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from betterAPI.timetable import PERIODS_PER_DAY, BookingIndex, normalize_location, scan_booking_conflicts
+
+
+class Command(BaseCommand):
+    help = "Benchmark the educator/room double-booking scan on a synthetic term (no database needed)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', type=int, default=20000)
+        parser.add_argument('--educators', type=int, default=800)
+        parser.add_argument('--locations', type=int, default=400)
+        parser.add_argument('--checks', type=int, default=10000, help="Single-slot checks to time")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = []
+        for slot_id in range(1, options['slots'] + 1):
+            start_period = rng.randint(1, PERIODS_PER_DAY - 1)
+            rows.append((
+                slot_id,
+                rng.randint(0, 5),
+                start_period,
+                min(PERIODS_PER_DAY, start_period + rng.randint(0, 2)),
+                rng.randrange(options['educators']) if rng.random() < 0.9 else None,
+                f"R{rng.randrange(options['locations'])}" if rng.random() < 0.95 else None,
+            ))
+        rows.sort(key=lambda row: (row[1], row[2], row[0]))
+
+        start = time.perf_counter()
+        clashes = scan_booking_conflicts(rows)
+        scan_seconds = time.perf_counter() - start
+
+        # Reference: compare every slot with the earlier slots of the same educator/room and day
+        start = time.perf_counter()
+        groups = {}
+        reference = 0
+        for row in rows:
+            slot_id, day, start_period, end_period, educator_id, location = row
+            keys = []
+            if educator_id is not None:
+                keys.append(('educator', educator_id, day))
+            if normalize_location(location):
+                keys.append(('location', normalize_location(location), day))
+            for key in keys:
+                earlier = groups.setdefault(key, [])
+                if any(other_start <= end_period and other_end >= start_period for other_start, other_end in earlier):
+                    reference += 1
+                earlier.append((start_period, end_period))
+        reference_seconds = time.perf_counter() - start
+
+        # Single-slot checks against a fully built index (what a TimeSlot write does)
+        index = BookingIndex()
+        for row in rows:
+            index.add(row)
+        start = time.perf_counter()
+        for _ in range(options['checks']):
+            probe = list(rng.choice(rows))
+            probe[0] = None
+            index.add(tuple(probe))
+        check_seconds = time.perf_counter() - start
+
+        self.stdout.write(json.dumps({
+            'slots': len(rows),
+            'conflicts': len(clashes),
+            'scanMs': round(scan_seconds * 1000, 2),
+            'pairwiseMs': round(reference_seconds * 1000, 2),
+            'checkUsPerSlot': round(check_seconds / options['checks'] * 1e6, 2),
+            'resultsMatch': len(clashes) == reference,
+        }, indent=2))
@@ -0,0 +1,57 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from betterAPI.prerequisites import PrerequisiteGraph
+
+
+class Command(BaseCommand):
+    help = "Benchmark the prerequisite graph on a synthetic catalog (no database needed)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=2000)
+        parser.add_argument('--max-prerequisites', type=int, default=4)
+        parser.add_argument('--students', type=int, default=1000, help="Eligibility queries to run")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        codes = [f"C{i:05d}" for i in range(options['courses'])]
+
+        # Only point at earlier courses so the synthetic catalog is a DAG
+        edges = []
+        for i, code in enumerate(codes[1:], start=1):
+            for j in rng.sample(range(i), min(i, rng.randint(0, options['max_prerequisites']))):
+                edges.append((code, codes[j]))
+
+        start = time.perf_counter()
+        graph = PrerequisiteGraph(codes, edges)
+        build_seconds = time.perf_counter() - start
+
+        prerequisite_sets = {}
+        for course_code, prerequisite_code in edges:
+            prerequisite_sets.setdefault(course_code, set()).add(prerequisite_code)
+        passed_sets = [set(rng.sample(codes, rng.randint(0, len(codes) // 2))) for _ in range(options['students'])]
+
+        start = time.perf_counter()
+        bitset_results = [graph.eligible_courses(graph.mask(passed)) for passed in passed_sets]
+        bitset_seconds = time.perf_counter() - start
+
+        # Reference: per-course set difference, i.e. what the views used to do in Python
+        start = time.perf_counter()
+        set_results = [
+            {code for code in codes if not prerequisite_sets.get(code, set()) - passed}
+            for passed in passed_sets
+        ]
+        set_seconds = time.perf_counter() - start
+
+        self.stdout.write(json.dumps({
+            'courses': len(codes),
+            'edges': len(edges),
+            'buildMs': round(build_seconds * 1000, 2),
+            'bitsetUsPerStudent': round(bitset_seconds / len(passed_sets) * 1e6, 1),
+            'setUsPerStudent': round(set_seconds / len(passed_sets) * 1e6, 1),
+            'resultsMatch': bitset_results == set_results,
+        }, indent=2))
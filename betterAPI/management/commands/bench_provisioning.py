@@ -0,0 +1,43 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from betterAPI import provisioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Create accounts for students that have none with different numbers of hashing processes, "
+        "report accounts per second, then delete the accounts again"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--accounts', type=int, default=1000, help="Accounts per run")
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, provisioning.default_workers()])
+        parser.add_argument('--keep', action='store_true', help="Keep the accounts of the last run")
+
+    def handle(self, *args, **options):
+        accounts = provisioning.pending_accounts('student')[:options['accounts']]
+        if not accounts:
+            raise CommandError("No students without accounts; run generate_university first")
+
+        usernames = [username for username, _ in accounts]
+        worker_counts = list(dict.fromkeys(options['workers']))
+        runs = []
+        for workers in worker_counts:
+            try:
+                *_, summary = provisioning.provision('student', accounts, workers=workers)
+            finally:
+                if not (options['keep'] and workers == worker_counts[-1]):
+                    User.objects.filter(username__in=usernames).delete()
+            runs.append(summary)
+            self.stderr.write(f"{workers} worker(s): {summary['accountsPerSecond']} accounts/s")
+
+        report = {
+            'accounts': len(accounts),
+            'runs': runs,
+            'speedup': round(runs[-1]['accountsPerSecond'] / runs[0]['accountsPerSecond'], 2)
+            if runs[0]['accountsPerSecond'] else None,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,120 @@
+import copy
+import datetime
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from betterAPI.authentication import STUDENT
+from betterAPI.bench import run_concurrently, summarize
+from betterAPI.models import Course, Department, Enrollment, GlobalSettings, Registration, SchedulePattern, Student
+from betterAPI.views import StudentRegistrationView
+
+DEPARTMENT_CODE = 'BNC'
+COURSE_CODE = 'BNC101'
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a single hot section with concurrent registrations and check for oversell. "
+        "Creates and deletes its own department, course and students: run it on a scratch database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500, help="Number of concurrent registrations")
+        parser.add_argument('--capacity', type=int, default=60, help="Seats in the hot section")
+        parser.add_argument('--workers', type=int, default=64, help="Concurrent worker threads")
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark data afterwards")
+        parser.add_argument(
+            '--scratch-database', action='store_true',
+            help="Confirm the configured database is a scratch copy the benchmark may write to"
+        )
+
+    def handle(self, *args, **options):
+        if not options['scratch_database']:
+            raise CommandError(
+                f"bench_seats writes benchmark data to the '{connection.settings_dict['NAME']}' database "
+                f"(and deletes the {DEPARTMENT_CODE} department and {COURSE_CODE} course afterwards). "
+                "Point it at a scratch database and pass --scratch-database"
+            )
+        if options['students'] > 9999:
+            raise CommandError("At most 9999 students (student IDs are 5 characters)")
+
+        self.cleanup()
+        registration, lecture = self.build_fixture(options['students'], options['capacity'])
+
+        # Registration is opened for the benchmark's requests only, the stored settings are left alone
+        open_settings = copy.copy(GlobalSettings.get_current())
+        open_settings.registration_open = True
+        get_open_settings = classmethod(lambda cls: copy.copy(open_settings))
+
+        factory = APIRequestFactory()
+        view = StudentRegistrationView.as_view()
+        payload = [{'registrationId': registration.id, 'schedulePatterns': [{'patternId': lecture.id}]}]
+
+        def register(student_id):
+            request = factory.post('/student/register/', payload, format='json')
+            force_authenticate(request, user=SimpleNamespace(username=student_id, pk=student_id, is_authenticated=True, role=STUDENT))
+            return view(request)
+
+        student_ids = [f"B{i:04d}" for i in range(options['students'])]
+        with mock.patch.object(GlobalSettings, 'get_current', get_open_settings):
+            results, latencies, elapsed = run_concurrently(register, student_ids, options['workers'])
+
+        errors = [result for result in results if isinstance(result, Exception)]
+        accepted = sum(
+            1 for result in results
+            if not isinstance(result, Exception) and result.data.get('successful')
+        )
+        lecture.refresh_from_db()
+        registration.refresh_from_db()
+        enrolled = Enrollment.objects.filter(registration=registration).count()
+
+        report = summarize(latencies, elapsed)
+        report.update({
+            'capacity': options['capacity'],
+            'accepted': accepted,
+            'enrolled': enrolled,
+            'oversold': max(0, enrolled - options['capacity']),
+            'patternCounter': lecture.enrolled_count,
+            'registrationCounter': registration.enrolled_count,
+            'errors': len(errors),
+        })
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if not options['keep']:
+            self.cleanup()
+
+        if report['oversold'] or lecture.enrolled_count != enrolled:
+            raise CommandError("Seat counters drifted or the section was oversold")
+
+    def build_fixture(self, students, capacity):
+        department = Department.objects.create(code=DEPARTMENT_CODE, name='Benchmark Department')
+        course = Course.objects.create(courseCode=COURSE_CODE, courseName='Benchmark Course', level=0)
+        course.departments.add(department)
+
+        registration = Registration.objects.create(course=course, group_number=1, capacity=capacity)
+        lecture = SchedulePattern.objects.create(
+            registration=registration, pattern_name='Main Lecture', pattern_type='LEC', capacity=capacity
+        )
+
+        Student.objects.bulk_create([
+            Student(
+                studentId=f"B{i:04d}",
+                nameAr=f"Bench {i}",
+                nameEn=f"Bench {i}",
+                nationalId=f"99{i:012d}",
+                department=department,
+                dateOfBirth=datetime.date(2005, 1, 1),
+                address='Benchmark'
+            )
+            for i in range(students)
+        ])
+        return registration, lecture
+
+    def cleanup(self):
+        Course.objects.filter(courseCode=COURSE_CODE).delete()
+        Department.objects.filter(code=DEPARTMENT_CODE).delete()
@@ -0,0 +1,188 @@
+import datetime
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from betterAPI.authentication import EDUCATOR, STUDENT
+from betterAPI.bench import summarize
+from betterAPI.models import (
+    Course, Department, Educator, Enrollment, GlobalSettings, Registration, SchedulePattern, Student, TimeSlot
+)
+from betterAPI.provisioning import _setup_worker
+from betterAPI.sqlite_writes import is_lock_error
+from betterAPI.views import EducatorUpdateGrades, StudentRegistrationView
+
+DEPARTMENT_CODE = 'SQW'
+COURSE_CODE = 'SQW101'
+EDUCATOR_ID = 'WE001'
+
+
+def _user(username, role):
+    return SimpleNamespace(username=username, pk=username, is_authenticated=True, role=role)
+
+
+def _call(job):
+    """Send one write through its view; 'ok', 'lock' (database is locked) or 'error'"""
+    kind, username, url_kwargs, payload = job
+    factory = APIRequestFactory()
+    if kind == 'register':
+        request = factory.post('/student/register/', payload, format='json')
+        force_authenticate(request, user=_user(username, STUDENT))
+        view = StudentRegistrationView.as_view()
+    else:
+        request = factory.put('/educator/course/grades/', payload, format='json')
+        force_authenticate(request, user=_user(username, EDUCATOR))
+        view = EducatorUpdateGrades.as_view()
+
+    try:
+        response = view(request, **url_kwargs)
+    except Exception as e:
+        return 'lock' if is_lock_error(e) else 'error'
+    finally:
+        connection.close()
+
+    if response.status_code == 503:
+        return 'lock'
+    if response.status_code != 200 or response.data.get('failed'):
+        return 'error'
+    return 'ok'
+
+
+def _replay(jobs, threads):
+    """Run jobs on a thread pool; [(outcome, latency)]"""
+    def timed(job):
+        start = time.perf_counter()
+        outcome = _call(job)
+        return outcome, time.perf_counter() - start
+
+    with override_settings(THROTTLE_ENABLED=False):
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(timed, jobs))
+
+
+class Command(BaseCommand):
+    help = (
+        "Send concurrent registrations, then concurrent grade imports, from many writers at once "
+        "and count 'database is locked' failures (SQLite only; run with SQLITE_CONCURRENCY_MODE=1)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=100, help="Concurrent writers")
+        parser.add_argument('--processes', type=int, default=1, help="Split the writers over this many processes")
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark data afterwards")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("The default database is not SQLite")
+        if options['writers'] > 9999:
+            raise CommandError("At most 9999 writers (student IDs are 5 characters)")
+
+        self.cleanup()
+        registration, lecture = self.build_fixture(options['writers'])
+
+        global_settings = GlobalSettings.load()
+        was_open = global_settings.registration_open
+        global_settings.registration_open = True
+        global_settings.save()
+
+        student_ids = [f"W{i:04d}" for i in range(options['writers'])]
+        try:
+            register_jobs = [
+                ('register', student_id, {},
+                 [{'registrationId': registration.id, 'schedulePatterns': [{'patternId': lecture.id}]}])
+                for student_id in student_ids
+            ]
+            registering = self.run(register_jobs, options['writers'], options['processes'])
+
+            enrollment_ids = list(Enrollment.objects.filter(registration=registration).values_list('id', flat=True))
+            grade_jobs = [
+                ('grade', EDUCATOR_ID, {'registration_id': registration.id},
+                 [{'enrollmentId': enrollment_id, 'coursework': 40, 'exam': 45}])
+                for enrollment_id in enrollment_ids
+            ]
+            grading = self.run(grade_jobs, options['writers'], options['processes'])
+        finally:
+            global_settings.registration_open = was_open
+            global_settings.save()
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+
+        report = {
+            'config': {key: options[key] for key in ('writers', 'processes')},
+            'concurrencyMode': settings.SQLITE_CONCURRENCY_MODE,
+            'journalMode': journal_mode,
+            'registration': registering,
+            'grading': grading,
+            'enrolled': len(enrollment_ids),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if not options['keep']:
+            self.cleanup()
+
+        lock_errors = registering['lockErrors'] + grading['lockErrors']
+        if lock_errors:
+            raise CommandError(f"{lock_errors} writes failed with 'database is locked'")
+
+    def run(self, jobs, writers, processes):
+        start = time.perf_counter()
+        if processes > 1:
+            slices = [jobs[index::processes] for index in range(processes)]
+            threads = max(1, writers // processes)
+            # Children must open their own SQLite connections
+            connection.close()
+            with ProcessPoolExecutor(max_workers=processes, initializer=_setup_worker) as pool:
+                outcomes = [outcome for part in pool.map(_replay, slices, [threads] * processes) for outcome in part]
+        else:
+            outcomes = _replay(jobs, writers)
+        elapsed = time.perf_counter() - start
+
+        report = summarize([latency for _, latency in outcomes], elapsed)
+        report.update({
+            'ok': sum(1 for outcome, _ in outcomes if outcome == 'ok'),
+            'lockErrors': sum(1 for outcome, _ in outcomes if outcome == 'lock'),
+            'otherErrors': sum(1 for outcome, _ in outcomes if outcome == 'error'),
+        })
+        return report
+
+    def build_fixture(self, writers):
+        department = Department.objects.create(code=DEPARTMENT_CODE, name='SQLite Writers Benchmark')
+        course = Course.objects.create(courseCode=COURSE_CODE, courseName='SQLite Writers Benchmark', level=0)
+        course.departments.add(department)
+
+        registration = Registration.objects.create(course=course, group_number=1, capacity=writers)
+        lecture = SchedulePattern.objects.create(
+            registration=registration, pattern_name='Main Lecture', pattern_type='LEC', capacity=writers
+        )
+        educator = Educator.objects.create(
+            educatorId=EDUCATOR_ID, nameAr='Writer Bench', nameEn='Writer Bench',
+            nationalId='97000000000001', department=department, type='Lecturer'
+        )
+        TimeSlot.objects.create(pattern=lecture, educator=educator, day=0, start_period=1, end_period=2)
+
+        Student.objects.bulk_create([
+            Student(
+                studentId=f"W{i:04d}",
+                nameAr=f"Writer {i}",
+                nameEn=f"Writer {i}",
+                nationalId=f"98{i:012d}",
+                department=department,
+                dateOfBirth=datetime.date(2005, 1, 1),
+                address='Benchmark'
+            )
+            for i in range(writers)
+        ])
+        return registration, lecture
+
+    def cleanup(self):
+        Course.objects.filter(courseCode=COURSE_CODE).delete()
+        Department.objects.filter(code=DEPARTMENT_CODE).delete()
@@ -0,0 +1,99 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import UserRateThrottle
+
+from betterAPI.authentication import STUDENT
+from betterAPI.bench import percentile
+from betterAPI.views import StudentCurrentSemester
+
+# High enough that no check is denied: only the cost of allowing is measured
+UNLIMITED = '1000000/min'
+
+
+class CacheRateThrottle(UserRateThrottle):
+    """DRF's stock throttle (request history in the default cache), for comparison"""
+    rate = '1000000/day'
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the throttle check DRF runs for every request, with the token-bucket throttle and "
+        "with DRF's cache-based UserRateThrottle, and fail if the token bucket costs more than the budget"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200000, help="Checks per throttle")
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--users', type=int, default=10000, help="Distinct users (buckets) the checks spread over")
+        parser.add_argument('--backend', help="Bucket backend to time (default: THROTTLE_BACKEND)")
+        parser.add_argument('--budget-us', type=float, default=50.0, help="Allowed mean cost per check (µs)")
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        requests = []
+        for index in range(options['users']):
+            request = Request(factory.get('/student/current-semester/'))
+            request.user = SimpleNamespace(
+                username=f"T{index:05d}", pk=f"T{index:05d}", is_authenticated=True, role=STUDENT
+            )
+            requests.append(request)
+
+        backend = options['backend'] or settings.THROTTLE_BACKEND
+        rates = {scope: UNLIMITED for scope in settings.THROTTLE_RATES}
+        with override_settings(THROTTLE_ENABLED=True, THROTTLE_BACKEND=backend, THROTTLE_RATES=rates):
+            token_bucket = self.run(StudentCurrentSemester(), requests, options['requests'], options['threads'])
+
+        baseline_view = StudentCurrentSemester()
+        baseline_view.throttle_classes = [CacheRateThrottle]
+        drf_cache = self.run(baseline_view, requests, options['requests'], options['threads'])
+
+        report = {
+            'config': {key: options[key] for key in ('requests', 'threads', 'users', 'budget_us')},
+            'backend': backend,
+            'tokenBucket': token_bucket,
+            'drfCacheThrottle': drf_cache,
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if token_bucket['meanUs'] > options['budget_us']:
+            raise CommandError(
+                f"Throttle check takes {token_bucket['meanUs']}µs per request, over the {options['budget_us']}µs budget"
+            )
+
+    def run(self, view, requests, count, threads):
+        """Call view.check_throttles() count times from several threads; per-call timings"""
+        latencies = [[] for _ in range(threads)]
+
+        def work(worker):
+            timings = latencies[worker]
+            for index in range(worker, count, threads):
+                request = requests[index % len(requests)]
+                start = time.perf_counter_ns()
+                view.check_throttles(request)
+                timings.append(time.perf_counter_ns() - start)
+
+        workers = [threading.Thread(target=work, args=(worker,)) for worker in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        samples = [latency / 1000 for timings in latencies for latency in timings]
+        return {
+            'checks': len(samples),
+            'checksPerSecond': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+            'meanUs': round(sum(samples) / len(samples), 2) if samples else 0.0,
+            'p50Us': round(percentile(samples, 50), 2),
+            'p99Us': round(percentile(samples, 99), 2),
+            'maxUs': round(max(samples), 2) if samples else 0.0,
+        }
@@ -0,0 +1,86 @@
+import json
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+
+from betterAPI.authentication import RoleTokenObtainPairSerializer
+from betterAPI.db_routing import REPLICA, pin_key
+from betterAPI.models import TimeSlot
+
+
+class Command(BaseCommand):
+    help = (
+        "Check read replica routing end to end: an educator's GET reads from the replica, "
+        "their reads stay on the primary after a write request, and return to the replica once the pin expires"
+    )
+
+    def handle(self, *args, **options):
+        if REPLICA not in settings.DATABASES:
+            raise CommandError("No replica configured; set DB_REPLICA_NAME (SQLite) or DB_REPLICA_HOST (PostgreSQL)")
+
+        teaching = (
+            TimeSlot.objects.filter(educator__isnull=False, pattern__registration__is_active=True)
+            .values_list('educator_id', 'pattern__registration_id').first()
+        )
+        if teaching is None:
+            raise CommandError("No educator teaches an active registration; run generate_university first")
+        educator_id, registration_id = teaching
+
+        user, created = User.objects.get_or_create(username=educator_id)
+        if created:
+            user.set_unusable_password()
+            user.save()
+        try:
+            token = f"Bearer {RoleTokenObtainPairSerializer.get_token(user).access_token}"
+            client = Client(headers={'Authorization': token, 'Host': 'localhost'})
+            with override_settings(THROTTLE_ENABLED=False):
+                # Warm up process caches (settings, etc.), which are always loaded from the primary
+                client.get('/educator/info/')
+                cache.delete(pin_key(educator_id))
+
+                steps = {
+                    'read': self.queries_by_database(lambda: client.get('/educator/info/')),
+                    # Not a list: rejected before anything is saved, but still a write request
+                    'write': self.queries_by_database(
+                        lambda: client.put(f'/educator/course/{registration_id}/grades/', {}, content_type='application/json')
+                    ),
+                    'readAfterWrite': self.queries_by_database(lambda: client.get('/educator/info/')),
+                }
+                cache.delete(pin_key(educator_id))
+                steps['readAfterPinExpired'] = self.queries_by_database(lambda: client.get('/educator/info/'))
+        finally:
+            if created:
+                user.delete()
+
+        failures = []
+        if not steps['read'].get(REPLICA) or steps['read'].get('default'):
+            failures.append("read did not go to the replica")
+        if steps['readAfterWrite'].get(REPLICA):
+            failures.append("read after a write went to the replica")
+        if not steps['readAfterPinExpired'].get(REPLICA):
+            failures.append("read after the pin expired did not go to the replica")
+
+        self.stdout.write(json.dumps({'educatorId': educator_id, 'queries': steps, 'failures': failures}, indent=2))
+        if failures:
+            raise CommandError('; '.join(failures))
+
+    def queries_by_database(self, request):
+        """Queries run on each database while making the request"""
+        counts = {}
+
+        def counter(alias):
+            def count(execute, sql, params, many, context):
+                counts[alias] = counts.get(alias, 0) + 1
+                return execute(sql, params, many, context)
+            return count
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter(alias)))
+            request()
+        return counts
@@ -0,0 +1,364 @@
+import datetime
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from betterAPI import catalog, prerequisites, timetable
+from betterAPI.gpa import grade_contribution
+from betterAPI.models import (
+    AcademicYear, Course, Department, Educator, Enrollment, GlobalSettings, Registration,
+    SchedulePattern, Semester, Student, Term, TimeSlot
+)
+
+DEPARTMENT_PREFIX = 'Z'
+LEVELS = 5
+PASSING_GRADES = {'A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-'}
+BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic university (departments, educators, courses with "
+        "prerequisites, offerings with time slots, students with multi-year grade history) "
+        "using bulk inserts. Meant for an empty benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=8)
+        parser.add_argument('--students', type=int, default=50000)
+        parser.add_argument('--courses', type=int, default=2000)
+        parser.add_argument('--educators', type=int, default=800)
+        parser.add_argument('--rooms', type=int, default=300)
+        parser.add_argument('--groups', type=int, default=2, help="Maximum groups (registrations) per course")
+        parser.add_argument('--courses-per-term', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['departments'] > 100 or options['students'] > 99999 or options['courses'] > 99999 \
+                or options['educators'] > 9999:
+            raise CommandError("IDs are fixed width: at most 100 departments, 99999 students/courses, 9999 educators")
+        if Department.objects.filter(code__startswith=DEPARTMENT_PREFIX).exists():
+            raise CommandError("Synthetic data already present; run against a fresh database (manage.py flush)")
+        if Student.objects.filter(pk__in=[f"{i:05d}" for i in range(min(options['students'], 1000))]).exists():
+            raise CommandError("Student IDs 00000.. are taken; run against a fresh database (manage.py flush)")
+
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        started = time.perf_counter()
+
+        global_settings = GlobalSettings.load()
+        self.current_year = global_settings.current_academic_year
+        self.current_semester = global_settings.current_semester
+
+        with transaction.atomic():
+            departments = self.departments = self.create_departments()
+            educators = self.create_educators(departments)
+            pool = self.pool = self.create_courses(departments)
+            offerings = self.create_offerings(pool, educators)
+            counts = self.create_students(departments, offerings)
+            self.save_seat_counters(offerings)
+
+        catalog.invalidate()
+        prerequisites.invalidate()
+        GlobalSettings.invalidate_cache()
+
+        counts['seconds'] = round(time.perf_counter() - started, 1)
+        self.stdout.write(json.dumps(counts, indent=2))
+
+    # Catalog
+
+    def create_departments(self):
+        departments = [
+            Department(code=f"{DEPARTMENT_PREFIX}{i:02d}", name=f"Synthetic Department {i}", desc="Generated")
+            for i in range(self.options['departments'])
+        ]
+        Department.objects.bulk_create(departments)
+        return departments
+
+    def create_educators(self, departments):
+        educators = []
+        for i in range(self.options['educators']):
+            educators.append(Educator(
+                educatorId=f"E{i:04d}",
+                nameEn=f"Educator {i}",
+                nameAr=f"Educator {i}",
+                nationalId=f"88{i:012d}",
+                type='Teaching Assistant' if i % 4 == 0 else self.rng.choice(
+                    ['Lecturer', 'Assistant Professor', 'Associate Professor', 'Professor']
+                ),
+                department=departments[i % len(departments)],
+            ))
+        Educator.objects.bulk_create(educators, batch_size=BATCH_SIZE)
+
+        by_department = {}
+        for educator in educators:
+            role = 'ta' if educator.type == 'Teaching Assistant' else 'staff'
+            by_department.setdefault((educator.department_id, role), []).append(educator)
+        return by_department
+
+    def create_courses(self, departments):
+        """Courses spread over departments and levels; prerequisites only point at lower levels"""
+        department_count = len(departments)
+        courses = []
+        for i in range(self.options['courses']):
+            courses.append(Course(
+                courseCode=f"{DEPARTMENT_PREFIX}{i:05d}",
+                courseName=f"Synthetic Course {i}",
+                credits=self.rng.choice([2, 3, 3, 3, 4]),
+                level=(i // department_count) % LEVELS,
+                type=self.rng.choice(['core', 'core', 'specialization']),
+            ))
+        Course.objects.bulk_create(courses, batch_size=BATCH_SIZE)
+
+        pool = {}
+        department_links = []
+        for course in courses:
+            course_departments = {self.home_department(course.pk)}
+            if self.rng.random() < 0.1:
+                course_departments.add(self.rng.choice(departments).code)
+            for code in course_departments:
+                department_links.append(Course.departments.through(course_id=course.pk, department_id=code))
+                pool.setdefault((code, course.level), []).append(course)
+        Course.departments.through.objects.bulk_create(department_links, batch_size=BATCH_SIZE)
+
+        prerequisite_links = []
+        for course in courses:
+            home = self.home_department(course.pk)
+            earlier = [other for level in range(course.level) for other in pool.get((home, level), [])]
+            for prerequisite in self.rng.sample(earlier, min(len(earlier), self.rng.randint(0, 3))):
+                prerequisite_links.append(Course.prerequisites.through(
+                    from_course_id=course.pk, to_course_id=prerequisite.pk
+                ))
+        Course.prerequisites.through.objects.bulk_create(prerequisite_links, batch_size=BATCH_SIZE)
+        return pool
+
+    def home_department(self, course_code):
+        return self.departments[int(course_code[1:]) % len(self.departments)].code
+
+    def create_offerings(self, pool, educators):
+        """Registrations with LEC (+TUT/LAB) patterns and time slots. Returns {course_code: [offering]}"""
+        courses = {course.pk: course for courses in pool.values() for course in courses}
+        registrations = []
+        for course in courses.values():
+            for group in range(1, self.rng.randint(1, self.options['groups']) + 1):
+                registrations.append(Registration(course=course, group_number=group, capacity=60))
+        Registration.objects.bulk_create(registrations, batch_size=BATCH_SIZE)
+
+        patterns = []
+        slot_specs = []
+        for registration in registrations:
+            kinds = [('LEC', 'Main Lecture', registration.capacity, 2)]
+            if self.rng.random() < 0.6:
+                kinds += [('TUT', f"Tutorial {n}", registration.capacity // 2, 1) for n in (1, 2)]
+            if self.rng.random() < 0.4:
+                kinds.append(('LAB', 'Lab', registration.capacity, 1))
+            for pattern_type, name, capacity, sessions in kinds:
+                slots = []
+                for day in self.rng.sample(range(6), sessions):
+                    start = self.rng.randint(1, 11)
+                    slots.append((day, start, start + 1))
+                pattern = SchedulePattern(
+                    registration=registration,
+                    pattern_name=name,
+                    pattern_type=pattern_type,
+                    capacity=capacity,
+                    occupancy=timetable.to_hex(sum(timetable.slot_mask(*slot) for slot in slots)),
+                )
+                patterns.append(pattern)
+                slot_specs.append(slots)
+        SchedulePattern.objects.bulk_create(patterns, batch_size=BATCH_SIZE)
+
+        time_slots = []
+        for pattern, slots in zip(patterns, slot_specs):
+            department = self.home_department(pattern.registration.course_id)
+            role = 'staff' if pattern.pattern_type == 'LEC' else 'ta'
+            staff = educators.get((department, role)) or educators.get((department, 'staff'))
+            educator = self.rng.choice(staff) if staff else None
+            for day, start, end in slots:
+                time_slots.append(TimeSlot(
+                    pattern=pattern, educator=educator, day=day, start_period=start, end_period=end,
+                    location=f"R{self.rng.randrange(self.options['rooms'])}",
+                ))
+        TimeSlot.objects.bulk_create(time_slots, batch_size=BATCH_SIZE)
+
+        offerings = {}
+        by_registration = {}
+        for pattern in patterns:
+            by_registration.setdefault(pattern.registration_id, {}).setdefault(pattern.pattern_type, []).append(pattern)
+        for registration in registrations:
+            offerings.setdefault(registration.course_id, []).append({
+                'registration': registration,
+                'patterns': by_registration.get(registration.pk, {}),
+            })
+        self.pattern_count = len(patterns)
+        self.slot_count = len(time_slots)
+        return offerings
+
+    # Students and history
+
+    def terms_before_current(self, level):
+        """(yearName, semesterName, course level) of every finished term of a student at `level`"""
+        first_year = int(self.current_year.split('-')[0])
+        terms = []
+        for years_ago in range(level, 0, -1):
+            year = first_year - years_ago
+            for semester_name in ('fall', 'spring'):
+                terms.append((f"{year}-{year + 1}", semester_name, level - years_ago))
+        if self.current_semester in ('spring', 'summer'):
+            terms.append((self.current_year, 'fall', level))
+        if self.current_semester == 'summer':
+            terms.append((self.current_year, 'spring', level))
+        return terms
+
+    def create_students(self, departments, offerings):
+        counts = {'students': 0, 'enrollments': 0, 'currentEnrollments': 0}
+        chunk = []
+        for i in range(self.options['students']):
+            department = departments[i % len(departments)]
+            chunk.append(Student(
+                studentId=f"{i:05d}",
+                nameEn=f"Student {i}",
+                nameAr=f"Student {i}",
+                nationalId=f"77{i:012d}",
+                department=department,
+                level=self.rng.randrange(LEVELS),
+                dateOfBirth=datetime.date(2000 + self.rng.randrange(6), self.rng.randint(1, 12), self.rng.randint(1, 28)),
+                address='Generated',
+                Gender=self.rng.choice(['male', 'female']),
+            ))
+            if len(chunk) == BATCH_SIZE // 4:
+                self.create_history(chunk, offerings, counts)
+                chunk = []
+        if chunk:
+            self.create_history(chunk, offerings, counts)
+        counts.update(
+            departments=len(departments),
+            courses=len(offerings),
+            registrations=sum(len(course_offerings) for course_offerings in offerings.values()),
+            patterns=self.pattern_count,
+            timeSlots=self.slot_count,
+        )
+        return counts
+
+    def graded_enrollment(self):
+        enrollment = Enrollment(coursework=self.rng.randint(15, 50), exam=self.rng.randint(10, 50))
+        enrollment.calculate_total_and_grade()
+        return enrollment
+
+    def pick_courses(self, student, level, taken):
+        candidates = [course for course in self.pool.get((student.department_id, level), []) if course.pk not in taken]
+        return self.rng.sample(candidates, min(len(candidates), self.options['courses_per_term']))
+
+    def create_history(self, students, offerings, counts):
+        # Plan every term of every student in memory first, then insert table by table
+        years = {}
+        plans = []
+        for student in students:
+            taken = set()
+            earned = 0
+            cumulative = [Decimal('0'), 0]
+            terms = self.terms_before_current(student.level) + [(self.current_year, self.current_semester, student.level)]
+            for year_name, semester_name, level in terms:
+                current = (year_name, semester_name) == (self.current_year, self.current_semester)
+                semester = Semester(semesterName=semester_name)
+                rows = []
+                for course in self.pick_courses(student, level, taken):
+                    offering = self.rng.choice(offerings[course.pk])
+                    if current:
+                        selected = self.select_patterns(offering)
+                        if selected is None:
+                            continue
+                        enrollment = Enrollment(coursework=None, exam=None, total=None, numericGrade=None)
+                    else:
+                        selected = []
+                        enrollment = self.graded_enrollment()
+                    taken.add(course.pk)
+                    enrollment.student = student
+                    enrollment.registration = offering['registration']
+                    enrollment.term_id = Term.get_id(year_name, semester_name)
+                    rows.append((enrollment, course, selected))
+                if not rows:
+                    continue
+
+                totals = [Decimal('0'), 0, 0, 0]
+                occupancy = 0
+                for enrollment, course, selected in rows:
+                    totals = [a + b for a, b in zip(totals, grade_contribution(enrollment.letterGrade, course.credits))]
+                    if enrollment.letterGrade in PASSING_GRADES:
+                        earned += course.credits
+                    for pattern in selected:
+                        occupancy |= timetable.from_hex(pattern.occupancy)
+                semester.qualityPoints, semester.gradedHours, semester.gradedCourses, semester.ungradedCourses = totals
+                semester.registeredHours = sum(course.credits for _, course, _ in rows)
+                semester.earnedHours = sum(course.credits for enrollment, course, _ in rows if enrollment.letterGrade in PASSING_GRADES)
+                semester.occupancy = timetable.to_hex(occupancy)
+                if not semester.ungradedCourses and semester.gradedHours:
+                    semester.gpa = Decimal(str(round(float(semester.qualityPoints) / semester.gradedHours, 2)))
+                    cumulative = [cumulative[0] + semester.qualityPoints, cumulative[1] + semester.gradedHours]
+                else:
+                    semester.gpa = Decimal('0')
+                semester.cgpa = Decimal(str(round(float(cumulative[0]) / cumulative[1], 2))) if cumulative[1] else Decimal('0')
+
+                year = years.get((student.pk, year_name))
+                if year is None:
+                    year = years[(student.pk, year_name)] = AcademicYear(student=student, yearName=year_name)
+                plans.append((year, semester, rows))
+            student.earnedHours = earned
+
+        Student.objects.bulk_create(students)
+        AcademicYear.objects.bulk_create(years.values(), batch_size=BATCH_SIZE)
+        for year, semester, rows in plans:
+            semester.academicYear = year
+        Semester.objects.bulk_create([semester for _, semester, _ in plans], batch_size=BATCH_SIZE)
+
+        enrollments = []
+        for _, semester, rows in plans:
+            for enrollment, _, _ in rows:
+                enrollment.semester = semester
+                enrollments.append(enrollment)
+        Enrollment.objects.bulk_create(enrollments, batch_size=BATCH_SIZE)
+
+        selected_links = [
+            Enrollment.selected_patterns.through(enrollment_id=enrollment.pk, schedulepattern_id=pattern.pk)
+            for _, _, rows in plans
+            for enrollment, _, selected in rows
+            for pattern in selected
+        ]
+        Enrollment.selected_patterns.through.objects.bulk_create(selected_links, batch_size=BATCH_SIZE)
+
+        counts['students'] += len(students)
+        counts['enrollments'] += len(enrollments)
+        counts['currentEnrollments'] += sum(1 for enrollment in enrollments if enrollment.letterGrade is None)
+        self.stdout.write(f"  {counts['students']} students, {counts['enrollments']} enrollments", ending='\r')
+
+    def select_patterns(self, offering):
+        """One pattern of each type with a free seat (and a seat in the registration), or None"""
+        registration = offering['registration']
+        if registration.enrolled_count >= registration.capacity:
+            return None
+        selected = []
+        for patterns in offering['patterns'].values():
+            open_patterns = [pattern for pattern in patterns if pattern.enrolled_count < pattern.capacity]
+            if not open_patterns:
+                return None
+            selected.append(self.rng.choice(open_patterns))
+        registration.enrolled_count += 1
+        for pattern in selected:
+            pattern.enrolled_count += 1
+        return selected
+
+    def save_seat_counters(self, offerings):
+        registrations = []
+        patterns = []
+        for course_offerings in offerings.values():
+            for offering in course_offerings:
+                registrations.append(offering['registration'])
+                for type_patterns in offering['patterns'].values():
+                    patterns.extend(type_patterns)
+        Registration.objects.bulk_update(registrations, ['enrolled_count'], batch_size=BATCH_SIZE)
+        SchedulePattern.objects.bulk_update(patterns, ['enrolled_count'], batch_size=BATCH_SIZE)
+
@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from betterAPI import provisioning
+
+
+class Command(BaseCommand):
+    help = "Create login accounts (password: national ID) for students or educators that have none"
+
+    def add_arguments(self, parser):
+        parser.add_argument('type', choices=sorted(provisioning.SOURCES))
+        parser.add_argument('--ids', nargs='+', help="Only these student/educator IDs")
+        parser.add_argument('--department', help="Only this department code")
+        parser.add_argument('--all', action='store_true', help="Everyone without an account")
+        parser.add_argument('--workers', type=int, help="Hashing processes (default: ACCOUNT_PROVISIONING_WORKERS or CPUs)")
+        parser.add_argument('--batch-size', type=int, default=provisioning.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not (options['ids'] or options['department'] or options['all']):
+            raise CommandError("Give --ids, --department or --all")
+
+        accounts = provisioning.pending_accounts(options['type'], ids=options['ids'], department=options['department'])
+        for update in provisioning.provision(options['type'], accounts, options['workers'], options['batch_size']):
+            self.stdout.write(json.dumps(update))
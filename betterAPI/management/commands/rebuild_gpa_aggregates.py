@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from betterAPI.gpa import AGGREGATE_FIELDS, EMPTY_TOTALS, compute_aggregates, recompute_semesters
+from betterAPI.models import Enrollment, Semester
+
+EMPTY = dict(zip(AGGREGATE_FIELDS, EMPTY_TOTALS))
+GPA_BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-semester GPA running totals from enrollments and verify them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Only report mismatches, do not write")
+        parser.add_argument('--recompute-gpa', action='store_true', help="Also refresh the stored GPA/CGPA of every semester")
+
+    def handle(self, *args, **options):
+        expected = compute_aggregates(Enrollment.objects.all())
+        semesters = Semester.objects.order_by('pk')
+        checked = 0
+        mismatched = 0
+
+        with transaction.atomic():
+            for semester in semesters.iterator():
+                checked += 1
+                actual = expected.get(semester.pk, EMPTY)
+                stored = {field: getattr(semester, field) for field in AGGREGATE_FIELDS}
+                if stored != actual:
+                    mismatched += 1
+                    self.stdout.write(f"Semester {semester.pk}: stored {stored} != actual {actual}")
+                    if not options['verify']:
+                        Semester.objects.filter(pk=semester.pk).update(**actual)
+
+            if options['recompute_gpa'] and not options['verify']:
+                # Second pass: a CGPA sums all of the student's semesters, so it is only
+                # refreshed once every aggregate above is right
+                semester_ids = list(Semester.objects.order_by('pk').values_list('pk', flat=True))
+                for start in range(0, len(semester_ids), GPA_BATCH_SIZE):
+                    recompute_semesters(semester_ids[start:start + GPA_BATCH_SIZE])
+
+        if options['verify'] and mismatched:
+            raise CommandError(f"{mismatched} semester(s) have wrong GPA aggregates")
+
+        action = "found" if options['verify'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} semesters, {action} {mismatched} mismatch(es)"))
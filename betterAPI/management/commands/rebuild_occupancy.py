@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from betterAPI.timetable import rebuild_occupancy
+
+
+class Command(BaseCommand):
+    help = "Recompute the weekly occupancy bitmaps of schedule patterns and student semesters"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = rebuild_occupancy()
+        self.stdout.write(self.style.SUCCESS(f"Fixed {changed} occupancy bitmap(s)"))
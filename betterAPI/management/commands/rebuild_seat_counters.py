@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from betterAPI.seats import rebuild_seat_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the registration and pattern seat counters from enrollments"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = rebuild_seat_counters()
+        self.stdout.write(self.style.SUCCESS(f"Fixed {drift} seat counter(s)"))
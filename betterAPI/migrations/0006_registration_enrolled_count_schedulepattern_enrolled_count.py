@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_seat_counters(apps, schema_editor):
+    """Only enrollments of the current term hold seats (see betterAPI/seats.py)"""
+    GlobalSettings = apps.get_model('betterAPI', 'GlobalSettings')
+    Registration = apps.get_model('betterAPI', 'Registration')
+    SchedulePattern = apps.get_model('betterAPI', 'SchedulePattern')
+
+    # GlobalSettings.load() defaults when the row does not exist yet
+    year_name, semester_name = GlobalSettings.objects.filter(pk=1).values_list(
+        'current_academic_year', 'current_semester'
+    ).first() or ('2024-2025', 'fall')
+    current = Q(
+        enrollments__semester__academicYear__yearName=year_name,
+        enrollments__semester__semesterName=semester_name
+    )
+
+    for registration in Registration.objects.annotate(n=Count('enrollments', filter=current)):
+        Registration.objects.filter(pk=registration.pk).update(enrolled_count=registration.n)
+
+    for pattern in SchedulePattern.objects.annotate(n=Count('enrollments', filter=current)):
+        SchedulePattern.objects.filter(pk=pattern.pk).update(enrolled_count=pattern.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betterAPI', '0005_educator_address_educator_dateofbirth_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Seats taken, maintained by betterAPI.seats'),
+        ),
+        migrations.AddField(
+            model_name='schedulepattern',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Seats taken, maintained by betterAPI.seats'),
+        ),
+        migrations.RunPython(populate_seat_counters, migrations.RunPython.noop),
+    ]
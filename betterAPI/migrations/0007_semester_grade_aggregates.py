@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+
+GRADE_POINTS = {
+    'A+': 4.0, 'A': 4.0, 'A-': 3.7,
+    'B+': 3.3, 'B': 3.0, 'B-': 2.7,
+    'C+': 2.3, 'C': 2.0, 'C-': 1.7,
+    'D+': 1.3, 'D': 1.0, 'D-': 0.7,
+    'F': 0.0
+}
+
+
+def populate_grade_aggregates(apps, schema_editor):
+    Semester = apps.get_model('betterAPI', 'Semester')
+    Enrollment = apps.get_model('betterAPI', 'Enrollment')
+
+    totals = {}
+    rows = Enrollment.objects.values_list('semester_id', 'letterGrade', 'registration__course__credits')
+    for semester_id, letter_grade, credits in rows.iterator():
+        points, hours, graded, ungraded = totals.get(semester_id, (Decimal('0'), 0, 0, 0))
+        if not letter_grade or not letter_grade.strip():
+            ungraded += 1
+        else:
+            graded += 1
+            if letter_grade in GRADE_POINTS:
+                points += Decimal(str(GRADE_POINTS[letter_grade])) * credits
+                hours += credits
+        totals[semester_id] = (points, hours, graded, ungraded)
+
+    for semester_id, (points, hours, graded, ungraded) in totals.items():
+        Semester.objects.filter(pk=semester_id).update(
+            qualityPoints=points, gradedHours=hours, gradedCourses=graded, ungradedCourses=ungraded
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betterAPI', '0006_registration_enrolled_count_schedulepattern_enrolled_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='semester',
+            name='qualityPoints',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=7),
+        ),
+        migrations.AddField(
+            model_name='semester',
+            name='gradedHours',
+            field=models.SmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='semester',
+            name='gradedCourses',
+            field=models.SmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='semester',
+            name='ungradedCourses',
+            field=models.SmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_grade_aggregates, migrations.RunPython.noop),
+    ]
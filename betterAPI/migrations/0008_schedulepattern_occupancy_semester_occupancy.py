@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+PERIODS_PER_DAY = 12
+
+
+def populate_occupancy(apps, schema_editor):
+    TimeSlot = apps.get_model('betterAPI', 'TimeSlot')
+    SchedulePattern = apps.get_model('betterAPI', 'SchedulePattern')
+    Semester = apps.get_model('betterAPI', 'Semester')
+    Enrollment = apps.get_model('betterAPI', 'Enrollment')
+
+    pattern_masks = {}
+    for pattern_id, day, start_period, end_period in TimeSlot.objects.values_list(
+        'pattern_id', 'day', 'start_period', 'end_period'
+    ).iterator():
+        width = end_period - start_period + 1
+        if width > 0:
+            pattern_masks[pattern_id] = pattern_masks.get(pattern_id, 0) | (
+                ((1 << width) - 1) << (day * PERIODS_PER_DAY + start_period - 1)
+            )
+    for pattern_id, mask in pattern_masks.items():
+        SchedulePattern.objects.filter(pk=pattern_id).update(occupancy=format(mask, 'x'))
+
+    semester_masks = {}
+    rows = Enrollment.selected_patterns.through.objects.values_list('enrollment__semester_id', 'schedulepattern_id')
+    for semester_id, pattern_id in rows.iterator():
+        semester_masks[semester_id] = semester_masks.get(semester_id, 0) | pattern_masks.get(pattern_id, 0)
+    for semester_id, mask in semester_masks.items():
+        Semester.objects.filter(pk=semester_id).update(occupancy=format(mask, 'x'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betterAPI', '0007_semester_grade_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedulepattern',
+            name='occupancy',
+            field=models.CharField(default='0', editable=False, help_text='Weekly bitmap of the time slots, maintained by betterAPI.timetable', max_length=18),
+        ),
+        migrations.AddField(
+            model_name='semester',
+            name='occupancy',
+            field=models.CharField(default='0', editable=False, max_length=18),
+        ),
+        migrations.RunPython(populate_occupancy, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_terms(apps, schema_editor):
+    Term = apps.get_model('betterAPI', 'Term')
+    Semester = apps.get_model('betterAPI', 'Semester')
+    Enrollment = apps.get_model('betterAPI', 'Enrollment')
+
+    term_ids = {}
+    rows = Semester.objects.values_list('semesterId', 'academicYear__yearName', 'semesterName')
+    for semester_id, year_name, semester_name in rows.iterator():
+        key = (year_name, semester_name)
+        if key not in term_ids:
+            term, created = Term.objects.get_or_create(yearName=year_name, semesterName=semester_name)
+            term_ids[key] = term.pk
+        Enrollment.objects.filter(semester_id=semester_id).update(term_id=term_ids[key])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betterAPI', '0008_schedulepattern_occupancy_semester_occupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Term',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('yearName', models.CharField(max_length=10)),
+                ('semesterName', models.CharField(choices=[('fall', 'Fall'), ('spring', 'Spring'), ('summer', 'Summer')], max_length=10)),
+            ],
+            options={
+                'ordering': ['yearName', 'semesterName'],
+                'unique_together': {('yearName', 'semesterName')},
+            },
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='term',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='enrollments', to='betterAPI.term'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['term', 'registration'], name='enrollment_term_registration'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['term', 'student'], name='enrollment_term_student'),
+        ),
+        migrations.RunPython(populate_terms, migrations.RunPython.noop),
+    ]
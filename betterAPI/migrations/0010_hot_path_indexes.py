@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betterAPI', '0009_term_enrollment_term'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['is_active', 'course'], name='registration_active_course'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['educator', 'day'], name='timeslot_educator_day'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['location', 'day'], name='timeslot_location_day'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['student', 'letterGrade'], name='enrollment_student_grade'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['registration', 'semester'], name='enrollment_registration_sem'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(condition=models.Q(('letterGrade__isnull', True)), fields=['registration', 'student'], name='enrollment_ungraded'),
+        ),
+        migrations.AddIndex(
+            model_name='semester',
+            index=models.Index(fields=['academicYear', 'semesterName'], name='semester_year_name'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betterAPI', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='enrollment',
+            name='numericGrade',
+            field=models.DecimalField(blank=True, decimal_places=2, default=0.0, max_digits=5, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def recount_seat_counters(apps, schema_editor):
+    """
+    An earlier version of 0006 counted the enrollments of every term; recount
+    from the current term's enrollments on databases that already ran it.
+    """
+    GlobalSettings = apps.get_model('betterAPI', 'GlobalSettings')
+    Term = apps.get_model('betterAPI', 'Term')
+    Registration = apps.get_model('betterAPI', 'Registration')
+    SchedulePattern = apps.get_model('betterAPI', 'SchedulePattern')
+
+    # GlobalSettings.load() defaults when the row does not exist yet
+    year_name, semester_name = GlobalSettings.objects.filter(pk=1).values_list(
+        'current_academic_year', 'current_semester'
+    ).first() or ('2024-2025', 'fall')
+    term_id = Term.objects.filter(yearName=year_name, semesterName=semester_name).values_list('id', flat=True).first()
+    # No Term row yet: no enrollment of the current term either
+    current = Q(enrollments__term_id=term_id) if term_id is not None else Q(pk__in=[])
+
+    for registration in Registration.objects.annotate(n=Count('enrollments', filter=current)):
+        if registration.enrolled_count != registration.n:
+            Registration.objects.filter(pk=registration.pk).update(enrolled_count=registration.n)
+
+    for pattern in SchedulePattern.objects.annotate(n=Count('enrollments', filter=current)):
+        if pattern.enrolled_count != pattern.n:
+            SchedulePattern.objects.filter(pk=pattern.pk).update(enrolled_count=pattern.n)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('betterAPI', '0011_enrollment_numericgrade_percentage'),
+    ]
+
+    operations = [
+        migrations.RunPython(recount_seat_counters, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,11 @@
-from django.db import models
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Sum
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator, MinLengthValidator, MaxLengthValidator
 
@@ -24,9 +31,20 @@ class GlobalSettings(models.Model):
             raise ValidationError("Only one GlobalSettings instance allowed")
         super().save(*args, **kwargs)
 
+    # Process-local copy of the singleton. It is trusted for CACHE_TTL seconds, then
+    # revalidated against VERSION_KEY in the shared cache, which every save bumps
+    # (see signals.py), so all workers see a change within CACHE_TTL seconds.
+    VERSION_KEY = 'globalsettings:version'
+    _local = {'instance': None, 'version': None, 'checked_at': 0.0}
+    _local_lock = threading.Lock()
+
     @classmethod
-    def get_current(cls):
-        """Get the current global settings (create if doesn't exist)"""
+    def cache_ttl(cls):
+        return getattr(settings, 'GLOBAL_SETTINGS_CACHE_TTL', 5)
+
+    @classmethod
+    def load(cls):
+        """Get the current global settings from the database (create if doesn't exist)"""
         obj, created = cls.objects.get_or_create(
             pk=1,
             defaults={
@@ -36,6 +54,31 @@ class GlobalSettings(models.Model):
         )
         return obj
 
+    @classmethod
+    def get_current(cls):
+        """Get the current global settings, usually without touching the database"""
+        local = cls._local
+        now = time.monotonic()
+        if local['instance'] is not None and now - local['checked_at'] < cls.cache_ttl():
+            return copy.copy(local['instance'])
+
+        with cls._local_lock:
+            version = cache.get_or_set(cls.VERSION_KEY, time.time_ns, timeout=None)
+            if local['instance'] is None or local['version'] != version:
+                local['instance'] = cls.load()
+                local['version'] = version
+            local['checked_at'] = now
+            return copy.copy(local['instance'])
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Drop this process's copy and make every other process reload on its next check"""
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.set(cls.VERSION_KEY, time.time_ns(), timeout=None)
+        cls._local['instance'] = None
+
     def __str__(self):
         return f"AY {self.current_academic_year} - {self.get_current_semester_display()}"
 
@@ -105,61 +148,40 @@ class Semester(models.Model):
     registeredHours = models.SmallIntegerField(default=0, blank=True, null=True)
     earnedHours = models.SmallIntegerField(default=0, blank=True, null=True)
 
+    # Running grade aggregates, updated by delta on every Enrollment grade change
+    qualityPoints = models.DecimalField(max_digits=7, decimal_places=2, default=0, editable=False)
+    gradedHours = models.SmallIntegerField(default=0, editable=False)
+    gradedCourses = models.SmallIntegerField(default=0, editable=False)
+    ungradedCourses = models.SmallIntegerField(default=0, editable=False)
+
+    # Weekly occupancy bitmap of the selected patterns, maintained by betterAPI.timetable
+    occupancy = models.CharField(max_length=18, default='0', editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['academicYear', 'semesterName'], name='semester_year_name'),
+        ]
+
     def __str__(self):
         return f"{self.academicYear} - {self.get_semesterName_display()}"
     
-    def calculate_gpa(self, student):
-        """Calculate semester GPA for a specific student"""
-        enrollments = self.enrollments.filter(
-            student=student,
-            letterGrade__isnull=False
-        ).exclude(letterGrade='')
-        
-        if not enrollments:
+    def calculate_gpa(self, student=None):
+        """Semester GPA from the stored running totals (kept up to date by betterAPI.gpa)"""
+        if not self.gradedHours:
             return 0.0
-            
-        total_points = 0
-        total_credits = 0
-        
-        for enrollment in enrollments:
-            grade_points = self.get_grade_points(enrollment.letterGrade)
-            if grade_points is None:  # Invalid grade
-                continue
-                
-            credits = enrollment.registration.course.credits
-            total_points += grade_points * credits
-            total_credits += credits
-        
-        return round(total_points / total_credits, 2) if total_credits > 0 else 0.0
+        return round(float(self.qualityPoints) / self.gradedHours, 2)
     
     def calculate_cgpa(self, student):
-        """Calculate cumulative GPA across all semesters for a student"""
-        # Get all previous semesters for this student with non-zero GPA
-        all_semesters = Semester.objects.filter(
+        """Calculate cumulative GPA across all complete semesters for a student"""
+        totals = Semester.objects.filter(
             academicYear__student=student,
-            gpa__gt=0
-        ).order_by('academicYear__yearName', 'semesterName')
+            ungradedCourses=0,
+            gradedHours__gt=0
+        ).aggregate(points=Sum('qualityPoints'), hours=Sum('gradedHours'))
         
-        if not all_semesters:
+        if not totals['hours']:
             return 0.0
-            
-        total_points = 0
-        total_credits = 0
-        
-        for semester in all_semesters:
-            semester_enrollments = semester.enrollments.filter(
-                student=student,
-                letterGrade__isnull=False
-            ).exclude(letterGrade='')
-            
-            for enrollment in semester_enrollments:
-                grade_points = self.get_grade_points(enrollment.letterGrade)
-                if grade_points is not None:
-                    credits = enrollment.registration.course.credits
-                    total_points += grade_points * credits
-                    total_credits += credits
-        
-        return round(total_points / total_credits, 2) if total_credits > 0 else 0.0
+        return round(float(totals['points']) / totals['hours'], 2)
     
     @staticmethod
     def get_grade_points(letter_grade):
@@ -173,13 +195,45 @@ class Semester(models.Model):
         }
         return grade_map.get(letter_grade)
     
-    def is_complete_semester(self, student):
+    def is_complete_semester(self, student=None):
         """Check if all courses in semester have grades assigned"""
-        enrollments = self.enrollments.filter(student=student)
-        return all(
-            enrollment.letterGrade and enrollment.letterGrade.strip()
-            for enrollment in enrollments
-        )
+        return not self.ungradedCourses
+
+class Term(models.Model):
+    """
+    An academic year + semester pair. Enrollments point at their term directly so
+    current-term lookups are an indexed filter on Enrollment instead of a join
+    through Semester and AcademicYear.
+    """
+    yearName = models.CharField(max_length=10)
+    semesterName = models.CharField(choices=Semester.semesterNameOptions, max_length=10)
+
+    # (yearName, semesterName) -> id of a committed row; terms are never deleted or renamed
+    _ids = {}
+
+    class Meta:
+        unique_together = [['yearName', 'semesterName']]
+        ordering = ['yearName', 'semesterName']
+
+    def __str__(self):
+        return f"{self.yearName} - {self.get_semesterName_display()}"
+
+    @classmethod
+    def get_id(cls, year_name, semester_name):
+        key = (year_name, semester_name)
+        term_id = cls._ids.get(key)
+        if term_id is None:
+            term, created = cls.objects.get_or_create(yearName=year_name, semesterName=semester_name)
+            term_id = term.pk
+            # Remembered once the row is committed: if the surrounding transaction (or
+            # savepoint) rolls back, the row and its id are gone and must not be reused
+            transaction.on_commit(lambda: cls._ids.setdefault(key, term_id))
+        return term_id
+
+    @classmethod
+    def current_id(cls, global_settings=None):
+        global_settings = global_settings or GlobalSettings.get_current()
+        return cls.get_id(global_settings.current_academic_year, global_settings.current_semester)
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True, blank=False, null=False)
@@ -225,10 +279,14 @@ class Registration(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='registrations')
     group_number = models.PositiveIntegerField(help_text="Group number for this course (1, 2, 3, etc.)")
     capacity = models.PositiveIntegerField(default=60, help_text="Total capacity for this course group")
+    enrolled_count = models.PositiveIntegerField(default=0, editable=False, help_text="Seats taken, maintained by betterAPI.seats")
     is_active = models.BooleanField(default=True)
 
     class Meta:
         unique_together = [['course', 'group_number']]
+        indexes = [
+            models.Index(fields=['is_active', 'course'], name='registration_active_course'),
+        ]
 
     def __str__(self):
         return f"{self.course.courseCode} - Group {self.group_number}"
@@ -252,7 +310,8 @@ class SchedulePattern(models.Model):
         default='LEC'
     )
     capacity = models.PositiveIntegerField(default=30, help_text="Capacity for this specific section (should be <= registration capacity)")
-
+    enrolled_count = models.PositiveIntegerField(default=0, editable=False, help_text="Seats taken, maintained by betterAPI.seats")
+    occupancy = models.CharField(max_length=18, default='0', editable=False, help_text="Weekly bitmap of the time slots, maintained by betterAPI.timetable")
     
     class Meta:
         unique_together = [['registration', 'pattern_name']]
@@ -286,6 +345,10 @@ class TimeSlot(models.Model):
     class Meta:
         ordering = ['day', 'start_period']
         unique_together = [['pattern', 'day', 'start_period']]
+        indexes = [
+            models.Index(fields=['educator', 'day'], name='timeslot_educator_day'),
+            models.Index(fields=['location', 'day'], name='timeslot_location_day'),
+        ]
 
     def __str__(self):
         return f"{self.pattern.pattern_name} - {self.get_day_display()} P{self.start_period}-{self.end_period}"
@@ -306,18 +369,45 @@ class Enrollment(models.Model):
     
     # Grade fields
     letterGrade = models.CharField(max_length=2, blank=True, null=True)
-    numericGrade = models.DecimalField(max_digits=3, decimal_places=2, default=0.0, blank=True, null=True)
+    numericGrade = models.DecimalField(max_digits=5, decimal_places=2, default=0.0, blank=True, null=True)
     courseworkMax = models.SmallIntegerField(default=50, blank=True, null=True)
     coursework = models.SmallIntegerField(default=0, blank=True, null=True)
     examMax = models.SmallIntegerField(default=50, blank=True, null=True)
     exam = models.SmallIntegerField(default=0, blank=True, null=True)
     total = models.SmallIntegerField(default=0, blank=True, null=True)
 
+    # Copy of semester.academicYear.yearName / semester.semesterName, see Term
+    term = models.ForeignKey(Term, on_delete=models.PROTECT, related_name='enrollments', null=True, editable=False)
+
     class Meta:
         unique_together = [['student', 'registration']]
+        indexes = [
+            models.Index(fields=['term', 'registration'], name='enrollment_term_registration'),
+            models.Index(fields=['term', 'student'], name='enrollment_term_student'),
+            models.Index(fields=['student', 'letterGrade'], name='enrollment_student_grade'),
+            models.Index(fields=['registration', 'semester'], name='enrollment_registration_sem'),
+            # In-progress enrollments (no grade yet): rosters and current registrations
+            models.Index(
+                fields=['registration', 'student'],
+                name='enrollment_ungraded',
+                condition=models.Q(letterGrade__isnull=True)
+            ),
+        ]
 
     def __str__(self):
         return f"{self.student.nameEn} - {self.registration.course.courseCode}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored grade and placement so the GPA aggregates can be updated by delta
+        if 'letterGrade' in field_names:
+            instance._loaded_letterGrade = instance.letterGrade
+        if 'semester_id' in field_names:
+            instance._loaded_semester_id = instance.semester_id
+        if 'registration_id' in field_names:
+            instance._loaded_registration_id = instance.registration_id
+        return instance
     
     def calculate_total_and_grade(self):
         """Calculate total score and assign letter grade"""
@@ -389,6 +479,8 @@ class Enrollment(models.Model):
                 raise ValidationError(f"You can only select one {pattern_type} pattern, but {count} were selected.")
     
     def save(self, *args, **kwargs):
+        if self.term_id is None and self.semester_id is not None:
+            self.term_id = Term.get_id(self.semester.academicYear.yearName, self.semester.semesterName)
         # Save the instance first
         super().save(*args, **kwargs)
         
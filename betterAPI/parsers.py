@@ -0,0 +1,28 @@
+import codecs
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a text/csv request body into a list of dicts keyed by the header row.
+    The body is decoded and read line by line straight off the request stream.
+    Empty cells are dropped so they leave the matching field untouched.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        reader = csv.DictReader(codecs.iterdecode(stream, encoding))
+
+        try:
+            return [
+                {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                for row in reader
+            ]
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ParseError(f"CSV parse error - {e}")
@@ -0,0 +1,247 @@
+"""
+Response bodies of the student/educator read endpoints.
+
+Shared by the DRF views (views.py) and their async versions (async_views.py),
+which fetch the same rows in different ways; both must return identical JSON.
+"""
+
+
+def student_info(student, passed_credit_hours, current_enrollment):
+    """student needs its department loaded, current_enrollment its semester and academic year"""
+    current_semester = None
+    current_academic_year = None
+    current_cgpa = 0.0
+    if current_enrollment:
+        current_semester = current_enrollment.semester.get_semesterName_display()
+        current_academic_year = current_enrollment.semester.academicYear.yearName
+        current_cgpa = float(current_enrollment.semester.cgpa) if current_enrollment.semester.cgpa else 0.0
+
+    return {
+        # Basic student info
+        'studentId': student.studentId,
+        'nameAr': student.nameAr,
+        'nameEn': student.nameEn,
+        'email': student.email,
+        'phone': student.phone,
+        'dateOfBirth': student.dateOfBirth,
+        'address': student.address,
+        'gender': student.Gender,
+        'nationality': student.nationality,
+        'religion': student.religion,
+        'homePhone': student.homePhone,
+        'zipcode': student.zipcode,
+        'nationalId': student.nationalId,
+        'status': student.get_status_display(),
+
+        # Academic info
+        'level': student.level,
+        'earnedHours': student.earnedHours,
+        'passedCreditHours': passed_credit_hours or 0,
+        'cgpa': current_cgpa,
+
+        # Department info (from related table)
+        'department': {
+            'code': student.department.code,
+            'name': student.department.name,
+            'description': student.department.desc
+        },
+
+        # Current semester info
+        'currentSemester': current_semester,
+        'currentAcademicYear': current_academic_year,
+    }
+
+
+def student_grades(student, history, overall_stats):
+    return {
+        'studentId': student.studentId,
+        'studentName': student.nameEn,
+        'academicHistory': history,
+        'overallStats': overall_stats
+    }
+
+
+def student_current_semester(student, current_semester, enrollments):
+    """enrollments of current_semester with their registration's course loaded"""
+    semester_data = {
+        'semesterId': current_semester.semesterId,
+        'semesterName': current_semester.get_semesterName_display(),
+        'academicYear': current_semester.academicYear.yearName,
+        'gpa': float(current_semester.gpa) if current_semester.gpa else 0.0,
+        'cgpa': float(current_semester.cgpa) if current_semester.cgpa else 0.0,
+        'registeredHours': current_semester.registeredHours or 0,
+        'earnedHours': current_semester.earnedHours or 0,
+        'enrollments': []
+    }
+
+    total_registered_hours = 0
+    completed_courses = 0
+
+    for enrollment in enrollments:
+        course = enrollment.registration.course
+        has_grade = enrollment.letterGrade is not None and enrollment.letterGrade != ''
+
+        semester_data['enrollments'].append({
+            'courseCode': course.courseCode,
+            'courseName': course.courseName,
+            'credits': course.credits,
+            'letterGrade': enrollment.letterGrade,
+            'numericGrade': float(enrollment.numericGrade) if enrollment.numericGrade else 0.0,
+            'coursework': enrollment.coursework or 0,
+            'courseworkMax': enrollment.courseworkMax or 50,
+            'exam': enrollment.exam or 0,
+            'examMax': enrollment.examMax or 50,
+            'total': enrollment.total or 0,
+            'hasGrade': has_grade,
+            'isPassed': enrollment.letterGrade in ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-'] if has_grade else None,
+            'isInProgress': not has_grade
+        })
+        total_registered_hours += course.credits
+        if has_grade:
+            completed_courses += 1
+
+    semester_data['totalRegisteredHours'] = total_registered_hours
+    semester_data['completedCourses'] = completed_courses
+    semester_data['inProgressCourses'] = len(enrollments) - completed_courses
+
+    return {
+        'studentId': student.studentId,
+        'studentName': student.nameEn,
+        'currentSemester': semester_data
+    }
+
+
+NO_CURRENT_SEMESTER = {
+    'message': 'No current semester found',
+    'currentSemester': None
+}
+
+
+def student_timetable(student, global_settings, enrollments):
+    """enrollments with registration__course and selected_patterns__time_slots__educator loaded"""
+    timetable = []
+    for enrollment in enrollments:
+        for pattern in enrollment.selected_patterns.all():
+            for time_slot in pattern.time_slots.all():
+                timetable.append({
+                    'courseCode': enrollment.registration.course.courseCode,
+                    'patternName': pattern.pattern_name,
+                    'start': time_slot.start_period,
+                    'end': time_slot.end_period,
+                    'educator': time_slot.educator.nameEn if time_slot.educator else None,
+                    'location': time_slot.location
+                })
+
+    return {
+        'studentId': student.studentId,
+        'studentName': student.nameEn,
+        'academicYear': global_settings.current_academic_year,
+        'semester': global_settings.current_semester,
+        'timetable': timetable
+    }
+
+
+def educator_info(educator):
+    """educator needs its department loaded"""
+    return {
+        'educatorId': educator.educatorId,
+        'nameAr': educator.nameAr,
+        'nameEn': educator.nameEn,
+        'email': educator.email,
+        'phone': educator.phone,
+        'dateOfBirth': educator.dateOfBirth,
+        'address': educator.address,
+        'degrees': educator.degrees,
+        'department': educator.department.name if educator.department else ''
+    }
+
+
+def educator_timetable(educator, global_settings, time_slots):
+    """time_slots with pattern__registration__course loaded"""
+    timetable = []
+    for time_slot in time_slots:
+        timetable.append({
+            'courseCode': time_slot.pattern.registration.course.courseCode,
+            'courseName': time_slot.pattern.registration.course.courseName,
+            'patternName': time_slot.pattern.pattern_name,
+            'patternType': time_slot.pattern.pattern_type,
+            'day': time_slot.day,
+            'start': time_slot.start_period,
+            'end': time_slot.end_period,
+            'location': time_slot.location,
+            'groupNumber': time_slot.pattern.registration.group_number
+        })
+    return {
+        'educatorId': educator.educatorId,
+        'educatorName': educator.nameEn,
+        'academicYear': global_settings.current_academic_year,
+        'semester': global_settings.get_current_semester_display(),
+        'timetable': timetable
+    }
+
+
+def available_registrations(student, departments, eligible_registrations, current_course_codes,
+                            term_masks, registration_counts, pattern_counts):
+    """
+    eligible_registrations from catalog.eligible_entries(), term_masks from
+    timetable.student_term_masks(), the counts from seats.seat_counts()
+    """
+    registrations_by_level = {}
+    for entry in eligible_registrations:
+        registration_data = dict(entry['data'])
+        registration_data['isEnrolled'] = entry['courseCode'] in current_course_codes
+        registration_data['seatsRemaining'] = max(0, registration_data['capacity'] - registration_counts.get(entry['registrationId'], 0))
+        # Patterns of this registration replace the ones already selected for it
+        occupied = 0
+        for registration_id, mask in term_masks.items():
+            if registration_id != entry['registrationId']:
+                occupied |= mask
+        registration_data['schedulePatterns'] = [
+            dict(
+                pattern,
+                seatsRemaining=max(0, pattern['capacity'] - pattern_counts.get(pattern['patternId'], 0)),
+                hasConflict=bool(entry['patternMasks'].get(pattern['patternId'], 0) & occupied)
+            )
+            for pattern in registration_data['schedulePatterns']
+        ]
+
+        # Group by level
+        registrations_by_level.setdefault(entry['level'], []).append(registration_data)
+
+    return {
+        'studentId': student.studentId,
+        'studentName': student.nameEn,
+        'accessibleDepartments': departments,
+        'registrationsByLevel': registrations_by_level,
+        'totalEligibleCourses': len(eligible_registrations)
+    }
+
+
+def educator_course_info(educator, global_settings, registration, total_enrolled, with_grades, students, page, page_size):
+    """registration needs its course loaded, students are roster.student_row()s"""
+    course_info = {
+        'registrationId': registration.id,
+        'courseCode': registration.course.courseCode,
+        'courseName': registration.course.courseName,
+        'credits': registration.course.credits,
+        'groupNumber': registration.group_number,
+        'capacity': registration.capacity,
+        'level': registration.course.level,
+        'totalEnrolled': total_enrolled,
+        'studentsWithGrades': with_grades,
+        'studentsWithoutGrades': total_enrolled - with_grades
+    }
+
+    return {
+        'educatorId': educator.educatorId,
+        'educatorName': educator.nameEn,
+        'academicYear': global_settings.current_academic_year,
+        'semester': global_settings.get_current_semester_display(),
+        'courseInfo': course_info,
+        'students': students,
+        'pagination': {
+            'page': page,
+            'pageSize': page_size,
+            'totalPages': -(-total_enrolled // page_size) if page_size else 1
+        }
+    }
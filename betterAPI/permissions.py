@@ -1,12 +1,16 @@
 from rest_framework.permissions import BasePermission
 
+from .authentication import STUDENT, EDUCATOR
+
+# The role comes from the token's claims (see authentication.py), no query is made
+
 class IsStudent(BasePermission):
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.role == 'Student'
+        return bool(request.user and request.user.is_authenticated and getattr(request.user, 'role', None) == STUDENT)
 
 class IsEducator(BasePermission):
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.role == 'Educator'
+        return bool(request.user and request.user.is_authenticated and getattr(request.user, 'role', None) == EDUCATOR)
 
 class IsStudentOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
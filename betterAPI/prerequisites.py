@@ -0,0 +1,163 @@
+"""
+In-memory prerequisite graph.
+
+Courses are numbered 0..n-1 and every course stores its direct and transitive
+prerequisites as an int bitset. A student's passed courses become one bitset
+too, so "which courses can this student take" is a single pass of
+``required & ~passed`` over the catalog, with no per-course queries.
+
+The graph is built from the database once per process and rebuilt when the
+version stamp in the shared cache moves (bumped by signals once Course and
+Course.prerequisites writes commit).
+
+Links that would close a cycle are refused when they are added (see
+signals.py), but two concurrent admin writes can each pass that check. The
+graph then still builds: the courses in the cycle, and every course that
+requires one of them, are logged and treated as not yet takeable, rather than
+failing every catalog and registration request.
+"""
+import logging
+
+from django.core.cache import cache
+
+from .models import Course
+from . import db_routing
+
+VERSION_KEY = 'prerequisites:version'
+
+_local = {'version': None, 'graph': None}
+
+logger = logging.getLogger(__name__)
+
+
+class PrerequisiteGraph:
+    def __init__(self, course_codes, edges):
+        """
+        course_codes: iterable of course codes
+        edges: iterable of (course_code, prerequisite_code)
+        """
+        self.codes = list(course_codes)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.direct = [0] * len(self.codes)
+        for course_code, prerequisite_code in edges:
+            self.direct[self.index[course_code]] |= 1 << self.index[prerequisite_code]
+        # Courses in or behind a prerequisite cycle; nobody can take them
+        self.blocked = 0
+        self.closure = self._transitive_closure()
+
+    @classmethod
+    def from_database(cls):
+        codes = Course.objects.values_list('courseCode', flat=True)
+        edges = Course.prerequisites.through.objects.values_list('from_course_id', 'to_course_id')
+        return cls(codes, edges)
+
+    def _transitive_closure(self):
+        """Closure in topological order (prerequisites first); sets blocked if there is a cycle"""
+        n = len(self.codes)
+        dependents = [[] for _ in range(n)]
+        remaining = [0] * n
+        for i, mask in enumerate(self.direct):
+            for j in self._bits(mask):
+                dependents[j].append(i)
+                remaining[i] += 1
+
+        ready = [i for i in range(n) if not remaining[i]]
+        closure = list(self.direct)
+        done = 0
+        while ready:
+            j = ready.pop()
+            done += 1
+            for i in dependents[j]:
+                closure[i] |= closure[j]
+                remaining[i] -= 1
+                if not remaining[i]:
+                    ready.append(i)
+
+        if done != n:
+            stuck = [i for i in range(n) if remaining[i]]
+            logger.error(
+                "Prerequisite cycle, these courses cannot be taken until it is removed: %s",
+                ', '.join(sorted(self.codes[i] for i in stuck))
+            )
+            for i in stuck:
+                self.blocked |= 1 << i
+            # No topological order among them: iterate to the fixed point
+            changed = True
+            while changed:
+                changed = False
+                for i in stuck:
+                    merged = closure[i]
+                    for j in self._bits(self.direct[i]):
+                        merged |= closure[j]
+                    if merged != closure[i]:
+                        closure[i] = merged
+                        changed = True
+        return closure
+
+    @staticmethod
+    def _bits(mask):
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def mask(self, course_codes):
+        """Bitset of the given course codes (unknown codes are ignored)"""
+        result = 0
+        for code in course_codes:
+            i = self.index.get(code)
+            if i is not None:
+                result |= 1 << i
+        return result
+
+    def codes_in(self, mask):
+        return {self.codes[i] for i in self._bits(mask)}
+
+    def all_prerequisites(self, course_code):
+        """Direct and indirect prerequisites of a course"""
+        return self.codes_in(self.closure[self.index[course_code]])
+
+    def is_eligible(self, course_code, passed_mask):
+        i = self.index.get(course_code)
+        return i is None or not (self.blocked >> i & 1 or self.direct[i] & ~passed_mask)
+
+    def missing_prerequisites(self, course_code, passed_mask):
+        """Direct prerequisites of a course not in passed_mask, or blocked by a cycle"""
+        i = self.index.get(course_code)
+        return self.codes_in(self.direct[i] & (~passed_mask | self.blocked)) if i is not None else set()
+
+    def eligible_courses(self, passed_mask):
+        """Every course whose direct prerequisites are all in passed_mask"""
+        return {
+            code for i, (code, required) in enumerate(zip(self.codes, self.direct))
+            if not required & ~passed_mask and not self.blocked >> i & 1
+        }
+
+    def would_create_cycle(self, course_code, prerequisite_codes):
+        """True if making prerequisite_codes prerequisites of course_code closes a loop"""
+        i = self.index.get(course_code)
+        if i is None:
+            return False
+        for code in prerequisite_codes:
+            j = self.index.get(code)
+            if j == i or (j is not None and self.closure[j] >> i & 1):
+                return True
+        return False
+
+
+def get_graph():
+    """The process-wide graph, rebuilt when another worker changed the catalog"""
+    version = cache.get_or_set(VERSION_KEY, 1, timeout=None)
+    if _local['graph'] is None or _local['version'] != version:
+        with db_routing.primary():
+            _local['graph'] = PrerequisiteGraph.from_database()
+        _local['version'] = version
+    return _local['graph']
+
+
+def invalidate():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+    _local['graph'] = None
@@ -0,0 +1,137 @@
+"""
+Bulk creation of login accounts for students and educators.
+
+Creating accounts one by one is dominated by password hashing (the initial
+password is the national ID, hashed with the project's default hasher, which
+is deliberately slow). Here the hashes are computed in a process pool, so
+every core hashes at once, while the main process writes the accounts that
+are ready with bulk_create, together with their group membership, one batch
+per transaction. Progress is reported after every batch, with the IDs that
+turned out to have an account already (created by someone else since the
+pending list was read); those are left untouched.
+
+provision() is a generator: closing it early (e.g. the HTTP client went
+away) cancels the chunks not hashed yet and shuts the pool down.
+
+bulk_create skips User signals; nothing in this project listens to them.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import IntegrityError, transaction
+
+from .models import Educator, Student
+
+SOURCES = {'student': Student, 'educator': Educator}
+HASH_CHUNK_SIZE = 50
+BATCH_SIZE = 500
+
+
+def pending_accounts(user_type, ids=None, department=None):
+    """(id, national ID) of the students/educators matching the filter that have no account yet"""
+    records = SOURCES[user_type].objects.exclude(pk__in=User.objects.values('username'))
+    if ids is not None:
+        records = records.filter(pk__in=ids)
+    if department is not None:
+        records = records.filter(department_id=department)
+    return list(records.order_by('pk').values_list('pk', 'nationalId'))
+
+
+def _setup_worker():
+    # Workers started with spawn/forkserver do not inherit configured settings
+    import django
+    django.setup()
+
+
+def _hash_chunk(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def default_workers():
+    return getattr(settings, 'ACCOUNT_PROVISIONING_WORKERS', None) or os.cpu_count() or 1
+
+
+def _write_batch(usernames, hashes, group):
+    """Create the batch's accounts that do not exist yet; returns the usernames that already had one"""
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+                new_usernames = [username for username in usernames if username not in existing]
+                User.objects.bulk_create([
+                    User(username=username, password=password)
+                    for username, password in zip(usernames, hashes) if username not in existing
+                ])
+                user_ids = User.objects.filter(username__in=new_usernames).values_list('id', flat=True)
+                User.groups.through.objects.bulk_create(
+                    [User.groups.through(user_id=user_id, group_id=group.id) for user_id in user_ids]
+                )
+            return sorted(existing)
+        except IntegrityError:
+            # Another request created one of them between the check and the insert
+            if attempt:
+                raise
+
+
+def provision(user_type, accounts, workers=None, batch_size=BATCH_SIZE):
+    """
+    Create accounts for (id, national ID) pairs, yielding a progress dict after
+    every written batch and a final summary with 'done': True.
+    """
+    group, created = Group.objects.get_or_create(name=user_type.capitalize())
+    workers = workers or default_workers()
+    total = len(accounts)
+    start = time.perf_counter()
+    processed = 0
+    created = 0
+
+    usernames = [username for username, _ in accounts]
+    passwords = [national_id for _, national_id in accounts]
+
+    def progress(conflicts=None, done=False):
+        elapsed = time.perf_counter() - start
+        update = {
+            'done': done,
+            'type': user_type,
+            'workers': workers,
+            'created': created,
+            'skipped': processed - created,
+            'total': total,
+            'elapsedSeconds': round(elapsed, 2),
+            'accountsPerSecond': round(processed / elapsed, 2) if elapsed else 0.0,
+        }
+        if conflicts is not None:
+            update['conflicts'] = conflicts
+        return update
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) if workers > 1 else None
+    try:
+        if pool is not None:
+            hashed = pool.map(_hash_chunk, _chunks(passwords, HASH_CHUNK_SIZE))
+        else:
+            hashed = map(_hash_chunk, _chunks(passwords, HASH_CHUNK_SIZE))
+
+        # Chunks come back in order while later ones are still being hashed
+        pending = []
+        for chunk in hashed:
+            pending.extend(chunk)
+            if len(pending) >= batch_size or processed + len(pending) == total:
+                conflicts = _write_batch(usernames[processed:processed + len(pending)], pending, group)
+                processed += len(pending)
+                created += len(pending) - len(conflicts)
+                pending = []
+                yield progress(conflicts)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    yield progress(done=True)
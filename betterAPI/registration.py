@@ -0,0 +1,149 @@
+"""
+Student course registration. Used directly by StudentRegistrationView and by
+the registration queue workers (see registration_queue.py).
+"""
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+
+from .models import AcademicYear, Semester, Registration, SchedulePattern, Enrollment, Term
+from . import seats, prerequisites, timetable
+
+
+class RegistrationError(Exception):
+    """A registration entry the student cannot make (reported per entry)"""
+    pass
+
+
+# Reported per entry; anything else (e.g. OperationalError: database is locked)
+# aborts the request so sqlite_writes.serialized can retry it.
+# ValueError/TypeError come from malformed ids in the payload.
+ENTRY_ERRORS = (RegistrationError, seats.SeatUnavailable, ValidationError, IntegrityError, ValueError, TypeError)
+
+
+def register_courses(student, registrations_data, global_settings):
+    """
+    Apply a student's registration request. Returns (successful, failed) lists.
+    """
+    # Passed courses as a prerequisite bitset, computed once for the whole request
+    graph = prerequisites.get_graph()
+    passed_mask = graph.mask(student.enrollments.filter(
+        letterGrade__in=['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-']
+    ).values_list('registration__course', flat=True))
+
+    successful = []
+    failed = []
+
+    # One transaction per request, one savepoint per registration so a full
+    # section only rolls back its own entry
+    with transaction.atomic():
+        for reg_data in registrations_data:
+            try:
+                with transaction.atomic():
+                    result = process_registration(student, reg_data, global_settings, graph, passed_mask)
+                successful.append(result)
+            except ENTRY_ERRORS as e:
+                failed.append({'registration': reg_data.get('registrationId'), 'error': str(e)})
+
+    return successful, failed
+
+
+def process_registration(student, reg_data, global_settings, graph, passed_mask):
+    reg_id = reg_data.get('registrationId')
+    pattern_data = reg_data.get('schedulePatterns', [])
+    pattern_ids = [pattern.get('patternId') for pattern in pattern_data]
+
+    try:
+        registration = Registration.objects.select_related('course').get(id=reg_id, is_active=True)
+    except Registration.DoesNotExist:
+        raise RegistrationError("Registration not found or inactive")
+
+    academic_year, created = AcademicYear.objects.get_or_create(student=student, yearName=global_settings.current_academic_year)
+    semester, created = Semester.objects.get_or_create(academicYear=academic_year, semesterName=global_settings.current_semester)
+
+    if not pattern_ids:
+        try:
+            enrollment = Enrollment.objects.get(
+                student=student,
+                registration=registration,
+                semester=semester
+            )
+            # Seats are released by the pre_delete signal
+            enrollment.delete()
+            # Update semester registered hours after deletion
+            update_semester_registered_hours(semester, student)
+            return {
+                'registrationId': reg_id,
+                'courseCode': registration.course.courseCode,
+                'action': 'deleted'
+            }
+        except Enrollment.DoesNotExist:
+            return {
+                'registrationId': reg_id,
+                'courseCode': registration.course.courseCode,
+                'action': 'no_change'
+            }
+
+    patterns = list(SchedulePattern.objects.filter(id__in=pattern_ids, registration=registration))
+    if len(patterns) != len(pattern_ids):
+        raise RegistrationError("Some patterns do not belong to this Registration")
+
+    missing = graph.missing_prerequisites(registration.course.courseCode, passed_mask)
+    if missing:
+        raise RegistrationError(f"Missing prerequisites: {', '.join(sorted(missing))}")
+
+    pattern_types = [pattern.pattern_type for pattern in patterns]
+    if len(pattern_types) != len(set(pattern_types)):
+        raise RegistrationError("Cannot select multiple patterns of the same type (e.g., 2 tutorials)")
+
+    # Weekly occupancy of the selected patterns; they must not overlap each other either
+    selected_mask = 0
+    for pattern in patterns:
+        pattern_mask = timetable.from_hex(pattern.occupancy)
+        if selected_mask & pattern_mask:
+            raise RegistrationError(f"Selected patterns overlap: {timetable.describe(selected_mask & pattern_mask)}")
+        selected_mask |= pattern_mask
+
+    enrollment, created = Enrollment.objects.get_or_create(
+        student=student,
+        registration=registration,
+        semester=semester,
+        defaults={'term_id': Term.current_id(global_settings)}
+    )
+
+    # A new enrollment took its registration seat in post_save (see signals.py)
+    previous_mask = 0
+    if not created:
+        for occupancy in enrollment.selected_patterns.values_list('occupancy', flat=True):
+            previous_mask |= timetable.from_hex(occupancy)
+
+    # The semester row carries the student's occupancy, so the conflict check is one AND
+    conflicts = (timetable.from_hex(semester.occupancy) & ~previous_mask) & selected_mask
+    if conflicts:
+        raise RegistrationError(f"Schedule conflict with your timetable: {timetable.describe(conflicts)}")
+
+    # Pattern seats move with the selection (m2m_changed, see signals.py)
+    enrollment.selected_patterns.set(patterns)
+    enrollment.save()
+
+    # Update semester registered hours after enrollment changes
+    update_semester_registered_hours(semester, student)
+
+    return {
+        'registrationId' : reg_id,
+        'courseCode' : registration.course.courseCode,
+        'enrollmentId' : enrollment.id,
+        'action' : 'created' if created else 'updated'
+    }
+
+
+def update_semester_registered_hours(semester, student):
+    total_hours = Enrollment.objects.filter(
+        student=student,
+        semester=semester
+    ).aggregate(
+        total=Sum('registration__course__credits')
+    )['total'] or 0
+
+    semester.registeredHours = total_hours
+    semester.save(update_fields=['registeredHours'])
@@ -0,0 +1,208 @@
+"""
+Optional queued registration mode.
+
+When REGISTRATION_QUEUE['ENABLED'] is set, POST /student/register/ does not
+touch the enrollment tables itself. The request is admitted into a bounded
+queue and a fixed pool of workers applies it (FIFO, or higher levels first
+with ORDER='level'), so the database sees at most WORKERS concurrent
+registrations however many students click at once. The client gets a ticket
+to poll; when the queue is full it gets 429 with a Retry-After estimate.
+
+``LocalQueueBroker`` is an in-process stand-in (queue.PriorityQueue plus
+threads) so the mode works without outside services. Ticket state lives in
+the shared cache, so any worker can answer a ticket poll.
+"""
+import itertools
+import logging
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Student, GlobalSettings
+from .registration import register_courses
+from . import sqlite_writes
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_SIZE': 1000,
+    'WORKERS': 4,
+    'ORDER': 'fifo',
+    'TICKET_TTL': 15 * 60,
+}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'REGISTRATION_QUEUE', {})}
+
+
+def is_enabled():
+    return get_config()['ENABLED']
+
+
+def _ticket_key(ticket_id):
+    return f"regqueue:ticket:{ticket_id}"
+
+
+def get_ticket(ticket_id):
+    return cache.get(_ticket_key(ticket_id))
+
+
+def _save_ticket(ticket):
+    cache.set(_ticket_key(ticket['ticket']), ticket, timeout=get_config()['TICKET_TTL'])
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Registration queue is full")
+        self.retry_after = retry_after
+
+
+class LocalQueueBroker:
+    """Bounded in-process priority queue served by a pool of worker threads"""
+
+    def __init__(self, max_size, workers, order):
+        self.queue = queue.PriorityQueue(maxsize=max_size)
+        self.workers = workers
+        self.order = order
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._threads = []
+        # Recent timings for metrics and Retry-After estimates
+        self._wait_times = deque(maxlen=1000)
+        self._service_times = deque(maxlen=1000)
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"registration-queue-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def average_service_time(self):
+        samples = list(self._service_times)
+        return sum(samples) / len(samples) if samples else 0.5
+
+    def retry_after(self):
+        """Seconds until roughly the whole current queue has drained"""
+        return max(1, math.ceil(self.queue.qsize() * self.average_service_time() / self.workers))
+
+    def submit(self, student, registrations_data):
+        self._start()
+        priority = -student.level if self.order == 'level' else 0
+        ticket = {
+            'ticket': uuid.uuid4().hex,
+            'studentId': student.studentId,
+            'status': 'queued',
+            'position': self.queue.qsize() + 1,
+            'enqueuedAt': time.time(),
+            'result': None,
+        }
+        _save_ticket(ticket)
+        try:
+            self.queue.put_nowait((priority, next(self._sequence), ticket['ticket'], student.studentId, registrations_data))
+        except queue.Full:
+            cache.delete(_ticket_key(ticket['ticket']))
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(self.retry_after())
+        with self._lock:
+            self.accepted += 1
+        return ticket
+
+    def _work(self):
+        while True:
+            _, _, ticket_id, student_id, registrations_data = self.queue.get()
+            started = time.time()
+            ticket = get_ticket(ticket_id) or {'ticket': ticket_id, 'studentId': student_id, 'enqueuedAt': started}
+            self._wait_times.append(started - ticket['enqueuedAt'])
+            ticket.update(status='processing', position=0)
+            _save_ticket(ticket)
+
+            close_old_connections()
+            try:
+                student = Student.objects.select_related('department').get(studentId=student_id)
+                global_settings = GlobalSettings.get_current()
+                if not global_settings.registration_open:
+                    ticket.update(status='failed', result={'error': 'Registration period is closed'})
+                else:
+                    successful, failed = sqlite_writes.serialized(
+                        register_courses, student, registrations_data, global_settings
+                    )
+                    ticket.update(status='done', result={'successful': successful, 'failed': failed})
+            except Exception as e:
+                logger.exception("Queued registration %s failed", ticket_id)
+                ticket.update(status='failed', result={'error': str(e)})
+            finally:
+                close_old_connections()
+                self._service_times.append(time.time() - started)
+                with self._lock:
+                    self.processed += 1
+                self.queue.task_done()
+
+            ticket['finishedAt'] = time.time()
+            _save_ticket(ticket)
+
+    def metrics(self):
+        waits = sorted(self._wait_times)
+        return {
+            'depth': self.queue.qsize(),
+            'capacity': self.queue.maxsize,
+            'workers': self.workers,
+            'order': self.order,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'processed': self.processed,
+            'avgWaitSeconds': round(sum(waits) / len(waits), 3) if waits else 0.0,
+            'maxWaitSeconds': round(waits[-1], 3) if waits else 0.0,
+            'avgServiceSeconds': round(self.average_service_time(), 3),
+        }
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = get_config()
+                _broker = LocalQueueBroker(config['MAX_SIZE'], config['WORKERS'], config['ORDER'])
+    return _broker
+
+
+def submit_response(student, registrations_data):
+    """Admit a registration request into the queue and answer 202, or 429 when full"""
+    try:
+        ticket = get_broker().submit(student, registrations_data)
+    except QueueFull as e:
+        response = Response(
+            {'error': 'Registration queue is full, please retry later', 'retryAfter': e.retry_after},
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response['Retry-After'] = str(e.retry_after)
+        return response
+
+    return Response({
+        'ticket': ticket['ticket'],
+        'status': ticket['status'],
+        'position': ticket['position'],
+        'statusUrl': reverse('student-registration-ticket', kwargs={'ticket': ticket['ticket']})
+    }, status=status.HTTP_202_ACCEPTED)
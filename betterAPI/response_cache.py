@@ -0,0 +1,131 @@
+"""
+Response cache for the student read endpoints.
+
+Every student has a generation number in the shared cache that signals bump
+whenever their enrollments, semesters, academic years or profile change (see
+signals.py). A cached response is keyed by (endpoint, student, generation,
+settings version, catalog version), so nothing is ever invalidated by hand: a
+write simply moves the student on to a new key.
+
+The same versions make up the ETag. A client sending If-None-Match with the
+current ETag gets a 304 after a single cache lookup, without the response
+being read or rebuilt.
+"""
+import functools
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import GlobalSettings
+from . import catalog, db_routing
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def _fresh_version():
+    # Never restart at 1 after an eviction, or old entries would match again
+    return time.time_ns()
+
+
+def generation_key(student_id):
+    return f"student:{student_id}:generation"
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+
+
+def bump_generation(student_ids):
+    """Move students on to a new generation once the current transaction commits"""
+    student_ids = set(student_ids)
+
+    def bump():
+        # The new generation must not be cached from a replica that lags behind
+        db_routing.pin(student_ids)
+        for student_id in student_ids:
+            _bump(generation_key(student_id))
+
+    if student_ids:
+        transaction.on_commit(bump)
+
+
+def current_versions(student_id, depends_on_catalog):
+    """(generation, settings version, catalog version) in one cache round trip"""
+    keys = version_keys(student_id, depends_on_catalog)
+    found = cache.get_many(keys)
+
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            version = cache.get_or_set(key, _fresh_version, timeout=None)
+        versions.append(version)
+    return versions
+
+
+async def acurrent_versions(student_id, depends_on_catalog):
+    """current_versions() for async views"""
+    keys = version_keys(student_id, depends_on_catalog)
+    found = await cache.aget_many(keys)
+
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            version = await cache.aget_or_set(key, _fresh_version, timeout=None)
+        versions.append(version)
+    return versions
+
+
+def version_keys(student_id, depends_on_catalog):
+    keys = [generation_key(student_id), GlobalSettings.VERSION_KEY]
+    if depends_on_catalog:
+        keys.append(catalog.VERSION_KEY)
+    return keys
+
+
+def response_key(scope, student_id, versions):
+    """Cache key and ETag of a response; the async views share both with the DRF ones"""
+    key = f"response:{scope}:{student_id}:" + ':'.join(map(str, versions))
+    return key, '"' + hashlib.md5(key.encode()).hexdigest() + '"'
+
+
+def etag_matches(request, etag):
+    return etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+
+
+def cached_student_response(scope, depends_on_catalog=False):
+    """
+    Decorator for a student view's get(). Caches 200 responses per student and
+    data version and answers If-None-Match with 304.
+    """
+    def decorator(get):
+        @functools.wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            student_id = request.user.username
+            key, etag = response_key(scope, student_id, current_versions(student_id, depends_on_catalog))
+
+            if etag_matches(request, etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                data = cache.get(key)
+                if data is None:
+                    response = get(view, request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                    cache.set(key, response.data, timeout=CACHE_TIMEOUT)
+                else:
+                    response = Response(data, status=status.HTTP_200_OK)
+
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,121 @@
+"""
+Course roster for an educator (GET /educator/course/<id>/).
+
+An educator sees the students of a registration who selected at least one of
+the patterns they teach. The roster is one query: an EXISTS over the
+selected_patterns table filters it, the student and department are joined in,
+and the educator's patterns of each student come from one filtered prefetch.
+Counts come from one aggregate, so the query count does not depend on the size
+of the section.
+"""
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q
+
+from .models import Enrollment, SchedulePattern
+
+SORT_FIELDS = {
+    'name': ('student__nameEn', 'student_id'),
+    'studentId': ('student_id',),
+    'level': ('student__level', 'student__nameEn', 'student_id'),
+    'total': ('total', 'student__nameEn', 'student_id'),
+}
+DEFAULT_SORT = 'name'
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def educator_pattern_ids(educator, registration):
+    """Patterns of the registration with a time slot taught by the educator"""
+    return list(
+        SchedulePattern.objects.filter(registration=registration, time_slots__educator=educator)
+        .values_list('id', flat=True).distinct()
+    )
+
+
+def ordering(sort):
+    """order_by() fields for ?sort=, e.g. 'name' or '-total'; None if unknown"""
+    descending = sort.startswith('-')
+    fields = SORT_FIELDS.get(sort.lstrip('-'))
+    if fields is None:
+        return None
+    return [('-' + field) if descending else field for field in fields]
+
+
+def page_params(query_params):
+    """
+    (order_by, page, page size or None for everything) from ?sort=, ?page= and
+    ?pageSize=; raises ValueError with the message for the client if invalid
+    """
+    order_by = ordering(query_params.get('sort', DEFAULT_SORT))
+    if order_by is None:
+        raise ValueError(f"Invalid sort. Expected one of: {', '.join(SORT_FIELDS)} (prefix with - for descending)")
+    try:
+        page = int(query_params.get('page', 1))
+        page_size = query_params.get('pageSize')
+        page_size = int(page_size) if page_size is not None else None
+    except ValueError:
+        raise ValueError('page and pageSize must be integers') from None
+    if page < 1 or (page_size is not None and not 1 <= page_size <= MAX_PAGE_SIZE):
+        raise ValueError(f'page must be at least 1 and pageSize between 1 and {MAX_PAGE_SIZE}')
+    if page_size is None and 'page' in query_params:
+        page_size = DEFAULT_PAGE_SIZE
+    return order_by, page, page_size
+
+
+def roster(registration, term_id, pattern_ids):
+    selected = Enrollment.selected_patterns.through.objects.filter(
+        enrollment_id=OuterRef('pk'), schedulepattern_id__in=pattern_ids
+    )
+    return Enrollment.objects.filter(
+        Exists(selected), registration=registration, term_id=term_id
+    )
+
+
+def roster_counts(enrollments):
+    """(total, with grades) in one aggregate"""
+    counts = enrollments.aggregate(
+        total=Count('id'),
+        graded=Count('id', filter=Q(letterGrade__isnull=False) & ~Q(letterGrade=''))
+    )
+    return counts['total'], counts['graded']
+
+
+def roster_page(enrollments, pattern_ids, order_by, offset, limit):
+    """One page of the roster with students, departments and the educator's patterns loaded"""
+    enrollments = enrollments.select_related('student__department').prefetch_related(
+        Prefetch(
+            'selected_patterns',
+            queryset=SchedulePattern.objects.filter(id__in=pattern_ids).order_by('id'),
+            to_attr='educator_patterns'
+        )
+    ).order_by(*order_by)
+    if limit is not None:
+        enrollments = enrollments[offset:offset + limit]
+    return list(enrollments)
+
+
+def student_row(enrollment):
+    student = enrollment.student
+    return {
+        'enrollmentId': enrollment.id,
+        'studentId': student.studentId,
+        'studentName': student.nameEn,
+        'studentNameAr': student.nameAr,
+        'level': student.level,
+        'department': student.department.code,
+        'patterns': [
+            {
+                'patternName': pattern.pattern_name,
+                'patternType': pattern.pattern_type
+            }
+            for pattern in enrollment.educator_patterns
+        ],
+        # Grade information
+        'letterGrade': enrollment.letterGrade,
+        'numericGrade': float(enrollment.numericGrade) if enrollment.numericGrade else None,
+        'coursework': enrollment.coursework,
+        'courseworkMax': enrollment.courseworkMax,
+        'exam': enrollment.exam,
+        'examMax': enrollment.examMax,
+        'total': enrollment.total,
+        'hasGrade': enrollment.letterGrade is not None and enrollment.letterGrade != ''
+    }
@@ -0,0 +1,182 @@
+"""
+Seat reservation engine.
+
+Registration and SchedulePattern keep a materialized ``enrolled_count``.
+Seats are taken with a single conditional UPDATE
+(``enrolled_count < capacity``), so two concurrent requests can never both
+take the last seat, and we never need a COUNT over enrollments to know if a
+section is full. All functions here must run inside a transaction.
+
+Only enrollments of the current term hold seats, the same rule
+generate_university and rebuild_seat_counters count by. Seats are taken and
+given back by the Enrollment signals (creation, pattern selection, delete),
+so enrollments made from the admin or the ORM are counted like registrations.
+After the current term changes, run rebuild_seat_counters.
+
+The counters are mirrored in the shared cache (``seats:<model>:<pk>``) so
+read endpoints can show remaining seats without touching the database. The
+mirror is moved by the same delta once the transaction commits, and every
+key expires after SEAT_CACHE_TIMEOUT, which bounds any drift. The same delta
+is published to seat stream watchers (see events.py).
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import Registration, SchedulePattern, Enrollment, Term
+from . import db_routing, events
+
+SEAT_CACHE_TIMEOUT = 5 * 60
+
+logger = logging.getLogger(__name__)
+
+
+class SeatUnavailable(Exception):
+    """Raised when a registration or pattern has no seats left"""
+    pass
+
+
+def _cache_key(model, pk):
+    return f"seats:{model._meta.model_name}:{pk}"
+
+
+def _publish(model, pks, delta, registration_id):
+    """Once the current transaction commits, move the cached mirror and notify watchers"""
+    def bump():
+        for pk in pks:
+            try:
+                cache.incr(_cache_key(model, pk), delta)
+            except ValueError:
+                # Not cached (or expired): the next read loads it from the database
+                pass
+            try:
+                events.publish_seat_change(registration_id, pk if model is SchedulePattern else None, delta)
+            except Exception:
+                # The seat is already committed, a broker outage must not fail the request
+                logger.exception("Could not publish seat change for registration %s", registration_id)
+    transaction.on_commit(bump)
+
+
+def _take_seat(model, pk, registration_id):
+    """Atomically increment enrolled_count if a seat is free. Returns True on success."""
+    taken = model.objects.filter(
+        pk=pk,
+        enrolled_count__lt=F('capacity')
+    ).update(enrolled_count=F('enrolled_count') + 1) == 1
+    if taken:
+        _publish(model, [pk], 1, registration_id)
+    return taken
+
+
+def _free_seats(model, pks, registration_id):
+    if pks:
+        model.objects.filter(
+            pk__in=pks,
+            enrolled_count__gt=0
+        ).update(enrolled_count=F('enrolled_count') - 1)
+        _publish(model, pks, -1, registration_id)
+
+
+def _cached_counts(model, pks):
+    keys = {_cache_key(model, pk): pk for pk in pks}
+    cached = cache.get_many(keys)
+    counts = {keys[key]: value for key, value in cached.items()}
+
+    missing = [pk for pk in pks if pk not in counts]
+    if missing:
+        with db_routing.primary():
+            loaded = dict(model.objects.filter(pk__in=missing).values_list('pk', 'enrolled_count'))
+        cache.set_many({_cache_key(model, pk): count for pk, count in loaded.items()}, timeout=SEAT_CACHE_TIMEOUT)
+        counts.update(loaded)
+    return counts
+
+
+def seat_counts(registration_ids, pattern_ids):
+    """
+    Current enrolled counts as ({registration_id: n}, {pattern_id: n}).
+    Served from the cache; only ids missing from it hit the database.
+    """
+    return _cached_counts(Registration, list(registration_ids)), _cached_counts(SchedulePattern, list(pattern_ids))
+
+
+def holds_seats(enrollment):
+    return enrollment.term_id is not None and enrollment.term_id == Term.current_id()
+
+
+def reserve_registration_seat(registration):
+    if not _take_seat(Registration, registration.pk, registration.pk):
+        raise SeatUnavailable(f"Registration '{registration}' is full ({registration.capacity}/{registration.capacity})")
+
+
+def release_registration_seat(registration_id):
+    _free_seats(Registration, [registration_id], registration_id)
+
+
+def reserve_enrollment_seat(enrollment):
+    """Take the registration seat of a new enrollment"""
+    if holds_seats(enrollment):
+        reserve_registration_seat(enrollment.registration)
+
+
+def take_pattern_seats(enrollment, pattern_ids):
+    """
+    Reserve seats in patterns the enrollment is about to select.
+    Rows are updated in primary key order so concurrent requests lock in the same order.
+    """
+    if not holds_seats(enrollment):
+        return
+    for pattern_id in sorted(pattern_ids):
+        if not _take_seat(SchedulePattern, pattern_id, enrollment.registration_id):
+            name, capacity = SchedulePattern.objects.values_list('pattern_name', 'capacity').get(pk=pattern_id)
+            raise SeatUnavailable(f"Pattern '{name}' is full ({capacity}/{capacity})")
+
+
+def free_pattern_seats(enrollment, pattern_ids):
+    """Give back the seats of patterns the enrollment is about to leave"""
+    if holds_seats(enrollment):
+        _free_seats(SchedulePattern, sorted(pattern_ids), enrollment.registration_id)
+
+
+def release_enrollment_seats(enrollment):
+    """Give back every seat held by an enrollment (used before it is deleted)"""
+    if not holds_seats(enrollment):
+        return
+    pattern_ids = list(enrollment.selected_patterns.values_list('id', flat=True))
+    _free_seats(SchedulePattern, sorted(pattern_ids), enrollment.registration_id)
+    release_registration_seat(enrollment.registration_id)
+
+
+def rebuild_seat_counters():
+    """
+    Recompute every counter from the current term's enrollments.
+    Returns the number of registrations and patterns whose counter was wrong.
+    """
+    drift = 0
+    term_id = Term.current_id()
+
+    registration_counts = dict(
+        Enrollment.objects.filter(term_id=term_id)
+        .values('registration').annotate(n=Count('id')).values_list('registration', 'n')
+    )
+    for registration in Registration.objects.only('id', 'enrolled_count'):
+        actual = registration_counts.get(registration.id, 0)
+        if registration.enrolled_count != actual:
+            Registration.objects.filter(pk=registration.pk).update(enrolled_count=actual)
+            cache.delete(_cache_key(Registration, registration.pk))
+            drift += 1
+
+    pattern_counts = dict(
+        SchedulePattern.objects.annotate(
+            n=Count('enrollments', filter=Q(enrollments__term_id=term_id))
+        ).values_list('id', 'n')
+    )
+    for pattern in SchedulePattern.objects.only('id', 'enrolled_count'):
+        actual = pattern_counts.get(pattern.id, 0)
+        if pattern.enrolled_count != actual:
+            SchedulePattern.objects.filter(pk=pattern.pk).update(enrolled_count=actual)
+            cache.delete(_cache_key(SchedulePattern, pattern.pk))
+            drift += 1
+
+    return drift
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from . models import Student, Course, AcademicYear, Semester, Department, Educator, Registration, Enrollment, SchedulePattern, TimeSlot, GlobalSettings
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from . import prerequisites, timetable
 
 class StudentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,6 +19,13 @@ class CourseSerializer(serializers.ModelSerializer):
         model = Course
         fields = '__all__'
 
+    def validate_prerequisites(self, value):
+        if self.instance is not None:
+            graph = prerequisites.get_graph()
+            if graph.would_create_cycle(self.instance.pk, [course.pk for course in value]):
+                raise serializers.ValidationError("These prerequisites would create a prerequisite cycle.")
+        return value
+
 
 class AcademicYearSerializer(serializers.ModelSerializer):
     class Meta:
@@ -72,6 +80,21 @@ class UserCreationSerializer(serializers.Serializer):
         return data
 
 
+class BulkUserCreationSerializer(serializers.Serializer):
+    """
+    Which students or educators to create accounts for: an explicit list of IDs
+    and/or everyone in a department. Those who already have an account are skipped.
+    """
+    type = serializers.ChoiceField(choices=['student', 'educator'])
+    ids = serializers.ListField(child=serializers.CharField(max_length=10), required=False, allow_empty=False)
+    department = serializers.CharField(max_length=3, required=False)
+
+    def validate(self, data):
+        if 'ids' not in data and 'department' not in data:
+            raise serializers.ValidationError("Give 'ids', 'department' or both.")
+        return data
+
+
 class GlobalSettingsSerializer(serializers.ModelSerializer):
     """
     Serializer for GlobalSettings model - current academic year and semester
@@ -190,3 +213,28 @@ class TimeSlotSerializer(serializers.ModelSerializer):
         fields = ['id', 'pattern', 'pattern_info', 'day', 'day_name', 'start_period', 
                  'end_period', 'location', 'educator', 'educator_name']
 
+    def validate(self, data):
+        def current(field):
+            if field in data:
+                return data[field]
+            return getattr(self.instance, field, None)
+
+        day, start_period, end_period = current('day'), current('start_period'), current('end_period')
+        if start_period and end_period and end_period < start_period:
+            raise serializers.ValidationError("End period cannot be earlier than start period.")
+
+        educator = current('educator')
+        clashes = timetable.booking_conflicts(
+            day, start_period, end_period,
+            educator_id=educator.pk if educator else None,
+            location=current('location'),
+            exclude_id=self.instance.pk if self.instance else None
+        )
+        if clashes:
+            raise serializers.ValidationError([
+                f"{clash['resource'].capitalize()} {clash['value']} is already booked on {clash['dayName']} "
+                f"period(s) {', '.join(map(str, clash['periods']))} (time slot(s) {', '.join(map(str, clash['conflictsWith']))})"
+                for clash in clashes
+            ])
+        return data
+
@@ -0,0 +1,269 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import pre_delete, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Enrollment, Registration, SchedulePattern, TimeSlot, Course, Educator, Student, AcademicYear, Semester, GlobalSettings, Term
+from . import seats, gpa, catalog, db_routing, prerequisites, timetable, response_cache, dashboard
+
+_MISSING = object()
+
+
+@receiver(post_save, sender=Enrollment)
+def reserve_seat_on_enrollment_create(sender, instance, created, raw=False, **kwargs):
+    """Take the registration seat no matter where the enrollment is created from"""
+    if created and not raw:
+        seats.reserve_enrollment_seat(instance)
+
+
+@receiver(m2m_changed, sender=Enrollment.selected_patterns.through)
+def move_pattern_seats(sender, instance, action, reverse, pk_set, **kwargs):
+    """Selected patterns hold a seat each; take or give them back before the links change"""
+    if action not in ('pre_add', 'pre_remove', 'pre_clear'):
+        return
+    if reverse:
+        # instance is a pattern and pk_set holds enrollment ids
+        enrollments = Enrollment.objects.all() if action == 'pre_add' else instance.enrollments.all()
+        if action != 'pre_clear':
+            enrollments = enrollments.filter(pk__in=pk_set)
+        for enrollment in enrollments.order_by('pk'):
+            if action == 'pre_add':
+                seats.take_pattern_seats(enrollment, [instance.pk])
+            else:
+                seats.free_pattern_seats(enrollment, [instance.pk])
+    elif action == 'pre_add':
+        # Django only passes the patterns that are not linked yet
+        seats.take_pattern_seats(instance, pk_set)
+    else:
+        selected = instance.selected_patterns.all()
+        if action == 'pre_remove':
+            selected = selected.filter(pk__in=pk_set)
+        seats.free_pattern_seats(instance, list(selected.values_list('pk', flat=True)))
+
+
+@receiver(pre_delete, sender=Enrollment)
+def release_seats_on_enrollment_delete(sender, instance, **kwargs):
+    """Keep seat counters right no matter where the enrollment is deleted from"""
+    seats.release_enrollment_seats(instance)
+
+
+@receiver(post_save, sender=Enrollment)
+def update_grade_aggregates(sender, instance, created, raw=False, **kwargs):
+    """Apply the grade change of this save to the semester's running totals"""
+    if raw:
+        return
+
+    credits = instance.registration.course.credits
+    if created:
+        gpa.apply_delta(instance.semester_id, gpa.EMPTY_TOTALS, gpa.grade_contribution(instance.letterGrade, credits))
+    else:
+        old_grade = getattr(instance, '_loaded_letterGrade', _MISSING)
+        if old_grade is _MISSING:
+            # Instance was not loaded from the database, we cannot know the old grade.
+            # rebuild_gpa_aggregates reconciles these.
+            return
+        old_semester_id = getattr(instance, '_loaded_semester_id', instance.semester_id)
+        old_registration_id = getattr(instance, '_loaded_registration_id', instance.registration_id)
+        if (old_semester_id, old_registration_id) != (instance.semester_id, instance.registration_id):
+            # Moved: take the old contribution out of the old semester, add the new one to the new semester
+            old_credits = credits
+            if old_registration_id != instance.registration_id:
+                old_credits = Registration.objects.values_list('course__credits', flat=True).get(pk=old_registration_id)
+            gpa.apply_delta(old_semester_id, gpa.grade_contribution(old_grade, old_credits), gpa.EMPTY_TOTALS)
+            gpa.apply_delta(instance.semester_id, gpa.EMPTY_TOTALS, gpa.grade_contribution(instance.letterGrade, credits))
+        elif old_grade != instance.letterGrade:
+            gpa.apply_grade_change(instance.semester_id, old_grade, instance.letterGrade, credits)
+
+    instance._loaded_letterGrade = instance.letterGrade
+    instance._loaded_semester_id = instance.semester_id
+    instance._loaded_registration_id = instance.registration_id
+
+
+@receiver(pre_delete, sender=Enrollment)
+def remove_grade_aggregates(sender, instance, **kwargs):
+    # The stored row is what the totals count, even if the instance was changed since
+    grade = getattr(instance, '_loaded_letterGrade', instance.letterGrade)
+    semester_id = getattr(instance, '_loaded_semester_id', instance.semester_id)
+    registration_id = getattr(instance, '_loaded_registration_id', instance.registration_id)
+    if registration_id == instance.registration_id:
+        credits = instance.registration.course.credits
+    else:
+        credits = Registration.objects.values_list('course__credits', flat=True).get(pk=registration_id)
+    gpa.apply_delta(semester_id, gpa.grade_contribution(grade, credits), gpa.EMPTY_TOTALS)
+
+
+@receiver(post_save, sender=Registration)
+@receiver(post_delete, sender=Registration)
+@receiver(post_save, sender=SchedulePattern)
+@receiver(post_delete, sender=SchedulePattern)
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Educator)
+@receiver(post_delete, sender=Educator)
+@receiver(m2m_changed, sender=Course.departments.through)
+def invalidate_catalog(sender, **kwargs):
+    """Any change to the offering tree makes the cached catalog snapshots stale once it commits"""
+    if kwargs.get('raw'):
+        return
+    if kwargs.get('action', 'post_').startswith('post_'):
+        # Bumped inside the transaction, a concurrent reader could cache pre-commit rows under the new version
+        transaction.on_commit(catalog.invalidate)
+
+
+@receiver(m2m_changed, sender=Course.prerequisites.through)
+def guard_prerequisite_cycles(sender, instance, action, reverse, pk_set, **kwargs):
+    """Refuse prerequisite links that would make the graph cyclic, rebuild it after any change"""
+    if action == 'pre_add' and pk_set:
+        # Not the shared graph: it is only rebuilt after commit, and this transaction
+        # may already hold links of its own
+        with db_routing.primary():
+            graph = prerequisites.PrerequisiteGraph.from_database()
+        if reverse:
+            # instance becomes a prerequisite of every course in pk_set
+            cyclic = any(graph.would_create_cycle(code, [instance.pk]) for code in pk_set)
+        else:
+            cyclic = graph.would_create_cycle(instance.pk, pk_set)
+        if cyclic:
+            raise ValidationError(f"Adding these prerequisites to {instance.pk} would create a cycle")
+    elif action.startswith('post_'):
+        transaction.on_commit(prerequisites.invalidate)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_prerequisite_graph(sender, **kwargs):
+    """After commit, like the catalog: no process may rebuild the graph from uncommitted rows"""
+    if not kwargs.get('raw'):
+        transaction.on_commit(prerequisites.invalidate)
+
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def update_pattern_occupancy(sender, instance, **kwargs):
+    """The pattern's mask follows its slots, and so do the timetables of the students who selected it"""
+    if kwargs.get('raw'):
+        return
+    timetable.refresh_pattern_occupancy(instance.pattern_id)
+    semester_ids = timetable.pattern_semester_ids(instance.pattern_id)
+    if semester_ids:
+        transaction.on_commit(lambda: timetable.refresh_semesters_occupancy(semester_ids))
+
+
+@receiver(pre_delete, sender=SchedulePattern)
+def remember_pattern_semesters(sender, instance, **kwargs):
+    # The selection rows go with the pattern without an m2m_changed signal
+    instance._occupancy_semester_ids = timetable.pattern_semester_ids(instance.pk)
+
+
+@receiver(post_delete, sender=SchedulePattern)
+def update_occupancy_on_pattern_delete(sender, instance, **kwargs):
+    semester_ids = getattr(instance, '_occupancy_semester_ids', [])
+    if semester_ids:
+        transaction.on_commit(lambda: timetable.refresh_semesters_occupancy(semester_ids))
+
+
+@receiver(m2m_changed, sender=Enrollment.selected_patterns.through)
+def update_semester_occupancy(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep the student's weekly occupancy in line with the selected patterns"""
+    if reverse and action == 'pre_clear':
+        # pk_set is not given on clear, remember whose timetable the pattern was in
+        instance._occupancy_semester_ids = list(
+            Enrollment.objects.filter(selected_patterns=instance).values_list('semester_id', flat=True)
+        )
+        return
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        semester_ids = [instance.semester_id]
+    elif action == 'post_clear':
+        semester_ids = getattr(instance, '_occupancy_semester_ids', [])
+    else:
+        # instance is a pattern and pk_set holds enrollment ids
+        semester_ids = Enrollment.objects.filter(pk__in=pk_set).values_list('semester_id', flat=True)
+    timetable.refresh_semesters_occupancy(semester_ids)
+
+
+@receiver(post_delete, sender=Enrollment)
+def remove_enrollment_occupancy(sender, instance, **kwargs):
+    timetable.refresh_semester_occupancy(instance.semester_id)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_save, sender=AcademicYear)
+@receiver(post_delete, sender=AcademicYear)
+def bump_student_generation(sender, instance, **kwargs):
+    """The student's cached read responses are stale after any of these writes"""
+    response_cache.bump_generation([instance.student_id])
+
+
+@receiver(m2m_changed, sender=Enrollment.selected_patterns.through)
+def bump_generation_on_pattern_change(sender, instance, action, reverse, **kwargs):
+    if action.startswith('post_') and not reverse:
+        response_cache.bump_generation([instance.student_id])
+
+
+@receiver(post_save, sender=Semester)
+@receiver(post_delete, sender=Semester)
+def bump_generation_on_semester_change(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    response_cache.bump_generation(
+        AcademicYear.objects.filter(pk=instance.academicYear_id).values_list('student_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Student)
+def bump_generation_on_student_change(sender, instance, **kwargs):
+    response_cache.bump_generation([instance.pk])
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def bump_roster_version(sender, instance, **kwargs):
+    """Educator dashboards of the enrollment's term are stale after any of these writes"""
+    if not kwargs.get('raw'):
+        dashboard.bump_rosters([instance.term_id])
+
+
+@receiver(m2m_changed, sender=Enrollment.selected_patterns.through)
+def bump_roster_version_on_pattern_change(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        dashboard.bump_rosters([instance.term_id])
+    else:
+        # instance is a pattern; its enrollments all belong to the pattern's registration
+        dashboard.bump_rosters(
+            Enrollment.objects.filter(registration_id=instance.registration_id).values_list('term_id', flat=True).distinct()
+        )
+
+
+@receiver(post_save, sender=GlobalSettings)
+@receiver(post_delete, sender=GlobalSettings)
+def invalidate_global_settings(sender, **kwargs):
+    """Every worker reloads the settings (and drops settings-dependent responses) after commit"""
+    transaction.on_commit(GlobalSettings.invalidate_cache)
+
+
+def _sync_enrollment_terms(semester):
+    term_id = Term.get_id(semester.academicYear.yearName, semester.semesterName)
+    semester.enrollments.exclude(term_id=term_id).update(term_id=term_id)
+
+
+@receiver(post_save, sender=Semester)
+def sync_terms_on_semester_change(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Enrollment.term copies the semester's year and name; follow renames"""
+    if raw or created or (update_fields and not {'semesterName', 'academicYear'} & set(update_fields)):
+        return
+    _sync_enrollment_terms(instance)
+
+
+@receiver(post_save, sender=AcademicYear)
+def sync_terms_on_academic_year_change(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or created or (update_fields and 'yearName' not in update_fields):
+        return
+    for semester in instance.semesters.select_related('academicYear'):
+        _sync_enrollment_terms(semester)
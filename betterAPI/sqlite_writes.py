@@ -0,0 +1,71 @@
+"""
+Write serialization for the SQLite concurrency mode (SQLITE_CONCURRENCY_MODE).
+
+SQLite allows one writer at a time. In this mode every connection opens with
+WAL journaling, so readers no longer block the writer or each other, and
+write transactions begin IMMEDIATE: they take the write lock up front and wait
+for it through the busy timeout instead of failing with "database is locked"
+when a read transaction tries to upgrade (see API/settings.py).
+
+The heavy write paths (registration and grade import) also go through
+``serialized()``. Writers of one process queue on a lock rather than all
+polling SQLite's busy handler, and a writer that still finds the database
+locked (another process held it past the busy timeout) is retried with
+exponential backoff and jitter. The functions passed in must open their own
+transaction and write nothing before it, so running them again is safe.
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.05
+MAX_DELAY = 1.0
+# Longest a writer queues behind the others of its process
+QUEUE_TIMEOUT = 30
+
+_write_lock = threading.Lock()
+
+
+class WriteContention(Exception):
+    """The database stayed locked through every attempt"""
+
+
+def enabled():
+    return getattr(settings, 'SQLITE_CONCURRENCY_MODE', False) and connection.vendor == 'sqlite'
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def serialized(func, *args, **kwargs):
+    """func(*args, **kwargs), one writer per process at a time, retried while the database is locked"""
+    if not enabled():
+        return func(*args, **kwargs)
+
+    delay = BASE_DELAY
+    last_error = None
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(delay / 2, delay))
+            delay = min(MAX_DELAY, delay * 2)
+        if not _write_lock.acquire(timeout=QUEUE_TIMEOUT):
+            raise WriteContention(f"Waited over {QUEUE_TIMEOUT}s for the other writers of this process")
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as e:
+            if not is_lock_error(e):
+                raise
+            last_error = e
+            logger.info("Database locked, retrying %s (attempt %d)", func.__name__, attempt + 1)
+        finally:
+            _write_lock.release()
+    raise WriteContention(f"Database still locked after {MAX_ATTEMPTS} attempts") from last_error
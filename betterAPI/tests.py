@@ -1,3 +1,1220 @@
-from django.test import TestCase
+import datetime
+import re
+import warnings
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed, ValidationError
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import catalog, db_routing, gpa, grading, prerequisites, seats, sqlite_writes, throttling, timetable, urls, views
+from .authentication import ADMIN, ClaimsUser, EDUCATOR, STUDENT
+from .instrumentation import QueryBudgetExceeded
+from .models import (
+    AcademicYear, Course, Department, Educator, Enrollment, GlobalSettings, Registration,
+    SchedulePattern, Semester, Student, Term, TimeSlot
+)
+from .registration import register_courses
+from .views import EducatorInfo
+
+
+def claims_user(username, role, is_staff=False):
+    """The request.user a login token of this student/educator/admin produces (see authentication.py)"""
+    token = AccessToken()
+    token['user_id'] = 1
+    token['username'] = username
+    token['is_staff'] = is_staff
+    token['role'] = role
+    token['profileId'] = username
+    return ClaimsUser(token)
+
+
+@override_settings(THROTTLE_ENABLED=False, GLOBAL_SETTINGS_CACHE_TTL=3600)
+class UniversityTestCase(TestCase):
+    """
+    One department, one educator and a current-term offering; a newcomer in their
+    first semester and a veteran with four years of graded history.
+    """
+    HISTORY_YEARS = ['2020-2021', '2021-2022', '2022-2023', '2023-2024']
+
+    @classmethod
+    def setUpTestData(cls):
+        # Term ids and settings are cached per process and the rows are rolled back after every test class
+        Term._ids.clear()
+        GlobalSettings._local['instance'] = None
+        cls.global_settings = GlobalSettings.load()
+
+        cls.department = Department.objects.create(code='CS', name='Computer Science')
+        cls.educator = Educator.objects.create(
+            educatorId='E0001', nameAr='Educator', nameEn='Educator',
+            nationalId='10000000000001', department=cls.department
+        )
+        cls.registration, cls.lecture = cls.offering('CS101', day=0)
+        cls.other_registration, cls.other_lecture = cls.offering('CS102', day=1)
+
+        cls.newcomer = cls.student('S0001', '20000000000001', level=0)
+        cls.enroll(cls.newcomer, cls.registration, cls.current_semester(cls.newcomer), [cls.lecture])
+
+        cls.veteran = cls.student('S0002', '20000000000002', level=4)
+        course_number = 0
+        for year_name in cls.HISTORY_YEARS:
+            academic_year = AcademicYear.objects.create(student=cls.veteran, yearName=year_name)
+            for semester_name in ('fall', 'spring'):
+                semester = Semester.objects.create(academicYear=academic_year, semesterName=semester_name)
+                for _ in range(2):
+                    course_number += 1
+                    registration, lecture = cls.offering(f"H{course_number:03d}", day=2)
+                    cls.enroll(cls.veteran, registration, semester, [lecture], coursework=40, exam=45)
+        current = cls.current_semester(cls.veteran)
+        cls.enroll(cls.veteran, cls.registration, current, [cls.lecture])
+        cls.enroll(cls.veteran, cls.other_registration, current, [cls.other_lecture])
+
+    @classmethod
+    def offering(cls, course_code, day):
+        course = Course.objects.create(courseCode=course_code, courseName=f"Course {course_code}", level=0)
+        course.departments.add(cls.department)
+        registration = Registration.objects.create(course=course, group_number=1, capacity=30)
+        lecture = SchedulePattern.objects.create(
+            registration=registration, pattern_name='Main Lecture', pattern_type='LEC', capacity=30
+        )
+        TimeSlot.objects.create(pattern=lecture, educator=cls.educator, day=day, start_period=1, end_period=2)
+        return registration, lecture
+
+    @classmethod
+    def student(cls, student_id, national_id, level):
+        return Student.objects.create(
+            studentId=student_id, nameAr=student_id, nameEn=student_id, nationalId=national_id,
+            department=cls.department, level=level, dateOfBirth=datetime.date(2004, 1, 1), address='Cairo'
+        )
+
+    @classmethod
+    def current_semester(cls, student):
+        academic_year = AcademicYear.objects.create(student=student, yearName=cls.global_settings.current_academic_year)
+        return Semester.objects.create(academicYear=academic_year, semesterName=cls.global_settings.current_semester)
+
+    @classmethod
+    def enroll(cls, student, registration, semester, patterns, coursework=None, exam=None):
+        enrollment = Enrollment(student=student, registration=registration, semester=semester, coursework=coursework, exam=exam)
+        enrollment.calculate_total_and_grade()
+        enrollment.save()
+        enrollment.selected_patterns.add(*patterns)
+        return enrollment
+
+    def setUp(self):
+        cache.clear()
+        # Snapshots of another test's rows (same course codes, other ids)
+        catalog._local.update(version=None, snapshots={})
+        prerequisites._local.update(version=None, graph=None)
+        # Settings and the current term id are kept in process memory; load them
+        # here so the counted requests see the steady state of a warm worker
+        GlobalSettings._local['instance'] = None
+        GlobalSettings.get_current()
+        # Term ids are remembered once their row commits
+        with self.captureOnCommitCallbacks(execute=True):
+            Term.current_id()
+        self.client = APIClient()
+
+    def get(self, name, user, **kwargs):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(reverse(name, kwargs=kwargs))
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def set_global_settings(self, **changes):
+        GlobalSettings.objects.filter(pk=self.global_settings.pk).update(**changes)
+        GlobalSettings.invalidate_cache()
+
+    def register(self, student, *entries):
+        """POST /student/register/ with (registration, [patterns]) entries"""
+        self.client.force_authenticate(user=claims_user(student.pk, STUDENT))
+        payload = [
+            {'registrationId': registration.pk, 'schedulePatterns': [{'patternId': pattern.pk} for pattern in patterns]}
+            for registration, patterns in entries
+        ]
+        return self.client.post(reverse('student-registration'), payload, format='json')
+
+    def available_entries(self, student):
+        """The student's /student/available-registrations/ entries by registration id"""
+        response = self.get('available-registrations', claims_user(student.pk, STUDENT))
+        return {
+            entry['registrationId']: entry
+            for entries in response.data['registrationsByLevel'].values() for entry in entries
+        }
+
+    def available(self, student, registration):
+        """The registration's entry in the student's /student/available-registrations/"""
+        entry = self.available_entries(student).get(registration.pk)
+        if entry is None:
+            self.fail(f"Registration {registration.pk} is not available to {student.pk}")
+        return entry
+
+
+class StudentQueryCountTests(UniversityTestCase):
+    """The student read endpoints run the same number of queries however long the history is"""
+
+    def assertConstantQueries(self, name):
+        with CaptureQueriesContext(connection) as newcomer_queries:
+            self.get(name, claims_user(self.newcomer.pk, STUDENT))
+        with self.assertNumQueries(len(newcomer_queries)):
+            return self.get(name, claims_user(self.veteran.pk, STUDENT))
+
+    def test_grades(self):
+        response = self.assertConstantQueries('student-grades')
+        history = response.json()['academicHistory']
+        # Newest year first
+        self.assertEqual([year['yearName'] for year in history], ['2024-2025'] + self.HISTORY_YEARS[::-1])
+        self.assertEqual(sum(len(semester['enrollments']) for year in history for semester in year['semesters']), 18)
+
+    def test_grades_single_transcript_query(self):
+        # Student lookup and the flat transcript query
+        with self.assertNumQueries(2):
+            self.get('student-grades', claims_user(self.veteran.pk, STUDENT))
+
+    def test_info(self):
+        self.assertConstantQueries('student-info')
+
+    def test_current_semester(self):
+        response = self.assertConstantQueries('student-current-semester')
+        self.assertEqual(len(response.json()['currentSemester']['enrollments']), 2)
+
+    def test_timetable(self):
+        self.assertConstantQueries('student-timetable')
+
+
+
+@override_settings(ENFORCE_QUERY_BUDGETS=True)
+class QueryBudgetTests(UniversityTestCase):
+    """Every view with a query_budget, through RequestMetricsMiddleware, with cold caches"""
+
+    def budgeted_requests(self):
+        student = claims_user(self.veteran.pk, STUDENT)
+        educator = claims_user(self.educator.pk, EDUCATOR)
+        return {
+            'student-info': (student, {}),
+            'student-grades': (student, {}),
+            'student-current-semester': (student, {}),
+            'student-timetable': (student, {}),
+            'educator-info': (educator, {}),
+            'educator-current-courses': (educator, {}),
+            'educator-course-info': (educator, {'registration_id': self.registration.pk}),
+        }
+
+    def test_every_budgeted_view_is_covered(self):
+        budgeted = {
+            pattern.name for pattern in urls.urlpatterns
+            if getattr(getattr(pattern.callback, 'view_class', None), 'query_budget', None) is not None
+        }
+        self.assertEqual(budgeted, set(self.budgeted_requests()))
+
+    def test_views_stay_within_their_budget(self):
+        view_classes = {pattern.name: getattr(pattern.callback, 'view_class', None) for pattern in urls.urlpatterns}
+        for name, (user, kwargs) in self.budgeted_requests().items():
+            with self.subTest(name):
+                cache.clear()
+                # Over budget, the request raises QueryBudgetExceeded
+                response = self.get(name, user, **kwargs)
+                queries = int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+                self.assertLessEqual(queries, view_classes[name].query_budget)
+
+    def test_exceeding_the_budget_fails_the_request(self):
+        with mock.patch.object(EducatorInfo, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.get('educator-info', claims_user(self.educator.pk, EDUCATOR))
+
+
+class GlobalSettingsCacheTests(TestCase):
+    """GlobalSettings.get_current(): process-local copy, revalidated against the shared version stamp"""
+
+    def setUp(self):
+        cache.clear()
+        GlobalSettings._local['instance'] = None
+        self.row = GlobalSettings.load()
+
+    def save_row(self, **changes):
+        for field, value in changes.items():
+            setattr(self.row, field, value)
+        self.row.save()
+
+    @override_settings(GLOBAL_SETTINGS_CACHE_TTL=60)
+    def test_cached_read_runs_no_query(self):
+        GlobalSettings.get_current()
+        with self.assertNumQueries(0):
+            self.assertEqual(GlobalSettings.get_current().current_semester, 'fall')
+
+    def test_returns_a_copy(self):
+        GlobalSettings.get_current().current_semester = 'summer'
+        self.assertEqual(GlobalSettings.get_current().current_semester, 'fall')
+
+    @override_settings(GLOBAL_SETTINGS_CACHE_TTL=60)
+    def test_save_is_seen_after_commit(self):
+        GlobalSettings.get_current()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.save_row(current_semester='spring')
+            # Invalidation waits for the commit
+            self.assertEqual(GlobalSettings.get_current().current_semester, 'fall')
+        self.assertIn(GlobalSettings.invalidate_cache, callbacks)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(GlobalSettings.get_current().current_semester, 'spring')
+
+    @override_settings(GLOBAL_SETTINGS_CACHE_TTL=60)
+    def test_rolled_back_save_keeps_the_cache(self):
+        GlobalSettings.get_current()
+        version = cache.get(GlobalSettings.VERSION_KEY)
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    self.save_row(current_semester='spring')
+                    raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertEqual(cache.get(GlobalSettings.VERSION_KEY), version)
+
+    def test_change_in_another_process_is_seen_after_the_ttl(self):
+        with override_settings(GLOBAL_SETTINGS_CACHE_TTL=60):
+            GlobalSettings.get_current()
+            # Another worker saves the settings and bumps the shared version once it commits;
+            # no signal runs in this process
+            GlobalSettings.objects.filter(pk=self.row.pk).update(current_semester='spring')
+            cache.incr(GlobalSettings.VERSION_KEY)
+
+            # Within the TTL the local copy is trusted: stale, but no query
+            with self.assertNumQueries(0):
+                self.assertEqual(GlobalSettings.get_current().current_semester, 'fall')
+
+        with override_settings(GLOBAL_SETTINGS_CACHE_TTL=0):
+            # Past the TTL the version check finds the bump and reloads
+            with self.assertNumQueries(1):
+                self.assertEqual(GlobalSettings.get_current().current_semester, 'spring')
+
+    @override_settings(GLOBAL_SETTINGS_CACHE_TTL=0)
+    def test_revalidation_without_a_change_runs_no_query(self):
+        GlobalSettings.get_current()
+        with self.assertNumQueries(0):
+            self.assertEqual(GlobalSettings.get_current().current_semester, 'fall')
+
+
+class SeatAccountingTests(UniversityTestCase):
+    """Seat counters follow registrations, pattern changes and drops, and never oversell"""
+
+    def setUp(self):
+        super().setUp()
+        self.set_global_settings(registration_open=True)
+        self.newcomers = [
+            self.student(f"S1{i:03d}", f"2100000000{i:04d}", level=0) for i in range(3)
+        ]
+
+    def register_committed(self, student, *entries):
+        # Seat mirrors and events move once the request's transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.register(student, *entries)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def counters(self, *objects):
+        return [type(obj).objects.values_list('enrolled_count', flat=True).get(pk=obj.pk) for obj in objects]
+
+    def test_fixture_counts_only_current_term_enrollments(self):
+        self.assertEqual(self.counters(self.registration, self.lecture), [2, 2])
+        self.assertEqual(self.counters(self.other_registration, self.other_lecture), [1, 1])
+        # The veteran's graded history holds no seats
+        self.assertEqual(seats.rebuild_seat_counters(), 0)
+
+    def test_register_and_drop(self):
+        student = self.newcomers[0]
+        self.assertEqual(self.available(student, self.other_registration)['seatsRemaining'], 29)
+
+        response = self.register_committed(student, (self.other_registration, [self.other_lecture]))
+        self.assertEqual(response.data['successful'][0]['action'], 'created')
+        self.assertEqual(self.counters(self.other_registration, self.other_lecture), [2, 2])
+        entry = self.available(student, self.other_registration)
+        self.assertEqual(entry['seatsRemaining'], 28)
+        self.assertEqual(entry['schedulePatterns'][0]['seatsRemaining'], 28)
+        self.assertTrue(entry['isEnrolled'])
+
+        response = self.register_committed(student, (self.other_registration, []))
+        self.assertEqual(response.data['successful'][0]['action'], 'deleted')
+        self.assertEqual(self.counters(self.other_registration, self.other_lecture), [1, 1])
+        self.assertEqual(self.available(student, self.other_registration)['seatsRemaining'], 29)
+
+    def test_changing_pattern_moves_the_pattern_seat(self):
+        second_lecture = SchedulePattern.objects.create(
+            registration=self.other_registration, pattern_name='Second Lecture', pattern_type='LEC', capacity=30
+        )
+        TimeSlot.objects.create(pattern=second_lecture, educator=self.educator, day=3, start_period=1, end_period=2)
+        student = self.newcomers[0]
+
+        self.register_committed(student, (self.other_registration, [self.other_lecture]))
+        response = self.register_committed(student, (self.other_registration, [second_lecture]))
+        self.assertEqual(response.data['successful'][0]['action'], 'updated')
+        self.assertEqual(self.counters(self.other_registration, self.other_lecture, second_lecture), [2, 1, 1])
+
+    def test_full_section_is_not_oversold(self):
+        Registration.objects.filter(pk=self.other_registration.pk).update(capacity=2)
+        first, second, third = self.newcomers
+
+        self.assertEqual(self.register_committed(first, (self.other_registration, [self.other_lecture])).data['failed'], [])
+        for student in (second, third):
+            response = self.register_committed(student, (self.other_registration, [self.other_lecture]))
+            self.assertEqual(response.data['successful'], [])
+            self.assertIn('is full', response.data['failed'][0]['error'])
+
+        self.assertEqual(self.counters(self.other_registration), [2])
+        self.assertEqual(Enrollment.objects.filter(registration=self.other_registration).count(), 2)
+        self.assertEqual(self.available(third, self.other_registration)['seatsRemaining'], 0)
+
+    def test_full_pattern_rolls_back_the_registration_seat(self):
+        SchedulePattern.objects.filter(pk=self.other_lecture.pk).update(capacity=1)
+        response = self.register_committed(self.newcomers[0], (self.other_registration, [self.other_lecture]))
+        self.assertIn('is full', response.data['failed'][0]['error'])
+        self.assertEqual(self.counters(self.other_registration, self.other_lecture), [1, 1])
+        self.assertFalse(Enrollment.objects.filter(student=self.newcomers[0]).exists())
+
+    def test_deleting_an_enrollment_frees_its_seats(self):
+        enrollment = Enrollment.objects.get(student=self.veteran, registration=self.other_registration)
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.delete()
+        self.assertEqual(self.counters(self.other_registration, self.other_lecture), [0, 0])
+        self.assertEqual(seats.rebuild_seat_counters(), 0)
+
+
+class GradeAggregateTests(UniversityTestCase):
+    """The semester totals moved by delta on every enrollment write equal a full recompute"""
+
+    def assertTotalsMatchRecompute(self):
+        expected = gpa.compute_aggregates(Enrollment.objects.filter(student=self.veteran))
+        empty = dict(zip(gpa.AGGREGATE_FIELDS, gpa.EMPTY_TOTALS))
+        for semester in Semester.objects.filter(academicYear__student=self.veteran):
+            with self.subTest(semester=semester.pk):
+                stored = {field: getattr(semester, field) for field in gpa.AGGREGATE_FIELDS}
+                self.assertEqual(stored, expected.get(semester.pk, empty))
+
+    def history_enrollment(self, year_name, semester_name='fall'):
+        return Enrollment.objects.filter(
+            student=self.veteran, semester__academicYear__yearName=year_name, semester__semesterName=semester_name
+        ).order_by('pk').first()
+
+    def test_fixture(self):
+        self.assertTotalsMatchRecompute()
+        semester = Semester.objects.get(academicYear__student=self.veteran, academicYear__yearName='2020-2021', semesterName='fall')
+        # Two A- (3.7) courses of 3 credits
+        self.assertEqual((semester.gradedCourses, semester.gradedHours), (2, 6))
+        self.assertEqual(semester.calculate_gpa(), 3.7)
+
+    def test_regrade(self):
+        enrollment = self.history_enrollment('2020-2021')
+        enrollment.coursework = 10
+        enrollment.calculate_total_and_grade()
+        enrollment.save()
+        self.assertEqual(enrollment.letterGrade, 'C-')
+        self.assertTotalsMatchRecompute()
+        self.assertEqual(Semester.objects.get(pk=enrollment.semester_id).calculate_gpa(), round((3.7 + 1.7) / 2, 2))
+
+    def test_grading_an_ungraded_enrollment(self):
+        enrollment = Enrollment.objects.get(student=self.veteran, registration=self.registration)
+        enrollment.coursework, enrollment.exam = 45, 50
+        enrollment.calculate_total_and_grade()
+        enrollment.save()
+        self.assertTotalsMatchRecompute()
+
+    def test_clearing_a_grade(self):
+        enrollment = self.history_enrollment('2021-2022')
+        enrollment.letterGrade = None
+        enrollment.save()
+        self.assertTotalsMatchRecompute()
+
+    def test_moving_to_another_semester(self):
+        enrollment = self.history_enrollment('2022-2023')
+        enrollment.semester = Semester.objects.get(
+            academicYear__student=self.veteran, academicYear__yearName='2023-2024', semesterName='spring'
+        )
+        enrollment.save()
+        self.assertTotalsMatchRecompute()
+
+    def test_moving_to_another_registration(self):
+        enrollment = self.history_enrollment('2022-2023', 'spring')
+        # Worth more credits than the course it leaves
+        registration, _ = self.offering('CS301', day=4)
+        Course.objects.filter(pk='CS301').update(credits=4)
+        enrollment.registration = Registration.objects.select_related('course').get(pk=registration.pk)
+        enrollment.save()
+        self.assertTotalsMatchRecompute()
+
+    def test_delete(self):
+        self.history_enrollment('2023-2024').delete()
+        Enrollment.objects.get(student=self.veteran, registration=self.registration).delete()
+        self.assertTotalsMatchRecompute()
+
+    def test_rebuild_command_repairs_drift(self):
+        semester = self.history_enrollment('2020-2021').semester
+        Semester.objects.filter(pk=semester.pk).update(gradedHours=99)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_gpa_aggregates', '--verify', stdout=StringIO())
+        call_command('rebuild_gpa_aggregates', '--recompute-gpa', stdout=StringIO())
+        call_command('rebuild_gpa_aggregates', '--verify', stdout=StringIO())
+        self.assertTotalsMatchRecompute()
+        self.assertEqual(float(Semester.objects.get(pk=semester.pk).gpa), 3.7)
+
+
+class GradeImportTests(UniversityTestCase):
+    """PUT /educator/course/<id>/grades/ with JSON and CSV bodies; a batch with a bad row writes nothing"""
+
+    def setUp(self):
+        super().setUp()
+        self.newcomer_enrollment = Enrollment.objects.get(student=self.newcomer, registration=self.registration)
+        self.veteran_enrollment = Enrollment.objects.get(student=self.veteran, registration=self.registration)
+
+    def put_grades(self, body, content_type='application/json', educator=None):
+        self.client.force_authenticate(user=claims_user((educator or self.educator).pk, EDUCATOR))
+        url = reverse('educator-update-grades', kwargs={'registration_id': self.registration.pk})
+        if content_type == 'application/json':
+            return self.client.put(url, body, format='json')
+        return self.client.put(url, body, content_type=content_type)
+
+    def test_json_batch(self):
+        response = self.put_grades([
+            {'enrollmentId': self.newcomer_enrollment.pk, 'coursework': 45, 'exam': 50},
+            {'enrollmentId': self.veteran_enrollment.pk, 'coursework': 20, 'exam': 20},
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['failed'], [])
+        by_id = {row['enrollmentId']: row for row in response.data['successful']}
+        self.assertEqual(by_id[self.newcomer_enrollment.pk]['letterGrade'], 'A+')
+        # The newcomer's only course is graded, so their semester is complete
+        self.assertEqual(by_id[self.newcomer_enrollment.pk]['semesterGPA'], 4.0)
+        self.assertEqual(by_id[self.veteran_enrollment.pk]['letterGrade'], 'D-')
+
+        self.veteran_enrollment.refresh_from_db()
+        self.assertEqual((self.veteran_enrollment.total, self.veteran_enrollment.letterGrade), (40, 'D-'))
+        semester = Semester.objects.get(pk=self.newcomer_enrollment.semester_id)
+        self.assertEqual((semester.gradedCourses, semester.ungradedCourses), (1, 0))
+
+    def test_csv_batch(self):
+        body = (
+            "enrollmentId,coursework,exam\n"
+            f"{self.newcomer_enrollment.pk},40,45\n"
+            f"{self.veteran_enrollment.pk},30,\n"
+        )
+        response = self.put_grades(body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['failed'], [])
+
+        self.newcomer_enrollment.refresh_from_db()
+        self.veteran_enrollment.refresh_from_db()
+        self.assertEqual(self.newcomer_enrollment.letterGrade, 'A-')
+        # The empty exam cell leaves the exam untouched
+        self.assertEqual(self.veteran_enrollment.coursework, 30)
+        self.assertIsNone(self.veteran_enrollment.exam)
+
+    def test_bad_rows_are_reported_and_nothing_is_written(self):
+        response = self.put_grades([
+            {'enrollmentId': self.newcomer_enrollment.pk, 'coursework': 45, 'exam': 50},
+            {'enrollmentId': self.veteran_enrollment.pk, 'coursework': 60},
+            {'enrollmentId': 999999, 'coursework': 10},
+            1,
+            ['enrollmentId', self.veteran_enrollment.pk],
+            {'enrollmentId': self.veteran_enrollment.pk, 'exam': 12.7},
+            {'enrollmentId': self.veteran_enrollment.pk, 'exam': 'x'},
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['successful'], [])
+        errors = {row['row']: row['error'] for row in response.data['failed']}
+        self.assertEqual(sorted(errors), [2, 3, 4, 5, 6, 7])
+        self.assertEqual(errors[2], 'Coursework must be between 0 and 50')
+        self.assertEqual(errors[3], 'Enrollment not found')
+        self.assertEqual(errors[6], 'Exam must be a whole number')
+        self.assertEqual(errors[7], 'Exam must be a number')
+
+        self.newcomer_enrollment.refresh_from_db()
+        self.assertIsNone(self.newcomer_enrollment.letterGrade)
+
+    def test_fractional_csv_score_is_rejected(self):
+        body = f"enrollmentId,coursework\n{self.newcomer_enrollment.pk},12.7\n"
+        response = self.put_grades(body, content_type='text/csv')
+        self.assertEqual(response.data['failed'][0]['error'], 'Coursework must be a whole number')
+
+    def test_body_must_be_a_list(self):
+        response = self.put_grades({'enrollmentId': self.newcomer_enrollment.pk, 'coursework': 45})
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_the_educators_of_the_course_may_grade(self):
+        outsider = Educator.objects.create(
+            educatorId='E0002', nameAr='Outsider', nameEn='Outsider',
+            nationalId='10000000000002', department=self.department
+        )
+        response = self.put_grades([{'enrollmentId': self.newcomer_enrollment.pk, 'coursework': 45}], educator=outsider)
+        self.assertEqual(response.status_code, 403)
+
+    def test_teaching_assistants_cannot_grade_exams(self):
+        assistant = Educator.objects.create(
+            educatorId='E0003', nameAr='Assistant', nameEn='Assistant',
+            nationalId='10000000000003', department=self.department, type='Teaching Assistant'
+        )
+        TimeSlot.objects.create(pattern=self.lecture, educator=assistant, day=4, start_period=1, end_period=2)
+
+        response = self.put_grades([{'enrollmentId': self.newcomer_enrollment.pk, 'exam': 40}], educator=assistant)
+        self.assertEqual(response.status_code, 403)
+        response = self.put_grades([{'enrollmentId': self.newcomer_enrollment.pk, 'coursework': 40}], educator=assistant)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['failed'], [])
+
+
+class CatalogSnapshotTests(UniversityTestCase):
+    """Available registrations come from a cached snapshot that is dropped once a catalog write commits"""
+
+    def test_new_offering_appears_after_commit(self):
+        self.available(self.newcomer, self.other_registration)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            registration, _ = self.offering('CS103', day=3)
+        # Not invalidated before the commit: nobody may cache the uncommitted rows
+        self.assertNotIn(registration.pk, self.available_entries(self.newcomer))
+
+        for callback in callbacks:
+            callback()
+        entry = self.available(self.newcomer, registration)
+        self.assertEqual(entry['courseCode'], 'CS103')
+
+    def test_capacity_change_is_served(self):
+        self.assertEqual(self.available(self.newcomer, self.other_registration)['capacity'], 30)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_registration.capacity = 40
+            self.other_registration.save()
+
+        self.assertEqual(self.available(self.newcomer, self.other_registration)['capacity'], 40)
+
+    def test_deactivated_offering_disappears(self):
+        self.available(self.newcomer, self.other_registration)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_registration.is_active = False
+            self.other_registration.save()
+
+        self.assertNotIn(self.other_registration.pk, self.available_entries(self.newcomer))
+
+    def test_educator_rename_is_served(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.educator.nameEn = 'Renamed'
+            self.educator.save()
+
+        time_slot = self.available(self.newcomer, self.other_registration)['schedulePatterns'][0]['timeSlots'][0]
+        self.assertEqual(time_slot['educator']['name'], 'Renamed')
+
+
+class PrerequisiteGraphTests(UniversityTestCase):
+    """Eligibility follows prerequisite changes once they commit; cycles are refused, or degrade if they slip in"""
+
+    def setUp(self):
+        super().setUp()
+        self.set_global_settings(registration_open=True)
+        self.cs101 = Course.objects.get(pk='CS101')
+        self.cs102 = Course.objects.get(pk='CS102')
+        # Passed by the veteran only
+        self.h001 = Course.objects.get(pk='H001')
+
+    def test_new_prerequisite_applies_after_commit(self):
+        self.available(self.newcomer, self.other_registration)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cs102.prerequisites.add(self.h001)
+
+        self.assertNotIn(self.other_registration.pk, self.available_entries(self.newcomer))
+        # The veteran passed H001
+        self.available(self.veteran, self.other_registration)
+        response = self.register(self.newcomer, (self.other_registration, [self.other_lecture]))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['successful'], [])
+        self.assertEqual(response.data['failed'][0]['error'], 'Missing prerequisites: H001')
+
+    def test_removed_prerequisite_applies_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cs102.prerequisites.add(self.h001)
+        self.assertNotIn(self.other_registration.pk, self.available_entries(self.newcomer))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cs102.prerequisites.remove(self.h001)
+        self.available(self.newcomer, self.other_registration)
+
+    def test_cycle_is_refused_on_add(self):
+        self.cs102.prerequisites.add(self.cs101)
+        with self.assertRaises(ValidationError):
+            self.cs101.prerequisites.add(self.cs102)
+        # From the other side of the relation as well
+        with self.assertRaises(ValidationError):
+            self.cs102.course_set.add(self.cs101)
+        self.assertFalse(self.cs101.prerequisites.exists())
+
+    def test_cycle_is_refused_by_the_course_endpoint(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cs102.prerequisites.add(self.cs101)
+
+        self.client.force_authenticate(user=claims_user('admin', None, is_staff=True))
+        response = self.client.patch(
+            reverse('course-detail', kwargs={'pk': 'CS101'}), {'prerequisites': ['CS102']}, format='json'
+        )
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn('prerequisites', response.data)
+        self.assertFalse(self.cs101.prerequisites.exists())
+
+    def test_cycle_in_the_database_degrades(self):
+        self.offering('CS201', day=4)
+        self.offering('CS202', day=5)
+        Course.objects.get(pk='CS201').prerequisites.add(self.cs102)
+        # Written past the signal guard, as two racing admin writes could
+        Link = Course.prerequisites.through
+        Link.objects.bulk_create([
+            Link(from_course_id='CS101', to_course_id='CS102'),
+            Link(from_course_id='CS102', to_course_id='CS101'),
+        ])
+        prerequisites.invalidate()
+
+        with self.assertLogs('betterAPI.prerequisites', 'ERROR') as logs:
+            available = self.available_entries(self.veteran)
+        self.assertIn('CS101, CS102', logs.output[0])
+        # The cycle and everything behind it are unavailable, the rest of the catalog is not
+        courses = {entry['courseCode'] for entry in available.values()}
+        self.assertFalse(courses & {'CS101', 'CS102', 'CS201'})
+        self.assertIn('CS202', courses)
+
+        response = self.register(self.newcomer, (self.other_registration, [self.other_lecture]))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['failed'][0]['error'], 'Missing prerequisites: CS101')
+
+
+class TimetableConflictTests(UniversityTestCase):
+    """Registration checks the student's weekly occupancy, which follows the time slots of their patterns"""
+
+    def setUp(self):
+        super().setUp()
+        self.set_global_settings(registration_open=True)
+        self.semester = Enrollment.objects.get(student=self.newcomer, registration=self.registration).semester
+
+    def occupancy(self, semester):
+        semester.refresh_from_db()
+        return timetable.from_hex(semester.occupancy)
+
+    def test_fixture_occupancy(self):
+        self.assertEqual(self.occupancy(self.semester), timetable.slot_mask(0, 1, 2))
+        self.assertEqual(timetable.rebuild_occupancy(), 0)
+
+    def test_clashing_offering_is_flagged_and_refused(self):
+        clashing, clashing_lecture = self.offering('CS103', day=0)
+        self.assertTrue(self.available(self.newcomer, clashing)['schedulePatterns'][0]['hasConflict'])
+        self.assertFalse(self.available(self.newcomer, self.other_registration)['schedulePatterns'][0]['hasConflict'])
+
+        response = self.register(self.newcomer, (clashing, [clashing_lecture]))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            response.data['failed'][0]['error'], 'Schedule conflict with your timetable: Saturday P1, Saturday P2'
+        )
+        self.assertFalse(Enrollment.objects.filter(student=self.newcomer, registration=clashing).exists())
+        self.assertEqual(self.occupancy(self.semester), timetable.slot_mask(0, 1, 2))
+
+    def test_reselecting_own_pattern_is_not_a_conflict(self):
+        response = self.register(self.newcomer, (self.registration, [self.lecture]))
+        self.assertEqual(response.data['failed'], [])
+        self.assertEqual(response.data['successful'][0]['action'], 'updated')
+
+    def test_overlapping_patterns_in_one_selection(self):
+        registration, lecture = self.offering('CS103', day=3)
+        tutorial = SchedulePattern.objects.create(
+            registration=registration, pattern_name='Tutorial', pattern_type='TUT', capacity=30
+        )
+        TimeSlot.objects.create(pattern=tutorial, educator=self.educator, day=3, start_period=2, end_period=3)
+
+        response = self.register(self.newcomer, (registration, [lecture, tutorial]))
+        self.assertEqual(response.data['failed'][0]['error'], 'Selected patterns overlap: Tuesday P2')
+
+    def test_registration_adds_to_occupancy(self):
+        response = self.register(self.newcomer, (self.other_registration, [self.other_lecture]))
+        self.assertEqual(response.data['failed'], [])
+        self.assertEqual(self.occupancy(self.semester), timetable.slot_mask(0, 1, 2) | timetable.slot_mask(1, 1, 2))
+
+    def test_moved_time_slot_moves_student_timetables(self):
+        clashing, clashing_lecture = self.offering('CS103', day=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            time_slot = TimeSlot.objects.get(pattern=self.lecture)
+            time_slot.day = 3
+            time_slot.save()
+
+        self.assertEqual(self.occupancy(self.semester), timetable.slot_mask(3, 1, 2))
+        self.assertEqual(timetable.rebuild_occupancy(), 0)
+        response = self.register(self.newcomer, (clashing, [clashing_lecture]))
+        self.assertIn('Schedule conflict', response.data['failed'][0]['error'])
+
+
+class DoubleBookingTests(UniversityTestCase):
+    """Time slot writes are refused when they double book an educator or a room of the current term"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=claims_user('admin', None, is_staff=True))
+        self.time_slot = TimeSlot.objects.get(pattern=self.lecture)
+        self.colleague = Educator.objects.create(
+            educatorId='E0002', nameAr='Colleague', nameEn='Colleague',
+            nationalId='10000000000002', department=self.department
+        )
+
+    def create_slot(self, **fields):
+        data = dict({'pattern': self.other_lecture.pk, 'educator': self.colleague.pk}, **fields)
+        return self.client.post(reverse('timeslot-list-create'), data, format='json')
+
+    def test_educator_double_booking_is_refused(self):
+        response = self.create_slot(day=0, start_period=2, end_period=3, educator=self.educator.pk)
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(response.data['non_field_errors'], [
+            f"Educator E0001 is already booked on Saturday period(s) 2 (time slot(s) {self.time_slot.pk})"
+        ])
+        self.assertEqual(TimeSlot.objects.filter(pattern=self.other_lecture).count(), 1)
+
+    def test_room_double_booking_is_refused(self):
+        TimeSlot.objects.filter(pk=self.time_slot.pk).update(location='Hall A')
+        response = self.create_slot(day=0, start_period=1, end_period=1, location=' hall a ')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(response.data['non_field_errors'], [
+            f"Location hall a is already booked on Saturday period(s) 1 (time slot(s) {self.time_slot.pk})"
+        ])
+
+    def test_free_slot_is_created(self):
+        # Same periods, another educator and no room
+        response = self.create_slot(day=0, start_period=1, end_period=2)
+        self.assertEqual(response.status_code, 201, response.content)
+        response = self.create_slot(day=4, start_period=1, end_period=2, educator=self.educator.pk)
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_update_does_not_clash_with_itself(self):
+        response = self.client.patch(
+            reverse('timeslot-detail', kwargs={'pk': self.time_slot.pk}), {'end_period': 3}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_inactive_offerings_hold_no_bookings(self):
+        Registration.objects.filter(pk=self.registration.pk).update(is_active=False)
+        response = self.create_slot(day=0, start_period=1, end_period=2, educator=self.educator.pk)
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def test_conflict_scan(self):
+        # Every history offering is taught by E0001 on Monday P1-P2
+        first, *others = TimeSlot.objects.filter(pattern__registration__course__courseCode__startswith='H').order_by('id')
+        response = self.client.get(reverse('timeslot-conflicts'))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['totalConflicts'], len(others))
+        self.assertEqual(
+            [(clash['resource'], clash['value'], clash['dayName'], clash['periods'], clash['conflictsWith'])
+             for clash in response.data['conflicts']],
+            [('educator', 'E0001', 'Monday', [1, 2], [first.pk])] * len(others)
+        )
+        self.assertEqual(sorted(clash['timeSlotId'] for clash in response.data['conflicts']), [slot.pk for slot in others])
+
+    def test_conflict_scan_is_for_admins(self):
+        self.client.force_authenticate(user=claims_user(self.educator.pk, EDUCATOR))
+        self.assertEqual(self.client.get(reverse('timeslot-conflicts')).status_code, 403)
+
+
+class ResponseCacheTests(UniversityTestCase):
+    """Student read responses carry an ETag that moves once a write affecting them commits"""
+
+    def fetch(self, name, student, etag=None):
+        self.client.force_authenticate(user=claims_user(student.pk, STUDENT))
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse(name), **headers)
+
+    def grade_newcomer(self):
+        enrollment = Enrollment.objects.get(student=self.newcomer, registration=self.registration)
+        enrollment.coursework, enrollment.exam = 45, 50
+        enrollment.calculate_total_and_grade()
+        enrollment.save()
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.fetch('student-grades', self.newcomer)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.fetch('student-grades', self.newcomer, etag=f'"stale", {etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_cached_response_is_served_without_queries(self):
+        first = self.fetch('student-grades', self.newcomer)
+        with self.assertNumQueries(0):
+            second = self.fetch('student-grades', self.newcomer)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json(), first.json())
+
+    def test_grade_write_moves_the_etag_on_commit(self):
+        etag = self.fetch('student-grades', self.newcomer)['ETag']
+        other_etag = self.fetch('student-grades', self.veteran)['ETag']
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.grade_newcomer()
+        # Until the write commits the old response is still current
+        self.assertEqual(self.fetch('student-grades', self.newcomer, etag=etag).status_code, 304)
+
+        for callback in callbacks:
+            callback()
+        response = self.fetch('student-grades', self.newcomer, etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        current = response.json()['academicHistory'][0]['semesters'][0]
+        self.assertEqual(current['enrollments'][0]['letterGrade'], 'A+')
+        self.assertEqual(current['gpa'], 4.0)
+        # Nobody else's responses are dropped
+        self.assertEqual(self.fetch('student-grades', self.veteran, etag=other_etag).status_code, 304)
+
+    def test_bulk_grade_import_moves_the_etag(self):
+        etag = self.fetch('student-grades', self.newcomer)['ETag']
+        enrollment = Enrollment.objects.get(student=self.newcomer, registration=self.registration)
+
+        self.client.force_authenticate(user=claims_user(self.educator.pk, EDUCATOR))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                reverse('educator-update-grades', kwargs={'registration_id': self.registration.pk}),
+                [{'enrollmentId': enrollment.pk, 'coursework': 45, 'exam': 50}], format='json'
+            )
+        self.assertEqual(response.data['failed'], [])
+        self.assertEqual(self.fetch('student-grades', self.newcomer, etag=etag).status_code, 200)
+
+    def test_profile_write_moves_the_etag(self):
+        etag = self.fetch('student-info', self.newcomer)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.newcomer.address = 'Giza'
+            self.newcomer.save()
+        self.assertEqual(self.fetch('student-info', self.newcomer, etag=etag).status_code, 200)
+
+    def test_catalog_write_moves_only_dependent_etags(self):
+        info_etag = self.fetch('student-info', self.newcomer)['ETag']
+        grades_etag = self.fetch('student-grades', self.newcomer)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.get(pk='CS101').save()
+
+        self.assertEqual(self.fetch('student-info', self.newcomer, etag=info_etag).status_code, 304)
+        self.assertEqual(self.fetch('student-grades', self.newcomer, etag=grades_etag).status_code, 200)
+
+
+class TokenClaimsTests(UniversityTestCase):
+    """Login puts the role in the token; authenticated requests are served from the claims alone"""
+
+    PASSWORD = 'correct horse'
+
+    def setUp(self):
+        super().setUp()
+        student_user = User.objects.create_user(username=self.newcomer.pk, password=self.PASSWORD)
+        student_user.groups.add(Group.objects.create(name=STUDENT))
+        # No group: the role comes from the Educator record with the same id
+        User.objects.create_user(username=self.educator.pk, password=self.PASSWORD)
+        User.objects.create_user(username='registrar', password=self.PASSWORD, is_staff=True)
+
+    def login(self, username, password=PASSWORD):
+        return self.client.post(reverse('token_obtain_pair'), {'username': username, 'password': password}, format='json')
+
+    def claims(self, username):
+        response = self.login(username)
+        self.assertEqual(response.status_code, 200, response.content)
+        return AccessToken(response.data['access'])
+
+    def test_login_claims(self):
+        token = self.claims(self.newcomer.pk)
+        self.assertEqual((token['role'], token['profileId'], token['is_staff']), (STUDENT, 'S0001', False))
+        token = self.claims(self.educator.pk)
+        self.assertEqual((token['role'], token['profileId']), (EDUCATOR, 'E0001'))
+        token = self.claims('registrar')
+        self.assertEqual((token['role'], token['profileId'], token['is_staff']), (ADMIN, None, True))
+
+    def test_wrong_password(self):
+        self.assertEqual(self.login(self.newcomer.pk, 'wrong').status_code, 401)
+
+    def test_refreshed_token_keeps_claims(self):
+        refresh = self.login(self.newcomer.pk).data['refresh']
+        response = self.client.post(reverse('token_refresh'), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        token = AccessToken(response.data['access'])
+        self.assertEqual((token['role'], token['profileId']), (STUDENT, 'S0001'))
+
+    def test_requests_do_not_load_the_user(self):
+        access = self.login(self.newcomer.pk).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('student-info'))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['studentId'], 'S0001')
+        self.assertFalse([query['sql'] for query in queries if 'auth_' in query['sql']])
+
+    def test_roles_are_enforced_from_the_claims(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login(self.educator.pk).data['access']}")
+        self.assertEqual(self.client.get(reverse('student-info')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('educator-current-courses')).status_code, 200)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login(self.newcomer.pk).data['access']}")
+        self.assertEqual(self.client.get(reverse('educator-current-courses')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('course-list-create')).status_code, 403)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login('registrar').data['access']}")
+        self.assertEqual(self.client.get(reverse('course-list-create')).status_code, 200)
+
+    def test_invalid_token_is_refused(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(self.client.get(reverse('student-info')).status_code, 401)
+
+
+@override_settings(
+    THROTTLE_ENABLED=True,
+    THROTTLE_BACKEND='betterAPI.throttling.LocalBuckets',
+    THROTTLE_RATES=dict(settings.THROTTLE_RATES, **{'current-semester': '2/hour', 'login': '2/hour'}),
+)
+class ThrottlingTests(UniversityTestCase):
+    """Each scope has a token bucket per user (per client IP when anonymous); an empty bucket answers 429"""
+
+    def setUp(self):
+        super().setUp()
+        # Fresh, empty buckets for every test
+        throttling._backends.clear()
+        self.addCleanup(throttling._backends.clear)
+
+    def fetch(self, student):
+        self.client.force_authenticate(user=claims_user(student.pk, STUDENT))
+        return self.client.get(reverse('student-current-semester'))
+
+    def assertThrottled(self, response, period=3600, capacity=2):
+        self.assertEqual(response.status_code, 429, response.content)
+        # One token refills every period / capacity seconds
+        self.assertTrue(0 < int(response['Retry-After']) <= period / capacity, response['Retry-After'])
+
+    def test_bucket_runs_out(self):
+        self.assertEqual(self.fetch(self.newcomer).status_code, 200)
+        self.assertEqual(self.fetch(self.newcomer).status_code, 200)
+        self.assertThrottled(self.fetch(self.newcomer))
+
+    def test_buckets_are_per_user_and_scope(self):
+        for _ in range(2):
+            self.fetch(self.newcomer)
+        self.assertThrottled(self.fetch(self.newcomer))
+
+        self.assertEqual(self.fetch(self.veteran).status_code, 200)
+        # Views without a scope use the 'user' bucket
+        self.client.force_authenticate(user=claims_user(self.newcomer.pk, STUDENT))
+        self.assertEqual(self.client.get(reverse('student-info')).status_code, 200)
+
+    def test_anonymous_buckets_are_per_client_ip(self):
+        self.client.force_authenticate(user=None)
+        url = reverse('current-semester-public')
+        for _ in range(2):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code, 200)
+        self.assertThrottled(self.client.get(url, REMOTE_ADDR='10.0.0.1'))
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_login_attempts_are_limited(self):
+        credentials = {'username': self.newcomer.pk, 'password': 'wrong'}
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('token_obtain_pair'), credentials, format='json').status_code, 401)
+        self.assertThrottled(self.client.post(reverse('token_obtain_pair'), credentials, format='json'))
+
+    @override_settings(THROTTLE_RATES=dict(settings.THROTTLE_RATES, **{'current-semester': None}))
+    def test_scope_without_rate_is_unlimited(self):
+        for _ in range(5):
+            self.assertEqual(self.fetch(self.newcomer).status_code, 200)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_disabled(self):
+        for _ in range(5):
+            self.assertEqual(self.fetch(self.newcomer).status_code, 200)
+
+
+class ReplicaRoutingTests(UniversityTestCase):
+    """
+    Reads of authenticated GET requests go to the replica unless the user wrote
+    recently. Only the routing decisions are checked: no query is sent to the
+    replica alias, which is the primary's settings under another name.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.use_databases(dict(settings.DATABASES, replica=dict(settings.DATABASES['default'])))
+
+    def use_databases(self, databases):
+        overridden = override_settings(DATABASES=databases, DATABASE_REPLICA_PIN_SECONDS=60)
+        # Django warns about overriding DATABASES; the connections are left alone here
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            overridden.enable()
+
+        def disable():
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                overridden.disable()
+        self.addCleanup(disable)
+
+    def route(self, method, user):
+        """Send a request through ReplicaRoutingMiddleware; the alias a ReplicaReadMixin view's reads use"""
+        router = db_routing.ReplicaRouter()
+        seen = {}
+
+        def view(request):
+            # What DRF and ReplicaReadMixin do for the view
+            request.user = user
+            db_routing.use_replica(request, user)
+            seen['read'] = router.db_for_read(Student)
+            with db_routing.primary():
+                seen['primary'] = router.db_for_read(Student)
+            return HttpResponse()
+
+        db_routing.ReplicaRoutingMiddleware(view)(RequestFactory().generic(method, '/'))
+        # Only inside a request
+        self.assertEqual(router.db_for_read(Student), 'default')
+        self.assertEqual(seen['primary'], 'default')
+        return seen['read']
+
+    def pinned(self, student):
+        return cache.get(db_routing.pin_key(student.pk)) is not None
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.route('GET', claims_user(self.newcomer.pk, STUDENT)), 'replica')
+        self.assertEqual(self.route('HEAD', claims_user(self.newcomer.pk, STUDENT)), 'replica')
+
+    def test_anonymous_reads_use_the_primary(self):
+        self.assertEqual(self.route('GET', AnonymousUser()), 'default')
+
+    def test_write_pins_its_user(self):
+        newcomer = claims_user(self.newcomer.pk, STUDENT)
+        self.assertEqual(self.route('POST', newcomer), 'default')
+        self.assertTrue(self.pinned(self.newcomer))
+
+        self.assertEqual(self.route('GET', newcomer), 'default')
+        self.assertEqual(self.route('GET', claims_user(self.veteran.pk, STUDENT)), 'replica')
+
+        cache.delete(db_routing.pin_key(self.newcomer.pk))
+        self.assertEqual(self.route('GET', newcomer), 'replica')
+
+    def test_changed_students_are_pinned_on_commit(self):
+        enrollment = Enrollment.objects.get(student=self.newcomer, registration=self.registration)
+        with self.captureOnCommitCallbacks() as callbacks:
+            enrollment.coursework, enrollment.exam = 45, 50
+            enrollment.calculate_total_and_grade()
+            enrollment.save()
+        self.assertFalse(self.pinned(self.newcomer))
+
+        for callback in callbacks:
+            callback()
+        self.assertTrue(self.pinned(self.newcomer))
+        self.assertFalse(self.pinned(self.veteran))
+        self.assertEqual(self.route('GET', claims_user(self.newcomer.pk, STUDENT)), 'default')
+
+    def test_without_a_replica(self):
+        self.use_databases({'default': settings.DATABASES['default']})
+        with self.assertRaises(MiddlewareNotUsed):
+            db_routing.ReplicaRoutingMiddleware(lambda request: HttpResponse())
+        db_routing.pin([self.newcomer.pk])
+        self.assertFalse(self.pinned(self.newcomer))
+
+
+class WriteContentionTests(UniversityTestCase):
+    """In SQLite concurrency mode locked writes are retried, then answered 503 instead of failing"""
+
+    def setUp(self):
+        super().setUp()
+        self.set_global_settings(registration_open=True)
+        for patcher in (
+            mock.patch.object(sqlite_writes, 'enabled', return_value=True),
+            mock.patch.object(sqlite_writes.time, 'sleep'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def locked(self):
+        return OperationalError('database is locked')
+
+    def test_registration_is_retried_while_locked(self):
+        calls = []
+
+        def locked_once(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise self.locked()
+            return register_courses(*args)
+
+        with mock.patch.object(views, 'register_courses', side_effect=locked_once):
+            response = self.register(self.newcomer, (self.other_registration, [self.other_lecture]))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(response.data['successful'][0]['action'], 'created')
+
+    def test_registration_answers_503_when_the_lock_is_never_free(self):
+        with mock.patch.object(views, 'register_courses', side_effect=self.locked()) as register:
+            response = self.register(self.newcomer, (self.other_registration, [self.other_lecture]))
+        self.assertEqual(response.status_code, 503, response.content)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(register.call_count, sqlite_writes.MAX_ATTEMPTS)
+        self.assertFalse(Enrollment.objects.filter(student=self.newcomer, registration=self.other_registration).exists())
+
+    def test_grade_import_answers_503_when_the_lock_is_never_free(self):
+        enrollment = Enrollment.objects.get(student=self.newcomer, registration=self.registration)
+        self.client.force_authenticate(user=claims_user(self.educator.pk, EDUCATOR))
+        with mock.patch.object(grading, 'import_grades', side_effect=self.locked()):
+            response = self.client.put(
+                reverse('educator-update-grades', kwargs={'registration_id': self.registration.pk}),
+                [{'enrollmentId': enrollment.pk, 'coursework': 45}], format='json'
+            )
+        self.assertEqual(response.status_code, 503, response.content)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_other_database_errors_are_not_retried(self):
+        with mock.patch.object(views, 'register_courses', side_effect=OperationalError('no such table')) as register:
+            with self.assertRaises(OperationalError):
+                self.register(self.newcomer, (self.other_registration, [self.other_lecture]))
+        self.assertEqual(register.call_count, 1)
+
+    def test_entry_errors_are_still_reported(self):
+        full, full_lecture = self.offering('CS103', day=4)
+        Registration.objects.filter(pk=full.pk).update(capacity=0)
+        response = self.register(
+            self.newcomer, (full, [full_lecture]), (self.other_registration, [self.other_lecture])
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn('is full', response.data['failed'][0]['error'])
+        self.assertEqual([entry['courseCode'] for entry in response.data['successful']], ['CS102'])
+
+    def test_outside_concurrency_mode_nothing_is_retried(self):
+        with mock.patch.object(sqlite_writes, 'enabled', return_value=False):
+            with mock.patch.object(views, 'register_courses', side_effect=self.locked()) as register:
+                with self.assertRaises(OperationalError):
+                    self.register(self.newcomer, (self.other_registration, [self.other_lecture]))
+        self.assertEqual(register.call_count, 1)
+
+
+class TermResolutionTests(UniversityTestCase):
+    """Term.get_id() only remembers ids of committed Term rows"""
+
+    def test_failed_first_entry_of_a_new_term_is_forgotten(self):
+        self.set_global_settings(current_academic_year='2030-2031', registration_open=True)
+        Registration.objects.filter(pk=self.registration.pk).update(capacity=0)
+
+        # The first entry of the term creates its Term row, then finds the section full
+        response = self.register(self.newcomer, (self.registration, [self.lecture]))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['successful'], [])
+        self.assertEqual(len(response.data['failed']), 1)
+        self.assertFalse(Term.objects.filter(yearName='2030-2031').exists())
+        self.assertNotIn(('2030-2031', 'fall'), Term._ids)
+
+        response = self.register(self.newcomer, (self.other_registration, [self.other_lecture]))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['failed'], [])
+        enrollment = Enrollment.objects.get(pk=response.data['successful'][0]['enrollmentId'])
+        self.assertEqual((enrollment.term.yearName, enrollment.term.semesterName), ('2030-2031', 'fall'))
 
-# Create your tests here.
@@ -0,0 +1,214 @@
+"""
+Token-bucket rate limiting.
+
+Every view has a throttle scope (``throttle_scope``; ``user`` or ``anon`` when
+it has none) whose rate comes from the THROTTLE_RATES setting, e.g. '20/min':
+a bucket of 20 tokens per scope and user (per client IP for anonymous
+requests) that refills continuously at 20 a minute. A request takes a token or
+is answered 429 with a Retry-After of the time until the next one.
+
+The buckets live in a backend picked with the THROTTLE_BACKEND setting
+(dotted path). ``LocalBuckets`` keeps them in process memory without locks or
+cache round trips and is meant for a single worker process; ``RedisBuckets``
+shares them between every worker and node through one Redis script call.
+Set THROTTLE_ENABLED=False to switch throttling off (the benchmarks do).
+"""
+import abc
+import functools
+import logging
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+LOCAL_MAX_KEYS = 100_000
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'20/min' -> (capacity, tokens per second)"""
+    count, _, period = rate.partition('/')
+    try:
+        count, seconds = int(count), PERIODS[period.strip().lower()]
+    except (ValueError, KeyError):
+        raise ImproperlyConfigured(f"Invalid throttle rate {rate!r}, expected e.g. '20/min'")
+    if count <= 0:
+        raise ImproperlyConfigured(f"Invalid throttle rate {rate!r}, expected e.g. '20/min'")
+    return count, count / seconds
+
+
+def scope_rate(scope):
+    """(capacity, tokens per second) of a scope, None if it is not limited"""
+    try:
+        rate = settings.THROTTLE_RATES[scope]
+    except KeyError:
+        raise ImproperlyConfigured(f"No THROTTLE_RATES entry for throttle scope {scope!r}")
+    return None if rate is None else parse_rate(rate)
+
+
+def bucket_key(scope, user, client_ip):
+    """(scope, key): the view's scope per user, or per client IP for anonymous requests"""
+    if user is not None and user.is_authenticated:
+        return scope or 'user', f"{scope or 'user'}:user:{user.pk}"
+    return scope or 'anon', f"{scope or 'anon'}:ip:{client_ip}"
+
+
+class Buckets(abc.ABC):
+    """Interface every backend implements"""
+
+    @abc.abstractmethod
+    def consume(self, key, capacity, refill_rate):
+        """Take a token from the bucket; 0 if there was one, else the seconds until there is"""
+
+    async def aconsume(self, key, capacity, refill_rate):
+        return await sync_to_async(self.consume, thread_sensitive=False)(key, capacity, refill_rate)
+
+
+class LocalBuckets(Buckets):
+    """
+    Buckets in a dict of this process. Each update replaces the key's
+    (tokens, updated at, full at) tuple in one assignment, so there is no lock:
+    requests of the same user racing on another thread can at worst both take
+    the same token. Buckets that have refilled are dropped when the dict grows
+    past max_keys, since a missing bucket counts as full.
+    """
+
+    def __init__(self, max_keys=LOCAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self._prune_at = max_keys
+        self._buckets = {}
+
+    def consume(self, key, capacity, refill_rate):
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = capacity
+        else:
+            tokens, updated_at, _ = bucket
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / refill_rate
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / refill_rate)
+
+        if len(self._buckets) > self._prune_at:
+            self._prune(now)
+        return wait
+
+    async def aconsume(self, key, capacity, refill_rate):
+        return self.consume(key, capacity, refill_rate)
+
+    def _prune(self, now):
+        for key, (_, _, full_at) in list(self._buckets.items()):
+            if full_at <= now:
+                self._buckets.pop(key, None)
+        # Everything left is in use; do not rescan on every request
+        self._prune_at = max(self.max_keys, 2 * len(self._buckets))
+
+
+# Refill and take a token atomically on the Redis server, with its clock so
+# that nodes do not need synchronized clocks. Needs Redis 5+ (TIME in a
+# script that writes).
+CONSUME_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1])
+if tokens == nil then
+    tokens = capacity
+else
+    tokens = math.min(capacity, tokens + math.max(0, now - tonumber(bucket[2])) * refill_rate)
+end
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / refill_rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / refill_rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBuckets(Buckets):
+    """
+    Buckets shared by every worker through Redis (requires the redis package).
+    If Redis is unreachable requests are let through rather than failed.
+    """
+    prefix = 'throttle:'
+
+    def __init__(self, url=None):
+        import redis
+        self.url = url or settings.REDIS_URL
+        self._client = redis.Redis.from_url(self.url)
+        self._script = self._client.register_script(CONSUME_SCRIPT)
+        self._errors = (redis.RedisError,)
+
+    def consume(self, key, capacity, refill_rate):
+        try:
+            return float(self._script(keys=[self.prefix + key], args=[capacity, refill_rate]))
+        except self._errors:
+            logger.warning("Throttle backend unavailable, not throttling", exc_info=True)
+            return 0.0
+
+
+def get_backend():
+    path = settings.THROTTLE_BACKEND
+    backend = _backends.get(path)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(path)
+            if backend is None:
+                backend = _backends[path] = import_string(path)()
+    return backend
+
+
+def throttled_detail(wait):
+    return f"Request was throttled. Expected available in {math.ceil(wait)} seconds."
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle over the configured backend, scoped by the view's throttle_scope"""
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0.0
+        if not settings.THROTTLE_ENABLED:
+            return True
+
+        scope, key = bucket_key(getattr(view, 'throttle_scope', None), request.user, self.get_ident(request))
+        rate = scope_rate(scope)
+        if rate is None:
+            return True
+        self.wait_seconds = get_backend().consume(key, *rate)
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+async def acheck(scope, request):
+    """Seconds to wait before an async view may serve the request, 0 if it may now"""
+    if not settings.THROTTLE_ENABLED:
+        return 0.0
+    scope, key = bucket_key(scope, getattr(request, 'user', None), BaseThrottle().get_ident(request))
+    rate = scope_rate(scope)
+    if rate is None:
+        return 0.0
+    return await get_backend().aconsume(key, *rate)
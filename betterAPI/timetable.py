@@ -0,0 +1,235 @@
+"""
+Weekly occupancy bitmaps.
+
+A week is 6 days x 12 periods = 72 bits; bit ``day * 12 + period - 1`` is set
+when that period is taken. Every SchedulePattern stores the mask of its time
+slots and every Semester (one per student per term) the OR of the masks of
+the patterns its enrollments selected, so checking a registration for
+timetable conflicts is a single AND. Masks are stored as hex strings because
+72 bits do not fit a BigIntegerField.
+
+The stored masks are kept up to date by signals (see signals.py);
+``rebuild_occupancy`` reconciles everything from scratch.
+
+``BookingIndex`` applies the same idea to educators and rooms: one 12-bit
+mask per (educator or location, day), used to catch double bookings when a
+TimeSlot is written and to scan a whole term in a single pass.
+"""
+from django.db.models import Q
+
+from .models import TimeSlot, SchedulePattern, Semester, Enrollment, Term
+
+PERIODS_PER_DAY = 12
+DAY_NAMES = dict(TimeSlot.DAY_CHOICES)
+
+
+def from_hex(value):
+    return int(value or '0', 16)
+
+
+def to_hex(mask):
+    return format(mask, 'x')
+
+
+def slot_mask(day, start_period, end_period):
+    width = end_period - start_period + 1
+    if width <= 0:
+        return 0
+    return ((1 << width) - 1) << (day * PERIODS_PER_DAY + start_period - 1)
+
+
+def slots_mask(time_slots):
+    """time_slots: iterable of objects with day/start_period/end_period"""
+    mask = 0
+    for time_slot in time_slots:
+        mask |= slot_mask(time_slot.day, time_slot.start_period, time_slot.end_period)
+    return mask
+
+
+def describe(mask):
+    """Human readable list of the periods in a mask, e.g. 'Sunday P3, Sunday P4'"""
+    parts = []
+    bit = 0
+    while mask:
+        if mask & 1:
+            day, period = divmod(bit, PERIODS_PER_DAY)
+            parts.append(f"{DAY_NAMES.get(day, day)} P{period + 1}")
+        mask >>= 1
+        bit += 1
+    return ', '.join(parts)
+
+
+def refresh_pattern_occupancy(pattern_id):
+    mask = slots_mask(TimeSlot.objects.filter(pattern_id=pattern_id).only('day', 'start_period', 'end_period'))
+    SchedulePattern.objects.filter(pk=pattern_id).update(occupancy=to_hex(mask))
+
+
+def semester_mask(semester_id):
+    """OR of the selected pattern masks of every enrollment in a semester (one query)"""
+    mask = 0
+    occupancies = SchedulePattern.objects.filter(
+        enrollments__semester_id=semester_id
+    ).values_list('occupancy', flat=True)
+    for occupancy in occupancies:
+        mask |= from_hex(occupancy)
+    return mask
+
+
+def refresh_semester_occupancy(semester_id):
+    Semester.objects.filter(pk=semester_id).update(occupancy=to_hex(semester_mask(semester_id)))
+
+
+def refresh_semesters_occupancy(semester_ids):
+    for semester_id in set(semester_ids):
+        refresh_semester_occupancy(semester_id)
+
+
+def pattern_semester_ids(pattern_id):
+    """Semesters with an enrollment that selected this pattern"""
+    return list(
+        Enrollment.objects.filter(selected_patterns=pattern_id).values_list('semester_id', flat=True).distinct()
+    )
+
+
+def student_term_masks(student, global_settings):
+    """
+    {registration_id: mask} of the patterns a student selected in the current term,
+    read in one query over the selected_patterns table.
+    """
+    masks = {}
+    rows = Enrollment.selected_patterns.through.objects.filter(
+        enrollment__student=student,
+        enrollment__term_id=Term.current_id(global_settings)
+    ).values_list('enrollment__registration_id', 'schedulepattern__occupancy')
+    for registration_id, occupancy in rows:
+        masks[registration_id] = masks.get(registration_id, 0) | from_hex(occupancy)
+    return masks
+
+
+def rebuild_occupancy():
+    """Recompute every pattern and semester mask. Returns the number of rows that changed."""
+    changed = 0
+
+    pattern_masks = {}
+    for time_slot in TimeSlot.objects.only('pattern_id', 'day', 'start_period', 'end_period').iterator():
+        pattern_masks[time_slot.pattern_id] = pattern_masks.get(time_slot.pattern_id, 0) | slot_mask(
+            time_slot.day, time_slot.start_period, time_slot.end_period
+        )
+    for pattern_id, occupancy in SchedulePattern.objects.values_list('id', 'occupancy').iterator():
+        expected = to_hex(pattern_masks.get(pattern_id, 0))
+        if occupancy != expected:
+            SchedulePattern.objects.filter(pk=pattern_id).update(occupancy=expected)
+            changed += 1
+
+    semester_masks = {}
+    rows = Enrollment.selected_patterns.through.objects.values_list('enrollment__semester_id', 'schedulepattern_id')
+    for semester_id, pattern_id in rows.iterator():
+        semester_masks[semester_id] = semester_masks.get(semester_id, 0) | pattern_masks.get(pattern_id, 0)
+    for semester_id, occupancy in Semester.objects.values_list('pk', 'occupancy').iterator():
+        expected = to_hex(semester_masks.get(semester_id, 0))
+        if occupancy != expected:
+            Semester.objects.filter(pk=semester_id).update(occupancy=expected)
+            changed += 1
+
+    return changed
+
+
+def day_mask(start_period, end_period):
+    """12-bit mask of a period range within a single day"""
+    width = end_period - start_period + 1
+    if width <= 0:
+        return 0
+    return ((1 << width) - 1) << (start_period - 1)
+
+
+def normalize_location(location):
+    return (location or '').strip().casefold()
+
+
+class BookingIndex:
+    """
+    Per-day period masks of every educator and location, plus which slot holds
+    each period so a clash can name the slots involved.
+    """
+
+    def __init__(self):
+        self.masks = {}
+        self.holders = {}
+
+    def _keys(self, slot):
+        _, day, _, _, educator_id, location = slot
+        keys = []
+        if educator_id is not None:
+            keys.append(('educator', educator_id, day))
+        location = normalize_location(location)
+        if location:
+            keys.append(('location', location, day))
+        return keys
+
+    def add(self, slot):
+        """
+        Book slot = (id, day, start_period, end_period, educator_id, location).
+        Returns the clashes with slots already in the index.
+        """
+        slot_id, day, start_period, end_period = slot[:4]
+        mask = day_mask(start_period, end_period)
+        clashes = []
+        for key in self._keys(slot):
+            booked = self.masks.get(key, 0)
+            holders = self.holders.setdefault(key, [None] * PERIODS_PER_DAY)
+            overlap = booked & mask
+            if overlap:
+                periods = [period + 1 for period in range(PERIODS_PER_DAY) if overlap >> period & 1]
+                clashes.append({
+                    'resource': key[0],
+                    'value': key[1],
+                    'day': day,
+                    'dayName': DAY_NAMES.get(day, day),
+                    'periods': periods,
+                    'timeSlotId': slot_id,
+                    'conflictsWith': sorted({holders[period - 1] for period in periods}),
+                })
+            self.masks[key] = booked | mask
+            for period in range(start_period - 1, end_period):
+                if holders[period] is None:
+                    holders[period] = slot_id
+        return clashes
+
+
+def term_slots():
+    """Every time slot of the active offerings, i.e. the current term's schedule"""
+    return TimeSlot.objects.filter(pattern__registration__is_active=True)
+
+
+def slot_rows(queryset):
+    return queryset.values_list('id', 'day', 'start_period', 'end_period', 'educator_id', 'location')
+
+
+def booking_conflicts(day, start_period, end_period, educator_id=None, location=None, exclude_id=None):
+    """Clashes a slot would have with the term's educator and room bookings on that day"""
+    resource = Q()
+    if educator_id is not None:
+        resource |= Q(educator_id=educator_id)
+    if normalize_location(location):
+        resource |= Q(location__iexact=location.strip())
+    if not resource:
+        return []
+
+    index = BookingIndex()
+    candidates = term_slots().filter(resource, day=day, start_period__lte=end_period, end_period__gte=start_period)
+    if exclude_id is not None:
+        candidates = candidates.exclude(pk=exclude_id)
+    for row in slot_rows(candidates):
+        index.add(row)
+    return index.add((exclude_id, day, start_period, end_period, educator_id, location))
+
+
+def scan_booking_conflicts(rows=None):
+    """Every educator/room double booking of the term, in one query and one pass"""
+    if rows is None:
+        rows = slot_rows(term_slots().order_by('day', 'start_period', 'id')).iterator()
+    index = BookingIndex()
+    clashes = []
+    for row in rows:
+        clashes.extend(index.add(row))
+    return clashes
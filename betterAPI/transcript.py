@@ -0,0 +1,91 @@
+"""
+Student transcript (academic years -> semesters -> enrollments with grades).
+
+Built from one flat query over Enrollment joined to Semester, AcademicYear and
+Course, ordered so every year and semester arrives as a contiguous run, then
+grouped in a single pass. The query count does not depend on how many years
+or semesters a student has.
+"""
+from .models import Enrollment, Semester
+
+PASSING_GRADES = {'A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-'}
+SEMESTER_NAMES = dict(Semester.semesterNameOptions)
+
+TRANSCRIPT_FIELDS = (
+    'semester__academicYear__yearId', 'semester__academicYear__yearName',
+    'semester__semesterId', 'semester__semesterName', 'semester__gpa', 'semester__cgpa',
+    'semester__registeredHours', 'semester__earnedHours',
+    'registration__course__courseCode', 'registration__course__courseName', 'registration__course__credits',
+    'letterGrade', 'numericGrade', 'coursework', 'courseworkMax', 'exam', 'examMax', 'total',
+)
+
+
+def transcript_rows(student):
+    return Enrollment.objects.filter(student=student).order_by(
+        '-semester__academicYear__yearName', 'semester__academicYear__yearId', 'semester__semesterId', 'id'
+    ).values_list(*TRANSCRIPT_FIELDS)
+
+
+def build_transcript(student):
+    """Returns (academic_history, overall_stats) in one query"""
+    return group_transcript(transcript_rows(student).iterator())
+
+
+def group_transcript(rows):
+    """Group transcript_rows() output into (academic_history, overall_stats)"""
+    history = []
+    overall_stats = {
+        'totalCreditHours': 0,
+        'passedCreditHours': 0,
+        'overallCGPA': 0.0,
+        'totalSemesters': 0
+    }
+    year_data = None
+    semester_data = None
+
+    for (year_id, year_name, semester_id, semester_name, gpa, cgpa, registered_hours, earned_hours,
+         course_code, course_name, credits, letter_grade, numeric_grade, coursework, coursework_max,
+         exam, exam_max, total) in rows:
+        if year_data is None or year_data['yearId'] != year_id:
+            year_data = {
+                'yearId': year_id,
+                'yearName': year_name,
+                'semesters': []
+            }
+            history.append(year_data)
+
+        if semester_data is None or semester_data['semesterId'] != semester_id:
+            semester_data = {
+                'semesterId': semester_id,
+                'semesterName': SEMESTER_NAMES.get(semester_name, semester_name),
+                'gpa': float(gpa) if gpa else 0.0,
+                'cgpa': float(cgpa) if cgpa else 0.0,
+                'registeredHours': registered_hours or 0,
+                'earnedHours': earned_hours or 0,
+                'enrollments': []
+            }
+            year_data['semesters'].append(semester_data)
+            overall_stats['totalSemesters'] += 1
+            if cgpa:
+                overall_stats['overallCGPA'] = float(cgpa)
+
+        is_passed = letter_grade in PASSING_GRADES
+        semester_data['enrollments'].append({
+            'courseCode': course_code,
+            'courseName': course_name,
+            'credits': credits,
+            'letterGrade': letter_grade,
+            'numericGrade': float(numeric_grade) if numeric_grade else 0.0,
+            'coursework': coursework or 0,
+            'courseworkMax': coursework_max or 50,
+            'exam': exam or 0,
+            'examMax': exam_max or 50,
+            'total': total or 0,
+            'isPassed': is_passed
+        })
+
+        overall_stats['totalCreditHours'] += credits
+        if is_passed:
+            overall_stats['passedCreditHours'] += credits
+
+    return history, overall_stats
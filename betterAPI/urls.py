@@ -1,6 +1,7 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView 
-from . import views
+from rest_framework_simplejwt.views import TokenRefreshView 
+from . import views, async_views
+from .authentication import RoleTokenObtainPairView
 urlpatterns = [
     
     path('settings/', views.GlobalSettingsView.as_view(), name='global-settings'),
@@ -28,11 +29,13 @@ urlpatterns = [
     path('schedule-pattern/<int:pk>/', views.SchedulePatternDetailView.as_view(), name='schedule-pattern-detail'),
     
     path('time-slots/', views.TimeSlotListCreateView.as_view(), name='timeslot-list-create'),
+    path('time-slots/conflicts/', views.TimeSlotConflictsView.as_view(), name='timeslot-conflicts'),
     path('time-slot/<int:pk>/', views.TimeSlotDetailView.as_view(), name='timeslot-detail'),
     
     path('user/create/', views.UserCreateView.as_view(), name='user-create'),
+    path('users/bulk-create/', views.BulkUserCreateView.as_view(), name='user-bulk-create'),
     path('auth/me/', views.GetCurrentUser.as_view(), name='current-user'),
-    path('auth/login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('auth/login/', RoleTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
     path('students/', views.StudentListCreateView.as_view(), name='student-list-create'),
@@ -41,7 +44,11 @@ urlpatterns = [
     path('student/current-semester/', views.StudentCurrentSemester.as_view(), name='student-current-semester'),
     path('student/available-registrations/', views.AvailableRegistration.as_view(), name='available-registrations'),
     path('student/register/', views.StudentRegistrationView.as_view(), name='student-registration'),
+    path('student/register/ticket/<str:ticket>/', views.StudentRegistrationTicketView.as_view(), name='student-registration-ticket'),
+    path('metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('registration-queue/metrics/', views.RegistrationQueueMetricsView.as_view(), name='registration-queue-metrics'),
     path('student/timetable/', views.StudentTimetableView.as_view(), name='student-timetable'),
+    path('student/seat-events/', async_views.seat_events, name='student-seat-events'),
     path('student/<str:pk>/', views.StudentDetailView.as_view(), name='student-detail'),
     
     path('educators/', views.EducatorListCreateView.as_view(), name='educator-list-create'),
@@ -51,4 +58,14 @@ urlpatterns = [
     path('educator/course/<int:registration_id>/grades/', views.EducatorUpdateGrades.as_view(), name='educator-update-grades'),
     path('educator/timetable/', views.EducatorTimetableView.as_view(), name='educator-timetable'),
     path('educator/<str:pk>/', views.EducatorDetailView.as_view(), name='educator-detail'),
+
+    path('async/student/info/', async_views.student_info, name='async-student-info'),
+    path('async/student/grades/', async_views.student_grades, name='async-student-grades'),
+    path('async/student/current-semester/', async_views.student_current_semester, name='async-student-current-semester'),
+    path('async/student/timetable/', async_views.student_timetable, name='async-student-timetable'),
+    path('async/student/available-registrations/', async_views.available_registrations, name='async-available-registrations'),
+    path('async/educator/info/', async_views.educator_info, name='async-educator-info'),
+    path('async/educator/current-courses/', async_views.educator_current_courses, name='async-educator-current-courses'),
+    path('async/educator/course/<int:registration_id>/', async_views.educator_course_info, name='async-educator-course-info'),
+    path('async/educator/timetable/', async_views.educator_timetable, name='async-educator-timetable'),
 ]
\ No newline at end of file
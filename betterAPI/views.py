@@ -1,81 +1,91 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from .models import Student, Course, AcademicYear, Semester, Department, Educator, Registration, Enrollment, SchedulePattern, TimeSlot, GlobalSettings
+from .models import Student, Course, AcademicYear, Semester, Department, Educator, Registration, Enrollment, SchedulePattern, TimeSlot, GlobalSettings, Term
 from . import serializers
 from django.shortcuts import get_object_or_404, render
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+import json
+from django.http import HttpResponse, StreamingHttpResponse
+from .throttling import TokenBucketThrottle
 from .permissions import IsEducator, IsStudent
+from .authentication import STUDENT, EDUCATOR, ADMIN
 from django.contrib.auth.models import User, Group
 from django.db.models import Q, Sum
+from . import seats, grading, catalog, registration_queue, timetable, transcript, payloads, roster, dashboard, provisioning, sqlite_writes
+from .response_cache import cached_student_response
+from .instrumentation import InstrumentedViewMixin, prometheus_text
+from .db_routing import ReplicaReadMixin
+from .registration import register_courses
+from .parsers import CSVParser
+from rest_framework.parsers import JSONParser
 class StudentListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Student.objects.all()
     serializer_class = serializers.StudentSerializer
     permission_classes = [IsAdminUser]
 
 class StudentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Student.objects.all()
     serializer_class = serializers.StudentSerializer
     permission_classes = [IsAdminUser]
 
 class CourseListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Course.objects.all()
     serializer_class = serializers.CourseSerializer
     permission_classes = [IsAdminUser]
     
 class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Course.objects.all()
     serializer_class = serializers.CourseSerializer
     permission_classes = [IsAdminUser]
 
 class EducatorListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Educator.objects.all()
     serializer_class = serializers.EducatorSerializer
     permission_classes = [IsAdminUser]
     
 class EducatorDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Educator.objects.all()
     serializer_class = serializers.EducatorSerializer
     permission_classes = [IsAdminUser]
     
 class DepartmentListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Department.objects.all()
     serializer_class = serializers.DepartmentSerializer
     permission_classes = [IsAdminUser]
     
 class DepartmentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Department.objects.all()
     serializer_class = serializers.DepartmentSerializer
     permission_classes = [IsAdminUser]
     
 class AcademicYearListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = AcademicYear.objects.all()
     serializer_class = serializers.AcademicYearSerializer
     permission_classes = [IsAdminUser]
     
 class AcademicYearDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = AcademicYear.objects.all()
     serializer_class = serializers.AcademicYearSerializer
     permission_classes = [IsAdminUser]
     
 class SemesterListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Semester.objects.all()
     serializer_class = serializers.SemesterSerializer
     permission_classes = [IsAdminUser]
 
 class SemesterDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Semester.objects.all()
     serializer_class = serializers.SemesterSerializer
     permission_classes = [IsAdminUser]
@@ -85,19 +95,20 @@ class GlobalSettingsView(generics.RetrieveUpdateAPIView):
     """
     Get or update global settings (current academic year and semester)
     """
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     serializer_class = serializers.GlobalSettingsSerializer
     permission_classes = [IsAdminUser]
     
     def get_object(self):
-        # Always return the singleton instance
-        return GlobalSettings.get_current()
+        # Always return the singleton instance, read fresh since it may be updated
+        return GlobalSettings.load()
 
 class GlobalSettingsPublicView(generics.RetrieveAPIView):
     """
     Public view to get current academic year and semester (no auth required)
     """
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'current-semester'
     serializer_class = serializers.GlobalSettingsSerializer
     permission_classes = []  # No authentication required
     
@@ -105,7 +116,7 @@ class GlobalSettingsPublicView(generics.RetrieveAPIView):
         return GlobalSettings.get_current()
 
 class RegistrationListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Registration.objects.all()
     serializer_class = serializers.RegistrationSerializer
     permission_classes = [IsAdminUser]
@@ -117,7 +128,7 @@ class RegistrationListCreateView(generics.ListCreateAPIView):
         ).prefetch_related('patterns')
 
 class RegistrationDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Registration.objects.all()
     serializer_class = serializers.RegistrationSerializer
     permission_classes = [IsAdminUser]
@@ -129,7 +140,7 @@ class RegistrationDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 # ENROLLMENT CRUD VIEWS
 class EnrollmentListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Enrollment.objects.all()
     serializer_class = serializers.EnrollmentSerializer
     permission_classes = [IsAdminUser]
@@ -141,7 +152,7 @@ class EnrollmentListCreateView(generics.ListCreateAPIView):
         ).prefetch_related('selected_patterns')
 
 class EnrollmentDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = Enrollment.objects.all()
     serializer_class = serializers.EnrollmentSerializer
     permission_classes = [IsAdminUser]
@@ -153,7 +164,7 @@ class EnrollmentDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 # SCHEDULE PATTERN CRUD VIEWS
 class SchedulePatternListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = SchedulePattern.objects.all()
     serializer_class = serializers.SchedulePatternSerializer
     permission_classes = [IsAdminUser]
@@ -165,7 +176,7 @@ class SchedulePatternListCreateView(generics.ListCreateAPIView):
         ).prefetch_related('time_slots')
 
 class SchedulePatternDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = SchedulePattern.objects.all()
     serializer_class = serializers.SchedulePatternSerializer
     permission_classes = [IsAdminUser]
@@ -176,7 +187,7 @@ class SchedulePatternDetailView(generics.RetrieveUpdateDestroyAPIView):
         ).prefetch_related('time_slots')
 
 class TimeSlotListCreateView(generics.ListCreateAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = TimeSlot.objects.all()
     serializer_class = serializers.TimeSlotSerializer
     permission_classes = [IsAdminUser]
@@ -188,7 +199,7 @@ class TimeSlotListCreateView(generics.ListCreateAPIView):
         )
 
 class TimeSlotDetailView(generics.RetrieveUpdateDestroyAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     queryset = TimeSlot.objects.all()
     serializer_class = serializers.TimeSlotSerializer
     permission_classes = [IsAdminUser]
@@ -198,8 +209,20 @@ class TimeSlotDetailView(generics.RetrieveUpdateDestroyAPIView):
             'pattern__registration__course', 'educator'
         )
 
-class UserCreateView(generics.CreateAPIView):
+class TimeSlotConflictsView(generics.GenericAPIView):
+    """Every educator/room double booking in the current term's schedule"""
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAdminUser]
 
+    def get(self, request, *args, **kwargs):
+        conflicts = timetable.scan_booking_conflicts()
+        return Response({
+            'totalConflicts': len(conflicts),
+            'conflicts': conflicts
+        }, status=status.HTTP_200_OK)
+
+class UserCreateView(generics.CreateAPIView):
+    throttle_classes = [TokenBucketThrottle]
     serializer_class = serializers.UserCreationSerializer
     permission_classes = [IsAdminUser]
 
@@ -228,8 +251,43 @@ class UserCreateView(generics.CreateAPIView):
             status=status.HTTP_201_CREATED
         )
 
+class BulkUserCreateView(generics.CreateAPIView):
+    """
+    Create accounts for many students/educators at once (see provisioning.py).
+    Streams one JSON line per written batch (with the IDs that already had an
+    account), the last one has "done": true.
+    """
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'bulk-create'
+    serializer_class = serializers.BulkUserCreationSerializer
+    permission_classes = [IsAdminUser]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_type = serializer.validated_data['type']
+
+        accounts = provisioning.pending_accounts(
+            user_type,
+            ids=serializer.validated_data.get('ids'),
+            department=serializer.validated_data.get('department')
+        )
+        updates = provisioning.provision(user_type, accounts)
+
+        def lines():
+            # Django closes this when the response is closed, also when the client went away,
+            # which stops the hashing pool
+            try:
+                for update in updates:
+                    yield json.dumps(update) + '\n'
+            finally:
+                updates.close()
+
+        # The stream starts before any account is written: 200, the outcome is in the last line
+        return StreamingHttpResponse(lines(), content_type='application/x-ndjson', status=status.HTTP_200_OK)
+
 class GetCurrentUser(generics.RetrieveAPIView):
-    throttle_classe = [UserRateThrottle, AnonRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     permission_classes = [IsAuthenticated]
     def get(self, request, *args, **kwargs):
         if request.user.is_anonymous:
@@ -237,33 +295,35 @@ class GetCurrentUser(generics.RetrieveAPIView):
                 {'message': 'User is not authenticated'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-        if request.user.groups.filter(name='Student'):
-            student = Student.objects.get(studentId=request.user.username)
-            return Response(
-                {"message": "Token is authenticated.", 'id' : student.studentId, 'name' : student.nameEn},
-                status=status.HTTP_200_OK
-            )
-        elif request.user.groups.filter(name='Educator'):
-            educator = Educator.objects.get(educatorId=request.user.username)
-            return Response(
-                {"message": "Token is authenticated.", 'id' : student.studentId, 'name' : student.nameEn},
-                status=status.HTTP_200_OK
-            )
+        # The role and linked id come from the token's claims
+        role = getattr(request.user, 'role', None)
+        if role == STUDENT:
+            name = Student.objects.filter(studentId=request.user.profile_id).values_list('nameEn', flat=True).first()
+        elif role == EDUCATOR:
+            name = Educator.objects.filter(educatorId=request.user.profile_id).values_list('nameEn', flat=True).first()
         elif request.user.is_staff:
             return Response(
-                {"message": "Token is authenticated."},
+                {"message": "Token is authenticated.", 'role': ADMIN},
                 status=status.HTTP_200_OK
             )
         else:
+            name = None
+        if name is None:
             return Response(
                 {'message' : 'User not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
+        return Response(
+            {"message": "Token is authenticated.", 'id' : request.user.profile_id, 'name' : name, 'role': role},
+            status=status.HTTP_200_OK
+        )
 
-class StudentInfo(generics.GenericAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
-    permission_classes = [IsAuthenticated]
+class StudentInfo(ReplicaReadMixin, InstrumentedViewMixin, generics.GenericAPIView):
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAuthenticated, IsStudent]
+    query_budget = 4
     
+    @cached_student_response('info')
     def get(self, request, *args, **kwargs):
         studentId = request.user.username 
         try:
@@ -278,59 +338,17 @@ class StudentInfo(generics.GenericAPIView):
             'semester__academicYear'
         ).order_by('-semester__academicYear__yearName', '-semester__semesterName').first()
         
-        current_semester = None
-        current_academic_year = None
-        current_cgpa = 0.0
-        if current_enrollment:
-            current_semester = current_enrollment.semester.get_semesterName_display()
-            current_academic_year = current_enrollment.semester.academicYear.yearName
-            current_cgpa = float(current_enrollment.semester.cgpa) if current_enrollment.semester.cgpa else 0.0
-        
-        # 🎯 STEP 5: Build the response data
-        data = {
-            # Basic student info
-            'studentId': student.studentId,
-            'nameAr': student.nameAr,
-            'nameEn': student.nameEn,
-            'email': student.email,
-            'phone': student.phone,
-            'dateOfBirth': student.dateOfBirth,
-            'address': student.address,
-            'gender': student.Gender,
-            'nationality': student.nationality,
-            'religion': student.religion,
-            'homePhone': student.homePhone,
-            'zipcode': student.zipcode,
-            'nationalId': student.nationalId,
-            'status': student.get_status_display(),
-            
-            # Academic info
-            'level': student.level,
-            'earnedHours': student.earnedHours,
-            'passedCreditHours': total_credits,
-            'cgpa': current_cgpa,
-            
-            # Department info (from related table)
-            'department': {
-                'code': student.department.code,
-                'name': student.department.name,
-                'description': student.department.desc
-            },
-            
-            # Current semester info
-            'currentSemester': current_semester,
-            'currentAcademicYear': current_academic_year,
-        }
-        
-        return Response(data, status=status.HTTP_200_OK)
+        return Response(payloads.student_info(student, total_credits, current_enrollment), status=status.HTTP_200_OK)
 
-class StudentGrades(generics.GenericAPIView):
+class StudentGrades(ReplicaReadMixin, InstrumentedViewMixin, generics.GenericAPIView):
     """
     Returns all academic history: Academic Years -> Semesters -> Enrollments with grades
     """
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
-    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAuthenticated, IsStudent]
+    query_budget = 3
     
+    @cached_student_response('grades', depends_on_catalog=True)
     def get(self, request, *args, **kwargs):
         studentId = request.user.username
         try:
@@ -338,85 +356,21 @@ class StudentGrades(generics.GenericAPIView):
         except Student.DoesNotExist:
             return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        academic_years = AcademicYear.objects.filter(student=student).prefetch_related(
-            'semesters__enrollments__registration__course',
-            'semesters__enrollments__registration__course__departments'
-        ).order_by('-yearName')
-
-        data = []
-        overall_stats = {
-            'totalCreditHours': 0,
-            'passedCreditHours': 0,
-            'overallCGPA': 0.0,
-            'totalSemesters': 0
-        }
-
-        for academic_year in academic_years:
-            year_data = {
-                'yearId': academic_year.yearId,
-                'yearName': academic_year.yearName,
-                'semesters': []
-            }
-
-            for semester in academic_year.semesters.all():
-                semester_data = {
-                    'semesterId': semester.semesterId,
-                    'semesterName': semester.get_semesterName_display(),
-                    'gpa': float(semester.gpa) if semester.gpa else 0.0,
-                    'cgpa': float(semester.cgpa) if semester.cgpa else 0.0,
-                    'registeredHours': semester.registeredHours or 0,
-                    'earnedHours': semester.earnedHours or 0,
-                    'enrollments': []
-                }
-
-                enrollments = semester.enrollments.filter(student=student)
-                
-                for enrollment in enrollments:
-                    course = enrollment.registration.course
-                    enrollment_data = {
-                        'courseCode': course.courseCode,
-                        'courseName': course.courseName,
-                        'credits': course.credits,
-                        'letterGrade': enrollment.letterGrade,
-                        'numericGrade': float(enrollment.numericGrade) if enrollment.numericGrade else 0.0,
-                        'coursework': enrollment.coursework or 0,
-                        'courseworkMax': enrollment.courseworkMax or 50,
-                        'exam': enrollment.exam or 0,
-                        'examMax': enrollment.examMax or 50,
-                        'total': enrollment.total or 0,
-                        'isPassed': enrollment.letterGrade in ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-'] if enrollment.letterGrade else False
-                    }
-                    semester_data['enrollments'].append(enrollment_data)
-
-                    overall_stats['totalCreditHours'] += course.credits
-                    if enrollment_data['isPassed']:
-                        overall_stats['passedCreditHours'] += course.credits
-
-                if semester_data['enrollments']:
-                    year_data['semesters'].append(semester_data)
-                    overall_stats['totalSemesters'] += 1
-                    if semester.cgpa:
-                        overall_stats['overallCGPA'] = float(semester.cgpa)
-
-            if year_data['semesters']:
-                data.append(year_data)
-
-        response_data = {
-            'studentId': student.studentId,
-            'studentName': student.nameEn,
-            'academicHistory': data,
-            'overallStats': overall_stats
-        }
+        # One flat query, grouped into years and semesters in a single pass
+        data, overall_stats = transcript.build_transcript(student)
 
-        return Response(response_data, status=status.HTTP_200_OK)
+        return Response(payloads.student_grades(student, data, overall_stats), status=status.HTTP_200_OK)
 
-class StudentCurrentSemester(generics.GenericAPIView):
+class StudentCurrentSemester(ReplicaReadMixin, InstrumentedViewMixin, generics.GenericAPIView):
     """
     Returns current semester data with possibly incomplete grades
     """
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
-    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'current-semester'
+    permission_classes = [IsAuthenticated, IsStudent]
+    query_budget = 4
     
+    @cached_student_response('current-semester', depends_on_catalog=True)
     def get(self, request, *args, **kwargs):
         studentId = request.user.username
         try:
@@ -430,10 +384,7 @@ class StudentCurrentSemester(generics.GenericAPIView):
         ).order_by('-semester__academicYear__yearName', '-semester__semesterName').first()
 
         if not current_enrollment:
-            return Response({
-                'message': 'No current semester found',
-                'currentSemester': None
-            }, status=status.HTTP_200_OK)
+            return Response(payloads.NO_CURRENT_SEMESTER, status=status.HTTP_200_OK)
 
         current_semester = current_enrollment.semester
         
@@ -441,60 +392,15 @@ class StudentCurrentSemester(generics.GenericAPIView):
             semester=current_semester
         ).select_related('registration__course')
 
-        semester_data = {
-            'semesterId': current_semester.semesterId,
-            'semesterName': current_semester.get_semesterName_display(),
-            'academicYear': current_semester.academicYear.yearName,
-            'gpa': float(current_semester.gpa) if current_semester.gpa else 0.0,
-            'cgpa': float(current_semester.cgpa) if current_semester.cgpa else 0.0,
-            'registeredHours': current_semester.registeredHours or 0,
-            'earnedHours': current_semester.earnedHours or 0,
-            'enrollments': []
-        }
-
-        total_registered_hours = 0
-        completed_courses = 0
-
-        for enrollment in current_enrollments:
-            course = enrollment.registration.course
-            has_grade = enrollment.letterGrade is not None and enrollment.letterGrade != ''
-            
-            enrollment_data = {
-                'courseCode': course.courseCode,
-                'courseName': course.courseName,
-                'credits': course.credits,
-                'letterGrade': enrollment.letterGrade,
-                'numericGrade': float(enrollment.numericGrade) if enrollment.numericGrade else 0.0,
-                'coursework': enrollment.coursework or 0,
-                'courseworkMax': enrollment.courseworkMax or 50,
-                'exam': enrollment.exam or 0,
-                'examMax': enrollment.examMax or 50,
-                'total': enrollment.total or 0,
-                'hasGrade': has_grade,
-                'isPassed': enrollment.letterGrade in ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-'] if has_grade else None,
-                'isInProgress': not has_grade
-            }
-            semester_data['enrollments'].append(enrollment_data)
-            total_registered_hours += course.credits
-            if has_grade:
-                completed_courses += 1
-
-        semester_data['totalRegisteredHours'] = total_registered_hours
-        semester_data['completedCourses'] = completed_courses
-        semester_data['inProgressCourses'] = len(current_enrollments) - completed_courses
-
-        response_data = {
-            'studentId': student.studentId,
-            'studentName': student.nameEn,
-            'currentSemester': semester_data
-        }
-
-        return Response(response_data, status=status.HTTP_200_OK)
+        return Response(
+            payloads.student_current_semester(student, current_semester, list(current_enrollments)),
+            status=status.HTTP_200_OK
+        )
 
 
-class AvailableRegistration(generics.GenericAPIView):
-    throttle_classes = [AnonRateThrottle, UserRateThrottle]
-    permission_classes = [IsAuthenticated] 
+class AvailableRegistration(ReplicaReadMixin, InstrumentedViewMixin, generics.GenericAPIView):
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAuthenticated, IsStudent] 
 
     def get(self, request, *args, **kwargs):
         studentId = request.user.username
@@ -503,113 +409,45 @@ class AvailableRegistration(generics.GenericAPIView):
         except Student.DoesNotExist:
             return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        completed_courses = student.enrollments.filter(
-            letterGrade__in=['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-']
-        ).values_list('registration__course', flat=True) 
-        
-        current_registrations = student.enrollments.filter(
-            letterGrade__isnull=True
-        ).values_list('registration__course', flat=True) 
+        # Passed and in-progress courses in a single query
+        completed_courses = set()
+        current_registrations_set = set()
+        for course_code, letter_grade in student.enrollments.values_list('registration__course', 'letterGrade'):
+            if letter_grade is None:
+                current_registrations_set.add(course_code)
+            elif letter_grade in ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-']:
+                completed_courses.add(course_code)
 
         departments = [student.department.code]
         if student.level > 0:
             departments.append('GP')
 
-        base_registrations = Registration.objects.filter(
-            is_active=True,
-            course__departments__code__in=departments,
-        ).exclude(
-            course__courseCode__in=completed_courses
-        ).select_related(
-            'course'
-        ).prefetch_related(
-            'course__prerequisites',
-            'course__departments',
-            'patterns__time_slots__educator',
-            'patterns__time_slots'
-        )
+        # The catalog itself is shared by every student of the department and cached,
+        # only the eligibility filter runs per request
+        global_settings = GlobalSettings.get_current()
+        eligible_registrations = catalog.eligible_entries(departments, global_settings, completed_courses)
 
-        
-        eligible_registrations = []
-        for reg in base_registrations:
-            course = reg.course
-            prerequisites = course.prerequisites.values_list('courseCode', flat=True)
-            
-            if prerequisites: 
-                incomplete = set(prerequisites) - set(completed_courses)
-                if not incomplete:  
-                    eligible_registrations.append(reg)  
-            else:  
-                eligible_registrations.append(reg)  
+        # The student's current timetable, per registration, to flag clashing patterns
+        term_masks = timetable.student_term_masks(student, global_settings)
 
-        
-        current_registrations_set = set(current_registrations)
-        registrations_by_level = {}
-
-        for reg in eligible_registrations:  
-            course_code = reg.course.courseCode
-            is_enrolled = course_code in current_registrations_set
-
-            
-            patterns_data = []
-            for pattern in reg.patterns.all():
-                time_slots_data = []
-                for time_slot in pattern.time_slots.all():
-                    time_slot_data = {
-                        'day': time_slot.day,
-                        'dayName': time_slot.get_day_display(), 
-                        'startPeriod': time_slot.start_period,
-                        'endPeriod': time_slot.end_period,
-                        'location': time_slot.location,
-                        'educator': {
-                            'id': time_slot.educator.educatorId if time_slot.educator else None,
-                            'name': time_slot.educator.nameEn if time_slot.educator else None
-                        } if time_slot.educator else None
-                    }
-                    time_slots_data.append(time_slot_data)
-                
-                pattern_data = {
-                    'patternId': pattern.id,
-                    'patternName': pattern.pattern_name,
-                    'patternType': pattern.pattern_type,
-                    'capacity': pattern.capacity,
-                    'timeSlots': time_slots_data
-                }
-                patterns_data.append(pattern_data)
-
-            
-            registration_data = {
-                'registrationId': reg.id,
-                'courseCode': reg.course.courseCode,
-                'courseName': reg.course.courseName,
-                'credits': reg.course.credits,
-                'level': reg.level,
-                'groupNumber': reg.group_number,
-                'capacity': reg.capacity,
-                'isEnrolled': is_enrolled,
-                'schedulePatterns': patterns_data,
-            }
-
-            # Group by level
-            level = reg.level
-            if level not in registrations_by_level:
-                registrations_by_level[level] = []
-            registrations_by_level[level].append(registration_data)
+        # Live seat counters, served from the cache
+        registration_counts, pattern_counts = seats.seat_counts(
+            [entry['registrationId'] for entry in eligible_registrations],
+            [pattern['patternId'] for entry in eligible_registrations for pattern in entry['data']['schedulePatterns']]
+        )
 
-        
-        response_data = {
-            'studentId': student.studentId,
-            'studentName': student.nameEn,
-            'accessibleDepartments': departments,
-            'registrationsByLevel': registrations_by_level,
-            'totalEligibleCourses': len(eligible_registrations)
-        }
+        response_data = payloads.available_registrations(
+            student, departments, eligible_registrations, current_registrations_set,
+            term_masks, registration_counts, pattern_counts
+        )
 
         return Response(response_data, status=status.HTTP_200_OK)
     
 
 class StudentRegistrationView(generics.CreateAPIView):
-    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'register'
+    permission_classes = [IsAuthenticated, IsStudent]
 
     def post(self, request):
         StudentId = request.user.username
@@ -627,109 +465,66 @@ class StudentRegistrationView(generics.CreateAPIView):
         if not isinstance(registrations_data, list) or not registrations_data:
             return Response({'error': 'Invalid data format. Expected a non-empty list of registrations.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        successful = []
-        failed = []
+        if registration_queue.is_enabled():
+            return registration_queue.submit_response(student, registrations_data)
 
-        for reg_data in registrations_data:
-            try: 
-                result = self.process_registration(student, reg_data, global_settings)
-                successful.append(result)
-            except Exception as e:
-                failed.append({'registration': reg_data.get('registrationId'), 'error': str(e)})
+        try:
+            successful, failed = sqlite_writes.serialized(register_courses, student, registrations_data, global_settings)
+        except sqlite_writes.WriteContention:
+            return Response(
+                {'error': 'The database is busy, please try again'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'}
+            )
 
         return Response({
             'successful': successful,
             'failed': failed
         }, status=status.HTTP_200_OK)
-    
-    def process_registration(self, student, reg_data, global_settings):
-        reg_id = reg_data.get('registrationId')
-        pattern_data = reg_data.get('schedulePatterns', [])
-        pattern_ids = [pattern.get('patternId') for pattern in pattern_data]
 
-        try:
-            registration = Registration.objects.get(id=reg_id, is_active=True)
-        except Registration.DoesNotExist:
-            raise Exception("Registration not found or inactive")
-        
-        
-        
 
-        
-        academic_year, created = AcademicYear.objects.get_or_create(student=student, yearName=global_settings.current_academic_year)
-        semester, created = Semester.objects.get_or_create(academicYear=academic_year, semesterName=global_settings.current_semester)
-        
-        if not pattern_ids:
-            try:
-                enrollment = Enrollment.objects.get(
-                    student=student,
-                    registration=registration,
-                    semester=semester
-                )
-                enrollment.delete()
-                # Update semester registered hours after deletion
-                self.update_semester_registered_hours(semester, student)
-                return {
-                    'registrationId': reg_id,
-                    'courseCode': registration.course.courseCode,
-                    'action': 'deleted'
-                }
-            except Enrollment.DoesNotExist:
-                return {
-                    'registrationId': reg_id,
-                    'courseCode': registration.course.courseCode,
-                    'action': 'no_change'
-                }
-        
-        enrollment, created = Enrollment.objects.get_or_create(
-            student=student,
-            registration=registration,
-            semester=semester 
-        )
+class StudentRegistrationTicketView(generics.GenericAPIView):
+    """
+    Status of a queued registration request (see registration_queue.py)
+    """
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'registration-status'
+    permission_classes = [IsAuthenticated, IsStudent]
 
-        patterns = SchedulePattern.objects.filter(id__in=pattern_ids, registration=registration).prefetch_related('enrollments')
-        if patterns.count() != len(pattern_ids):
-            raise Exception("Some patterns do not belong to this Registration")
+    def get(self, request, ticket, *args, **kwargs):
+        ticket_data = registration_queue.get_ticket(ticket)
+        if ticket_data is None or ticket_data['studentId'] != request.user.username:
+            return Response({'error': 'Ticket not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        for pattern in patterns: 
-            if pattern.enrollments.count() >= pattern.capacity:
-                raise Exception(f"Pattern '{pattern.pattern_name}' is full ({pattern.enrollments.count()}/{pattern.capacity})")
+        if ticket_data['status'] == 'queued':
+            return Response(ticket_data, status=status.HTTP_202_ACCEPTED)
+        return Response(ticket_data, status=status.HTTP_200_OK)
 
-        pattern_types = [pattern.pattern_type for pattern in patterns]
-        if len(pattern_types) != len(set(pattern_types)):
-            raise Exception("Cannot select multiple patterns of the same type (e.g., 2 tutorials)")
 
-        enrollment.selected_patterns.set(patterns)
-        enrollment.save()
-        
-        # Update semester registered hours after enrollment changes
-        self.update_semester_registered_hours(semester, student)
-
-        return {
-            'registrationId' : reg_id,
-            'courseCode' : registration.course.courseCode,
-            'enrollmentId' : enrollment.id,
-            'action' : 'created' if created else 'updated'
-        }
-    
-    def update_semester_registered_hours(self, semester, student):
-        
-        from django.db.models import Sum
-        
-        total_hours = Enrollment.objects.filter(
-            student=student,
-            semester=semester
-        ).aggregate(
-            total=Sum('registration__course__credits')
-        )['total'] or 0
-        
-        semester.registeredHours = total_hours
-        semester.save(update_fields=['registeredHours'])
+class MetricsView(generics.GenericAPIView):
+    """Request metrics of this process in Prometheus text format (see instrumentation.py)"""
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAdminUser]
 
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
-class StudentTimetableView(generics.RetrieveAPIView):
-    permission_classes = [IsAuthenticated]
+
+class RegistrationQueueMetricsView(generics.GenericAPIView):
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAdminUser]
 
+    def get(self, request, *args, **kwargs):
+        if not registration_queue.is_enabled():
+            return Response({'enabled': False}, status=status.HTTP_200_OK)
+        return Response({'enabled': True, **registration_queue.get_broker().metrics()}, status=status.HTTP_200_OK)
+
+
+class StudentTimetableView(ReplicaReadMixin, InstrumentedViewMixin, generics.RetrieveAPIView):
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAuthenticated, IsStudent]
+    query_budget = 7
+
+    @cached_student_response('timetable', depends_on_catalog=True)
     def get(self, request, *args, **kwargs):
         student_id = request.user.username
 
@@ -742,8 +537,7 @@ class StudentTimetableView(generics.RetrieveAPIView):
         global_settings = GlobalSettings.get_current()
         enrollments = Enrollment.objects.filter(
             student=student,
-            semester__academicYear__yearName=global_settings.current_academic_year,
-            semester__semesterName=global_settings.current_semester
+            term_id=Term.current_id(global_settings)
         ).select_related(
             'registration__course'
         ).prefetch_related(
@@ -751,36 +545,14 @@ class StudentTimetableView(generics.RetrieveAPIView):
             'selected_patterns__time_slots__educator'
         )
 
-        timetable = []
-
-        for enrollment in enrollments:
-            for pattern in enrollment.selected_patterns.all():
-                for time_slot in pattern.time_slots.all():
-                    timetable.append({
-                        'courseCode': enrollment.registration.course.courseCode,
-                        'patternName': pattern.pattern_name,
-                        'start': time_slot.start_period,
-                        'end': time_slot.end_period,
-                        'educator': time_slot.educator.nameEn if time_slot.educator else None,
-                        'location': time_slot.location
-                    })
+        return Response(payloads.student_timetable(student, global_settings, enrollments), status=status.HTTP_200_OK)
 
 
-        response = {
-            'studentId': student.studentId,
-            'studentName': student.nameEn,
-            'academicYear': global_settings.current_academic_year,
-            'semester': global_settings.current_semester,
-            'timetable': timetable
-        }
+class EducatorInfo(ReplicaReadMixin, InstrumentedViewMixin, generics.GenericAPIView):
 
-        return Response(response, status=status.HTTP_200_OK)
-
-
-class EducatorInfo(generics.GenericAPIView):
-
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
-    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAuthenticated, IsEducator]
+    query_budget = 1
     
     def get(self, request, *args, **kwargs):
         educatorId = request.user.username 
@@ -789,82 +561,36 @@ class EducatorInfo(generics.GenericAPIView):
         except Educator.DoesNotExist:
             return Response({'error': 'Educator not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        data = {
-            'educatorId': educator.educatorId,
-            'nameAr': educator.nameAr,
-            'nameEn': educator.nameEn,
-            'email': educator.email,
-            'phone': educator.phone,
-            'dateOfBirth': educator.dateOfBirth,
-            'address': educator.address,
-            'degrees': educator.degrees,
-            'department': educator.department.nameEn if educator.department else ''
-            
-        }
+        return Response(payloads.educator_info(educator), status=status.HTTP_200_OK)
 
-        return Response(data, status=status.HTTP_200_OK)
 
-
-class EducatorCoursesView(generics.GenericAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
-    permission_classes = [IsAuthenticated]
+class EducatorCoursesView(ReplicaReadMixin, InstrumentedViewMixin, generics.GenericAPIView):
+    """
+    The educator's courses this term with enrollment counts, average total and grade
+    distribution; one grouped query, cached per educator and term (see dashboard.py)
+    """
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAuthenticated, IsEducator]
+    query_budget = 3
     
     def get(self, request, *args, **kwargs):
-        educatorId = request.user.username 
-        try:
-            educator = Educator.objects.select_related('department').get(educatorId=educatorId)
-        except Educator.DoesNotExist:
-            return Response({'error': 'Educator not found'}, status=status.HTTP_404_NOT_FOUND)
         global_settings = GlobalSettings.get_current()
-        
-        # Get all registrations where this educator teaches in the current semester
-        registrations = Registration.objects.filter(
-            patterns__time_slots__educator=educator,
-            enrollments__semester__academicYear__yearName=global_settings.current_academic_year,
-            enrollments__semester__semesterName=global_settings.current_semester
-        ).select_related(
-            'course'
-        ).distinct()
-        
-        courses_data = []
-        for registration in registrations:
-            # Count enrolled students for this registration
-            student_count = Enrollment.objects.filter(
-                registration=registration,
-                semester__academicYear__yearName=global_settings.current_academic_year,
-                semester__semesterName=global_settings.current_semester,
-                selected_patterns__time_slots__educator=educator
-            ).distinct().count()
-            
-            course_data = {
-                'registrationId': registration.id,
-                'courseCode': registration.course.courseCode,
-                'courseName': registration.course.courseName,
-                'credits': registration.course.credits,
-                'groupNumber': registration.group_number,
-                'enrolledStudents': student_count,
-                'capacity': registration.capacity
-            }
-            courses_data.append(course_data)
-        
-        response_data = {
-            'educatorId': educator.educatorId,
-            'educatorName': educator.nameEn,
-            'academicYear': global_settings.current_academic_year,
-            'semester': global_settings.get_current_semester_display(),
-            'courses': courses_data
-        }
+        response_data = dashboard.educator_courses(request.user.username, global_settings)
+        if response_data is None:
+            return Response({'error': 'Educator not found'}, status=status.HTTP_404_NOT_FOUND)
         
         return Response(response_data, status=status.HTTP_200_OK)
 
 
-class EducatorCourseInfo(generics.GenericAPIView):
+class EducatorCourseInfo(ReplicaReadMixin, InstrumentedViewMixin, generics.GenericAPIView):
     """
     Shows detailed information about a specific course/registration that an educator teaches,
-    including all enrolled students and their grades (if any).
+    including the enrolled students and their grades (if any).
+    ?sort=name|studentId|level|total (prefix with - for descending), ?page= and ?pageSize= to paginate.
     """
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
-    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAuthenticated, IsEducator]
+    query_budget = 7
     
     def get(self, request, registration_id, *args, **kwargs):
         educatorId = request.user.username
@@ -879,103 +605,43 @@ class EducatorCourseInfo(generics.GenericAPIView):
         except Registration.DoesNotExist:
             return Response({'error': 'Registration not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Verify that this educator actually teaches this registration
-        educator_teaches = registration.patterns.filter(
-            time_slots__educator=educator
-        ).exists()
-        
-        if not educator_teaches:
+        # The patterns this educator teaches; none means they do not teach this registration
+        pattern_ids = roster.educator_pattern_ids(educator, registration)
+        if not pattern_ids:
             return Response({'error': 'You are not authorized to view this course'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            order_by, page, page_size = roster.page_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         global_settings = GlobalSettings.get_current()
         
-        # Get all enrollments for this registration in current semester
-        enrollments = Enrollment.objects.filter(
-            registration=registration,
-            semester__academicYear__yearName=global_settings.current_academic_year,
-            semester__semesterName=global_settings.current_semester
-        ).select_related(
-            'student'
-        ).prefetch_related(
-            'selected_patterns__time_slots'
+        # Students of this registration in the current term who selected one of the educator's patterns
+        enrollments = roster.roster(registration, Term.current_id(global_settings), pattern_ids)
+        total_enrolled, with_grades = roster.roster_counts(enrollments)
+        offset = (page - 1) * page_size if page_size else 0
+        students_data = [
+            roster.student_row(enrollment)
+            for enrollment in roster.roster_page(enrollments, pattern_ids, order_by, offset, page_size)
+        ]
+        
+        response_data = payloads.educator_course_info(
+            educator, global_settings, registration, total_enrolled, with_grades, students_data, page, page_size
         )
         
-        # Filter enrollments to only include students in patterns taught by this educator
-        relevant_enrollments = []
-        for enrollment in enrollments:
-            # Check if student has selected any pattern taught by this educator
-            if enrollment.selected_patterns.filter(time_slots__educator=educator).exists():
-                relevant_enrollments.append(enrollment)
-        
-        students_data = []
-        for enrollment in relevant_enrollments:
-            # Get the patterns this educator teaches for this student
-            educator_patterns = enrollment.selected_patterns.filter(
-                time_slots__educator=educator
-            ).distinct()
-            
-            patterns_info = []
-            for pattern in educator_patterns:
-                patterns_info.append({
-                    'patternName': pattern.pattern_name,
-                    'patternType': pattern.pattern_type
-                })
-            
-            student_data = {
-                'enrollmentId': enrollment.id,
-                'studentId': enrollment.student.studentId,
-                'studentName': enrollment.student.nameEn,
-                'studentNameAr': enrollment.student.nameAr,
-                'level': enrollment.student.level,
-                'department': enrollment.student.department.code,
-                'patterns': patterns_info,
-                # Grade information
-                'letterGrade': enrollment.letterGrade,
-                'numericGrade': float(enrollment.numericGrade) if enrollment.numericGrade else None,
-                'coursework': enrollment.coursework,
-                'courseworkMax': enrollment.courseworkMax,
-                'exam': enrollment.exam,
-                'examMax': enrollment.examMax,
-                'total': enrollment.total,
-                'hasGrade': enrollment.letterGrade is not None and enrollment.letterGrade != ''
-            }
-            students_data.append(student_data)
-        
-        # Sort students by name
-        students_data.sort(key=lambda x: x['studentName'])
-        
-        course_info = {
-            'registrationId': registration.id,
-            'courseCode': registration.course.courseCode,
-            'courseName': registration.course.courseName,
-            'credits': registration.course.credits,
-            'groupNumber': registration.group_number,
-            'capacity': registration.capacity,
-            'level': registration.course.level,
-            'totalEnrolled': len(students_data),
-            'studentsWithGrades': len([s for s in students_data if s['hasGrade']]),
-            'studentsWithoutGrades': len([s for s in students_data if not s['hasGrade']])
-        }
-        
-        response_data = {
-            'educatorId': educator.educatorId,
-            'educatorName': educator.nameEn,
-            'academicYear': global_settings.current_academic_year,
-            'semester': global_settings.get_current_semester_display(),
-            'courseInfo': course_info,
-            'students': students_data
-        }
-        
         return Response(response_data, status=status.HTTP_200_OK)
 
 
 class EducatorUpdateGrades(generics.GenericAPIView):
     """
     Allows educators to update student grades for a specific course.
-    Handles batch updates and automatic GPA recalculation.
+    Handles batch updates (JSON list or text/csv upload) and automatic GPA recalculation.
     """
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
-    permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'grade-entry'
+    permission_classes = [IsAuthenticated, IsEducator]
+    parser_classes = [JSONParser, CSVParser]
     
     def put(self, request, registration_id, *args, **kwargs):
         educatorId = request.user.username
@@ -994,114 +660,39 @@ class EducatorUpdateGrades(generics.GenericAPIView):
         if not registration.patterns.filter(time_slots__educator=educator).exists():
             return Response({'error': 'You are not authorized to grade this course'}, status=status.HTTP_403_FORBIDDEN)
         
+        grade_updates = request.data
+        if not isinstance(grade_updates, list):
+            return Response({'error': 'Invalid data format. Expected a list of grade updates.'}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Check if educator is TA trying to update final grades
         if educator.type == 'Teaching Assistant':
-            grade_updates = request.data
             for update in grade_updates:
-                if 'exam' in update and update.get('exam') is not None:
+                if isinstance(update, dict) and update.get('exam') is not None:
                     return Response({'error': 'Teaching Assistants cannot update final exam grades'}, status=status.HTTP_403_FORBIDDEN)
         
-        successful_updates = []
-        failed_updates = []
-        
-        # Process each grade update
-        from django.db import transaction
-        
+        # Validated in memory, written with bulk_update, GPA recomputed once per semester.
+        # If any row fails nothing is written.
         try:
-            with transaction.atomic():
-                for update_data in request.data:
-                    try:
-                        result = self.process_grade_update(educator, registration, update_data)
-                        successful_updates.append(result)
-                    except Exception as e:
-                        failed_updates.append({
-                            'enrollmentId': update_data.get('enrollmentId'),
-                            'error': str(e)
-                        })
-                
-                # If any failed, rollback all changes
-                if failed_updates:
-                    raise Exception("Some updates failed")
-                    
-        except Exception:
-            # Transaction was rolled back
-            pass
+            successful_updates, failed_updates = sqlite_writes.serialized(
+                grading.import_grades, educator, registration, grade_updates
+            )
+        except sqlite_writes.WriteContention:
+            return Response(
+                {'error': 'The database is busy, please try again'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'}
+            )
         
         return Response({
             'successful': successful_updates,
             'failed': failed_updates,
             'message': f'Updated {len(successful_updates)} students successfully'
         }, status=status.HTTP_200_OK)
-    
-    def process_grade_update(self, educator, registration, update_data):
-        """Process a single student's grade update"""
-        enrollment_id = update_data.get('enrollmentId')
-        
-        try:
-            enrollment = Enrollment.objects.select_related(
-                'student', 'semester__academicYear'
-            ).get(
-                id=enrollment_id,
-                registration=registration
-            )
-        except Enrollment.DoesNotExist:
-            raise Exception("Enrollment not found")
-        
-        # Verify this student is in educator's patterns
-        if not enrollment.selected_patterns.filter(time_slots__educator=educator).exists():
-            raise Exception("You don't teach this student")
-        
-        # Update grade fields
-        if 'coursework' in update_data:
-            coursework = update_data['coursework']
-            if coursework is not None and (coursework < 0 or coursework > (enrollment.courseworkMax or 50)):
-                raise Exception(f"Coursework must be between 0 and {enrollment.courseworkMax}")
-            enrollment.coursework = coursework
-            
-        if 'exam' in update_data:
-            exam = update_data['exam']
-            if exam is not None and (exam < 0 or exam > (enrollment.examMax or 50)):
-                raise Exception(f"Exam must be between 0 and {enrollment.examMax}")
-            enrollment.exam = exam
-        
-        # Calculate total and letter grade
-        enrollment.calculate_total_and_grade()
-        enrollment.save()
-        
-        # Recalculate semester GPA
-        semester = enrollment.semester
-        new_gpa = semester.calculate_gpa(enrollment.student)
-        
-        # Only update semester GPA if all courses are complete
-        if semester.is_complete_semester(enrollment.student):
-            semester.gpa = new_gpa
-            # Calculate and update CGPA
-            semester.cgpa = semester.calculate_cgpa(enrollment.student)
-        else:
-            # Incomplete semester - set GPA to 0
-            semester.gpa = 0.0
-            # Don't update CGPA for incomplete semesters
-            
-        semester.save()
-        
-        return {
-            'enrollmentId': enrollment.id,
-            'studentId': enrollment.student.studentId,
-            'studentName': enrollment.student.nameEn,
-            'coursework': enrollment.coursework,
-            'exam': enrollment.exam,
-            'total': enrollment.total,
-            'letterGrade': enrollment.letterGrade,
-            'numericGrade': float(enrollment.numericGrade) if enrollment.numericGrade else 0.0,
-            'semesterGPA': float(semester.gpa) if semester.gpa else 0.0,
-            'cumulativeGPA': float(semester.cgpa) if semester.cgpa else 0.0
-        }
-
-class EducatorTimetableView(generics.GenericAPIView):
-    throttle_classes = [UserRateThrottle, AnonRateThrottle]
-    permission_classes = [IsAuthenticated]
 
-    def get(self, request, registration_id, *args, **kwargs):
+class EducatorTimetableView(ReplicaReadMixin, InstrumentedViewMixin, generics.GenericAPIView):
+    throttle_classes = [TokenBucketThrottle]
+    permission_classes = [IsAuthenticated, IsEducator]
+
+    def get(self, request, *args, **kwargs):
         educatorId = request.user.username
         global_settings = GlobalSettings.get_current()
 
@@ -1112,30 +703,10 @@ class EducatorTimetableView(generics.GenericAPIView):
 
         time_slots = TimeSlot.objects.filter(
             educator=educator,
-            pattern__registration__enrollments__semester__academicYear__yearName=global_settings.current_academic_year,
-            pattern__registration__enrollments__semester__semesterName=global_settings.current_semester
+            pattern__registration__enrollments__term_id=Term.current_id(global_settings)
         ).select_related(
             'pattern__registration__course'
         ).distinct()
 
-        timetable = []
-        for time_slot in time_slots:
-            timetable.append({
-                'courseCode': time_slot.pattern.registration.course.courseCode,
-                'courseName': time_slot.pattern.registration.course.courseName,
-                'patternName': time_slot.pattern.pattern_name,
-                'patternType': time_slot.pattern.pattern_type,
-                'day': time_slot.day,
-                'start': time_slot.start_period,
-                'end': time_slot.end_period,
-                'location': time_slot.location,
-                'groupNumber': time_slot.pattern.registration.group_number
-            })
-        return Response({
-            'educatorId': educator.educatorId,
-            'educatorName': educator.nameEn,
-            'academicYear': global_settings.current_academic_year,
-            'semester': global_settings.get_current_semester_display(),
-            'timetable': timetable
-        }, status=status.HTTP_200_OK)
+        return Response(payloads.educator_timetable(educator, global_settings, time_slots), status=status.HTTP_200_OK)
     